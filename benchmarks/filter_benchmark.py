@@ -0,0 +1,78 @@
+"""Benchmark of the compiled expose filter.
+
+Compares the compiled predicate built by `FilterBuilder.build()` with
+evaluating every filter on its own, as `Filter.is_interesting_expose` used to
+do (each filter re-parsing the values it needs, no short-circuiting), on a
+large synthetic stream of exposes.
+
+Run from the repository root:
+
+    python -m benchmarks.filter_benchmark [number of exposes]
+"""
+import random
+import sys
+import timeit
+from functools import reduce
+
+from flathunter.config import YamlConfig
+from flathunter.filter import Filter
+
+CONFIG = {
+    'filters': {
+        'excluded_titles': ['wg', 'tausch', 'wochenendheimfahrer', 'pendler', 'zwischenmiete'],
+        'min_price': 500,
+        'max_price': 1200,
+        'min_size': 40,
+        'max_size': 120,
+        'min_rooms': 2,
+        'max_rooms': 4,
+        'max_price_per_square': 20,
+    }
+}
+
+TITLES = ['Helle 3-Zimmer-Wohnung mit Balkon', 'WG-Zimmer in Friedrichshain',
+          'Wohnungstausch gesucht', 'Altbau mit Dielen und Stuck', 'Zwischenmiete Sommer']
+
+
+def random_expose(expose_id: int, rng: random.Random):
+    """A synthetic expose with values in the range of a typical search"""
+    return {
+        'id': expose_id,
+        'title': rng.choice(TITLES),
+        'price': f"{rng.randint(300, 2500)},{rng.randint(0, 99):02d} €",
+        'size': f"{rng.randint(20, 150)} m²",
+        'rooms': str(rng.choice([1, 1.5, 2, 2.5, 3, 4, 5])),
+    }
+
+
+def uncompiled(filters):
+    """Evaluate every filter separately for every expose"""
+    def is_interesting_expose(expose):
+        return reduce((lambda x, y: x and y),
+                      map((lambda x: x.is_interesting(expose)), filters), True)
+    return is_interesting_expose
+
+
+def main(count: int = 100000):
+    """Time both strategies and print the results"""
+    rng = random.Random(42)
+    exposes = [random_expose(expose_id, rng) for expose_id in range(count)]
+    filter_set = Filter.builder().read_config(YamlConfig(CONFIG)).build()
+    baseline = uncompiled(filter_set.filters)
+    compiled = filter_set.predicate
+
+    assert [baseline(e) for e in exposes] == [compiled(e) for e in exposes]
+    matches = sum(1 for e in exposes if compiled(e))
+
+    baseline_time = min(timeit.repeat(lambda: [baseline(e) for e in exposes],
+                                      number=1, repeat=3))
+    compiled_time = min(timeit.repeat(lambda: [compiled(e) for e in exposes],
+                                      number=1, repeat=3))
+    print(f"{count} exposes, {matches} match")
+    print(f"per-filter evaluation: {baseline_time:.3f}s")
+    print(f"compiled predicate:    {compiled_time:.3f}s")
+    print(f"speedup:               {baseline_time / compiled_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
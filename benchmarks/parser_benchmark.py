@@ -0,0 +1,361 @@
+"""Benchmark of the crawlers' search result parsing.
+
+Runs every crawler's `extract_data` (and `Immobilienscout.get_entries_from_json`)
+over the recorded pages in `test/crawler/fixtures`, and over synthetic result
+pages scaled up to `--scale` listings, parsing the pages as a crawl does: with
+the selected parser, limited to the crawler's `RESULTS_SUBTREE`. For every page
+it reports
+
+  latency  time to parse the page and extract the exposes, best of `--repeat` runs
+  blocks   memory blocks allocated while parsing that are still held by the
+           soup and the exposes, as a proxy for the number of allocations
+  peak     peak memory allocated while parsing and extracting
+
+and compares them with a stored baseline. The exposes are checked against the
+ones extracted from a complete parse of the page first.
+
+Latencies depend on the machine, so record a baseline of your own before
+changing a parser, and compare after. Run from the repository root:
+
+    python -m benchmarks.parser_benchmark --save-baseline
+    python -m benchmarks.parser_benchmark [--parser lxml] [--scale 200]
+
+Exits with status 1 if a page allocated more blocks than in the baseline by
+more than `--tolerance`. Allocations are deterministic, while latencies can
+vary by half between runs on a shared or busy machine, so latencies are only
+checked with `--check-latency`, against a baseline recorded on the same machine.
+"""
+import argparse
+import copy
+import json
+import logging
+import os
+import sys
+import timeit
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from bs4 import BeautifulSoup
+
+from flathunter.config import YamlConfig
+from flathunter.crawler.idealista import Idealista
+from flathunter.crawler.immobiliare import Immobiliare
+from flathunter.crawler.immobilienscout import Immobilienscout
+from flathunter.crawler.immowelt import Immowelt
+from flathunter.crawler.kleinanzeigen import Kleinanzeigen
+from flathunter.crawler.meinestadt import MeineStadt
+from flathunter.crawler.subito import Subito
+from flathunter.crawler.vrmimmo import VrmImmo
+from flathunter.crawler.wggesucht import WgGesucht, liste_attribute_filter, \
+    parse_expose_element_to_details
+from flathunter.html_parser import PARSERS, Subtree
+from flathunter.logging import logger
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+                        'test', 'crawler', 'fixtures')
+BASELINE = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'parser_baseline.json')
+
+
+@dataclass
+class Case:
+    """A page and the function extracting its exposes"""
+    name: str
+    run: Callable[[], List[Dict]]
+    reference: Callable[[], List[Dict]]
+    size: int
+
+
+def html_case(name: str, crawler, markup: str) -> Case:
+    """Parse a result page like a crawl, and extract its exposes"""
+    subtree = None if crawler.RESULTS_SUBTREE is None \
+        else Subtree.parse(crawler.RESULTS_SUBTREE)
+    return Case(name,
+                lambda: crawler.extract_data(crawler.html_parser.parse(markup, subtree)),
+                lambda: crawler.extract_data(BeautifulSoup(markup, 'lxml')),
+                len(markup.encode('utf-8')))
+
+
+def json_case(name: str, crawler, data: Dict[str, Any]) -> Case:
+    """Extract the exposes from the IS24 result list of a page"""
+    return Case(name, lambda: crawler.get_entries_from_json(data),
+                lambda: crawler.get_entries_from_json(data), len(json.dumps(data)))
+
+
+def read_fixture(name: str) -> str:
+    """The content of a recorded page"""
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as fixture:
+        return fixture.read()
+
+
+def portal_page(results: str) -> str:
+    """Surround the results with the navigation, scripts and footer of a portal"""
+    navigation = ''.join(f'<li><a href="/kategorie/{i}">Kategorie {i}</a></li>'
+                         for i in range(200))
+    tracking = ','.join(f'"k{i}": {i}' for i in range(3000))
+    footer = ''.join(f'<p><a href="/info/{i}">Info {i}</a> Lorem ipsum dolor sit amet.</p>'
+                     for i in range(300))
+    return (f'<html><head><title>Suchergebnisse</title><script>var tracking = {{{tracking}}};'
+            f'</script></head><body><header><ul>{navigation}</ul></header>{results}'
+            f'<footer>{footer}</footer></body></html>')
+
+
+def kleinanzeigen_page(count: int) -> str:
+    """Synthetic Kleinanzeigen result page"""
+    items = ''.join(
+        f'<article class="aditem" data-adid="{2000000000 + i}">'
+        f'<div class="galleryimage-element" data-imgsrc="https://img.example.com/{i}.jpg"></div>'
+        f'<div class="aditem-main--top--left">10115 Berlin Mitte</div>'
+        f'<h2><a class="ellipsis" href="/s-anzeige/wohnung/{i}">Helle Wohnung {i}</a></h2>'
+        f'<p class="aditem-main--middle--price-shipping--price">1.200 €</p>'
+        f'<span class="simpletag">65 m²</span><span class="simpletag">3 Zi.</span>'
+        f'</article>' for i in range(count))
+    return portal_page(f'<div id="srchrslt-adtable">{items}</div>')
+
+
+def immowelt_page(count: int) -> str:
+    """Synthetic Immowelt result page"""
+    items = ''.join(
+        f'<a id="classified-{i}" href="https://www.immowelt.de/expose/{i}">'
+        f'<h2>Wohnung {i} mit Balkon</h2><div data-test="price">1.200 €</div>'
+        f'<div data-test="area">65 m²</div><div data-test="rooms">3 Zimmer</div>'
+        f'<div class="IconFact-location"><span>Berlin Mitte</span></div>'
+        f'<picture><source data-srcset="https://img.example.com/{i}.jpg"></picture></a>'
+        for i in range(count))
+    return portal_page(f'<main>{items}</main>')
+
+
+def meinestadt_page(count: int) -> str:
+    """Synthetic meinestadt.de result page"""
+    items = ''.join(
+        f'<div class="m-resultListEntries__content">'
+        f'<div class="m-resultListEntries__img">'
+        f'<img data-objectimage="https://img.example.com/{i}.jpg"></div>'
+        f'<div class="m-resultListEntries__metainfosEntries">'
+        f'<a href="https://www.meinestadt.de/expose/{i}">Wohnung {i}</a>'
+        f'<div class="m-resultListEntries__metainfo">Berlin Mitte</div></div>'
+        f'<div class="m-resultListEntries__metainfosEntries">'
+        f'<div class="a-resultListMetainfoItem__text">1.200 €</div>'
+        f'<div class="a-resultListMetainfoItem__text">65 m²</div>'
+        f'<div class="a-resultListMetainfoItem__text">3 Zimmer</div></div></div>'
+        for i in range(count))
+    return portal_page(f'<div class="m-resultListEntries">{items}</div>')
+
+
+def vrmimmo_page(count: int) -> str:
+    """Synthetic VRM Immo result page"""
+    items = ''.join(
+        f'<div class="item-wrap js-serp-item" id="item-{i}">'
+        f'<a class="js-item-title-link ci-search-result__link" href="/immobilien/{i}" '
+        f'title="Wohnung {i}"></a><img src="https://img.example.com/{i}.jpg">'
+        f'<div class="item__spec item-spec-price">1.200 €</div>'
+        f'<div class="item__spec item-spec-area">65 m²</div>'
+        f'<div class="item__spec item-spec-rooms">3</div>'
+        f'<div class="item__locality">Mainz</div></div>' for i in range(count))
+    return portal_page(f'<div class="serp">{items}</div>')
+
+
+def idealista_page(count: int) -> str:
+    """Synthetic idealista result page"""
+    items = ''.join(
+        f'<article class="item" data-adid="{i}">'
+        f'<picture class="item-multimedia"><img src="https://img.example.com/{i}.jpg"></picture>'
+        f'<a class="item-link" href="/immobile/{i}/">Bilocale {i} in via Roma</a>'
+        f'<span class="item-price">900€/mese</span><span class="item-detail">2 locali</span>'
+        f'<span class="item-detail">60 m²</span><span class="item-detail">Piano 3</span>'
+        f'</article>' for i in range(count))
+    return portal_page(f'<section class="items-container">{items}</section>')
+
+
+def immobiliare_page(count: int) -> str:
+    """Synthetic immobiliare.it result page"""
+    items = ''.join(
+        f'<li class="in-realEstateResults__item">'
+        f'<a class="in-reListCard__title" href="https://www.immobiliare.it/annunci/{i}/">'
+        f'Bilocale via Roma</a><img src="https://img.example.com/{i}.jpg">'
+        f'<div class="in-reListCardPrice">€ 900/mese</div>'
+        f'<ul class="in-reListCard__features"><li aria-label="locali">2 locali</li>'
+        f'<li aria-label="superficie">60 m²</li></ul></li>' for i in range(count))
+    return portal_page(f'<ul class="in-realEstateResults">{items}</ul>')
+
+
+def subito_page(count: int) -> str:
+    """Synthetic Subito result page"""
+    items = [{'item': {
+        'urn': f'id:ad:{i}', 'subject': f'Bilocale {i}',
+        'urls': {'default': f'https://www.subito.it/appartamenti/{i}.htm'}, 'images': [],
+        'features': {'/price': {'values': [{'key': '900'}]},
+                     '/room': {'values': [{'key': '2'}]},
+                     '/size': {'values': [{'key': '60'}]}},
+        'geo': {'town': {'value': 'Milano'}, 'city': {'shortName': 'MI'},
+                'region': {'value': 'Lombardia'}}}} for i in range(count)]
+    state = json.dumps({'props': {'state': {'items': {'list': items}}}})
+    return portal_page(f'<script id="__NEXT_DATA__" type="application/json">{state}</script>')
+
+
+def immobilienscout_page(count: int) -> str:
+    """Synthetic ImmobilienScout result page, as served without a browser"""
+    items = ''.join(
+        f'<li><a class="result-list-entry__brand-title-container" href="/expose/{120000000 + i}">'
+        f'Wohnung {i}</a><div class="result-list-entry__address">Berlin Mitte</div>'
+        f'<dl data-is24-qa="attributes"><dd>1.200 €</dd><dd>65 m²</dd><dd>3</dd></dl>'
+        f'<div class="result-list-entry__gallery-container"><div class="gallery-container">'
+        f'<img src="https://img.example.com/{i}.jpg"></div></div></li>' for i in range(count))
+    return portal_page(f'<span data-is24-qa="resultlist-resultCount">{count}</span>'
+                       f'<ul id="resultListItems">{items}</ul>')
+
+
+def scaled_wggesucht_page(count: int) -> str:
+    """The recorded WG-Gesucht page, with copies of its listings, under new IDs,
+       added up to `count` listings"""
+    soup = BeautifulSoup(read_fixture('wg-gesucht-spotahome.html'), 'lxml')
+    listings = [row for row in soup.find_all(liste_attribute_filter)
+                if 'display-none' not in row['class']
+                and parse_expose_element_to_details(row, 'wggesucht') is not None]
+    parent = listings[-1].parent
+    for i in range(count - len(listings)):
+        row = listings[i % len(listings)]
+        expose_id = row['id'].rsplit('-', 1)[-1]
+        new_id = str(90000000 + i)
+        copied = BeautifulSoup(str(row).replace(expose_id, new_id), 'html.parser')
+        parent.append(copied.find(id=row['id'].replace(expose_id, new_id)))
+    return str(soup)
+
+
+def scaled_immobilienscout_json(count: int) -> Dict[str, Any]:
+    """The recorded IS24 result list, with its entries repeated to `count` entries"""
+    data = json.loads(read_fixture('immo-scout-IS24-object.json'))
+    result_list = data['resultList']['resultListModel']['searchResponseModel']
+    entries = result_list['resultlist.resultlist']['resultlistEntries'][0]['resultlistEntry']
+    recorded = list(entries)
+    for i in range(count - len(recorded)):
+        entry = copy.deepcopy(recorded[i % len(recorded)])
+        entry['resultlist.realEstate']['@id'] = str(900000000 + i)
+        entries.append(entry)
+    return data
+
+
+def cases(parser: str, scale: int) -> List[Case]:
+    """The pages to benchmark"""
+    config = YamlConfig({'urls': [], 'crawl': {'html_parser': parser}})
+    is24 = Immobilienscout(config)
+    return [
+        html_case('wggesucht/fixture', WgGesucht(config),
+                  read_fixture('wg-gesucht-spotahome.html')),
+        json_case('immobilienscout-json/fixture', is24,
+                  json.loads(read_fixture('immo-scout-IS24-object.json'))),
+        html_case('wggesucht/scaled', WgGesucht(config), scaled_wggesucht_page(scale)),
+        json_case('immobilienscout-json/scaled', is24, scaled_immobilienscout_json(scale)),
+        html_case('immobilienscout/synthetic', is24, immobilienscout_page(scale)),
+        html_case('kleinanzeigen/synthetic', Kleinanzeigen(config), kleinanzeigen_page(scale)),
+        html_case('immowelt/synthetic', Immowelt(config), immowelt_page(scale)),
+        html_case('meinestadt/synthetic', MeineStadt(config), meinestadt_page(scale)),
+        html_case('vrmimmo/synthetic', VrmImmo(config), vrmimmo_page(scale)),
+        html_case('idealista/synthetic', Idealista(config), idealista_page(scale)),
+        html_case('immobiliare/synthetic', Immobiliare(config), immobiliare_page(scale)),
+        html_case('subito/synthetic', Subito(config), subito_page(scale)),
+    ]
+
+
+def measure(case: Case, repeat: int) -> Dict[str, float]:
+    """Time a case, and trace its memory use"""
+    entries = case.run()
+    if entries != case.reference():
+        raise AssertionError(f"{case.name}: exposes differ from a complete parse of the page")
+    latency = min(timeit.repeat(case.run, number=1, repeat=repeat))
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    start = tracemalloc.get_traced_memory()[0]
+    entries = case.run()
+    peak = tracemalloc.get_traced_memory()[1] - start
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+    del entries
+    return {'exposes': len(case.reference()), 'latency_ms': round(latency * 1000, 3),
+            'blocks': blocks, 'peak_kb': round(peak / 1024, 1)}
+
+
+def change(value: float, baseline: Optional[float]) -> str:
+    """Relative change from the baseline"""
+    if not baseline:
+        return ''
+    return f'{(value - baseline) / baseline:+.0%}'
+
+
+def report(results: Dict[str, Dict[str, float]], sizes: Dict[str, int],
+           baseline: Dict[str, Dict[str, float]]):
+    """Print the results next to their change from the baseline"""
+    print(f"{'page':30} {'size':>8} {'exposes':>7} {'latency':>10} {'':>6} "
+          f"{'blocks':>8} {'':>6} {'peak':>10} {'':>6}")
+    for name, result in results.items():
+        changes = {key: change(value, baseline.get(name, {}).get(key))
+                   for key, value in result.items()}
+        print(f"{name:30} {sizes[name] / 1024:7.0f}K {result['exposes']:7.0f} "
+              f"{result['latency_ms']:8.2f}ms {changes['latency_ms']:>6} "
+              f"{result['blocks']:8.0f} {changes['blocks']:>6} "
+              f"{result['peak_kb']:8.0f}KB {changes['peak_kb']:>6}")
+
+
+def load_baseline(path: str, parser: str, scale: int) -> Dict[str, Dict[str, float]]:
+    """The baseline results, if recorded with the same settings"""
+    if not os.path.exists(path):
+        print(f"No baseline at {path}")
+        return {}
+    with open(path, encoding='utf-8') as baseline_file:
+        baseline = json.load(baseline_file)
+    if (baseline.get('parser'), baseline.get('scale')) != (parser, scale):
+        print(f"Baseline was recorded with parser {baseline.get('parser')} and scale "
+              f"{baseline.get('scale')}, not comparing")
+        return {}
+    return baseline['pages']
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the benchmark, returning the exit status"""
+    parser = argparse.ArgumentParser(description="Benchmark of the crawlers' result parsing")
+    parser.add_argument('--parser', choices=sorted(PARSERS), default='bs4')
+    parser.add_argument('--scale', type=int, default=200,
+                        help="listings on the synthetic and scaled-up pages")
+    parser.add_argument('--repeat', type=int, default=7, help="timed runs per page")
+    parser.add_argument('--baseline', default=BASELINE, help="baseline file")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="store the results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help="growth of allocations (or latency) that fails the run")
+    parser.add_argument('--check-latency', action='store_true',
+                        help="also fail the run on slower pages")
+    args = parser.parse_args(argv)
+    # the crawlers log every skipped listing
+    logger.setLevel(logging.ERROR)
+
+    pages = cases(args.parser, args.scale)
+    results = {case.name: measure(case, args.repeat) for case in pages}
+    sizes = {case.name: case.size for case in pages}
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as baseline_file:
+            json.dump({'parser': args.parser, 'scale': args.scale, 'pages': results},
+                      baseline_file, indent=2, sort_keys=True)
+            baseline_file.write('\n')
+        report(results, sizes, {})
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline, args.parser, args.scale)
+    report(results, sizes, baseline)
+    checked = ('latency_ms', 'blocks') if args.check_latency else ('blocks',)
+    regressions = [f"{name} ({key})" for name, result in results.items() if name in baseline
+                   for key in checked
+                   if result[key] > baseline[name][key] * (1 + args.tolerance)]
+    if regressions:
+        print(f"Worse than the baseline by more than {args.tolerance:.0%}: "
+              f"{', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -11,8 +11,10 @@ from flathunter.argument_parser import parse
 from flathunter.logging import logger, configure_logging
 from flathunter.idmaintainer import IdMaintainer
 from flathunter.hunter import Hunter
+from flathunter.async_hunter import AsyncHunter
 from flathunter.config import Config
 from flathunter.heartbeat import Heartbeat
+from flathunter.http_pool import configure_connection_pools
 from flathunter.time_utils import wait_during_period
 
 __author__ = "Jan Harrie"
@@ -31,7 +33,10 @@ def launch_flat_hunt(config, heartbeat: Heartbeat):
 
     wait_during_period(time_from, time_till)
 
-    hunter = Hunter(config, id_watch)
+    if config.async_enabled():
+        hunter = AsyncHunter(config, id_watch)
+    else:
+        hunter = Hunter(config, id_watch)
     hunter.hunt_flats()
     counter = 0
 
@@ -57,6 +62,9 @@ def main():
     # setup logging
     configure_logging(config)
 
+    # share HTTP connection pools between all crawlers and notifiers
+    configure_connection_pools(config)
+
     # initialize search plugins for config
     config.init_searchers()
 
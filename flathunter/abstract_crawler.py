@@ -1,8 +1,11 @@
 """Interface for webcrawlers. Crawler implementations should subclass this"""
 from abc import ABC
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
 import re
 from time import sleep
-from typing import Optional, Any
+from typing import Optional, Any, Callable, Dict, Iterator, List, Set, Tuple
 
 import backoff
 import requests
@@ -18,9 +21,40 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.wait import WebDriverWait
 
 from flathunter import proxies
+from flathunter.async_http import AsyncHttpClient
+from flathunter.driver_pool import shared_driver_pool
+from flathunter.html_parser import HtmlParser, Subtree, get_parser
+from flathunter.resource_blocking import BlockingProfile
+from flathunter.http_pool import get_rate_limiter, get_session
+from flathunter.response_cache import ResponseCache, content_hash
 from flathunter.captcha.captcha_solver import CaptchaUnsolvableError
 from flathunter.logging import logger
 from flathunter.exceptions import ProxyException
+from flathunter.utils.timing import timings
+
+# Finds the captcha on the current page in the browser, so that the page
+# source only has to be transferred once per page load
+CAPTCHA_DETECTION_SCRIPT = """
+const scripts = Array.from(document.scripts).map(script => script.text);
+if (scripts.some(text => text.includes('initGeetest'))) {
+    return 'geetest';
+}
+if (document.querySelector('.g-recaptcha')
+        || scripts.some(text => text.includes('g-recaptcha'))) {
+    return 'recaptcha';
+}
+return null;
+"""
+
+# True while a crawler loads search result pages, which are parsed down to
+# the crawler's `RESULTS_SUBTREE`
+parsing_results: ContextVar[bool] = ContextVar('parsing_results', default=False)
+
+# Returns the text of the inline script that initializes GeeTest
+GEETEST_SCRIPT = """
+const script = Array.from(document.scripts).find(script => script.text.includes('initGeetest'));
+return script ? script.text : '';
+"""
 
 
 class Crawler(ABC):
@@ -28,6 +62,29 @@ class Crawler(ABC):
 
     URL_PATTERN: re.Pattern
 
+    # Optional callable returning those of a list of expose IDs that have
+    # already been seen. Set through `set_seen_oracle` to enable incremental
+    # crawling.
+    seen_oracle: Optional[Callable[[List[Any]], Set[Any]]] = None
+
+    # Cache of fetched pages, used for conditional requests. Enabled with
+    # `crawl.response_cache` in the config.
+    response_cache: Optional[ResponseCache] = None
+
+    # Parses the fetched pages. Replaced by the parser set with
+    # `crawl.html_parser` in `__init__`.
+    html_parser: HtmlParser = HtmlParser()
+
+    # Selector of the part of the search result pages that `extract_data`
+    # needs (see `flathunter.html_parser`). Only that part is parsed.
+    RESULTS_SUBTREE: Optional[str] = None
+
+    # Resource types or URL patterns that Chrome should not load for this
+    # crawler, on top of the configured `resource_blocking` profile, and the
+    # ones the crawler needs, even if the profile blocks them
+    BLOCKED_RESOURCES: Tuple[str, ...] = ()
+    ALLOWED_RESOURCES: Tuple[str, ...] = ()
+
     HEADERS = {
         'Connection': 'keep-alive',
         'Pragma': 'no-cache',
@@ -45,17 +102,51 @@ class Crawler(ABC):
 
     def __init__(self, config):
         self.config = config
+        self.html_parser = get_parser(config.html_parser())
+        self.blocked_urls = BlockingProfile.from_config(config) \
+            .extended(self.BLOCKED_RESOURCES, self.ALLOWED_RESOURCES).blocked_urls()
         if config.captcha_enabled():
             self.captcha_solver = config.get_captcha_solver()
+        if config.crawl_response_cache():
+            self.response_cache = ResponseCache()
+
+    def uses_driver(self) -> bool:
+        """True if the crawler loads its pages in Chrome"""
+        return False
+
+    @contextmanager
+    def checkout_driver(self) -> Iterator[Optional[Chrome]]:
+        """Context holding a Chrome driver from the shared pool for exclusive use,
+           or None if the crawler does not use a driver"""
+        if not self.uses_driver():
+            yield None
+            return
+        with shared_driver_pool(self.config).checkout(self.blocked_urls) as driver:
+            yield driver
+
+    def _parse_html(self, markup) -> BeautifulSoup:
+        """Parse a fetched page, limited to `RESULTS_SUBTREE` while crawling
+           search results"""
+        subtree = None
+        if self.RESULTS_SUBTREE is not None and parsing_results.get():
+            subtree = Subtree.parse(self.RESULTS_SUBTREE)
+        with timings.measure('parse'):
+            return self.html_parser.parse(markup, subtree)
+
+    @contextmanager
+    def _results_pages(self) -> Iterator[None]:
+        """Context in which fetched pages are parsed as search result pages"""
+        token = parsing_results.set(True)
+        try:
+            yield
+        finally:
+            parsing_results.reset(token)
 
     # pylint: disable=unused-argument
     def get_page(self, search_url, driver=None, page_no=None) -> BeautifulSoup:
         """Applies a page number to a formatted search URL and fetches the exposes at that page"""
         return self.get_soup_from_url(search_url)
 
-    @backoff.on_exception(wait_gen=backoff.constant,
-                          exception=TimeoutException,
-                          max_tries=3)
     def get_soup_from_url(
             self,
             url: str,
@@ -67,23 +158,97 @@ class Crawler(ABC):
         if self.config.use_proxy():
             return self.get_soup_with_proxy(url)
         if driver is not None:
+            return self._get_soup_with_driver(driver, url, checkbox, afterlogin_string)
+
+        if self.response_cache is not None and parsing_results.get():
+            return self.get_soup_with_cache(url, self.response_cache)
+
+        resp = get_session().get(url, headers=self.HEADERS, timeout=30)
+        self.log_unexpected_response(resp)
+        return self._parse_html(resp.content)
+
+    @backoff.on_exception(wait_gen=backoff.constant,
+                          exception=TimeoutException,
+                          max_tries=3)
+    def _load_page_in_driver(self, driver: Chrome, url: str, checkbox: bool = False,
+                            afterlogin_string: Optional[str] = None):
+        """Load the URL in the browser, and solve its captcha if there is one.
+           The captcha is detected in the browser, without fetching the page source.
+           Page loads wait for the per-host rate limit, like plain requests"""
+        rate_limiter = get_rate_limiter()
+        if rate_limiter is not None:
+            with timings.measure('selenium.rate_limit'):
+                rate_limiter.wait(url)
+        with timings.measure('selenium.navigate'):
             driver.get(url)
-            if re.search("initGeetest", driver.page_source):
-                self.resolve_geetest(driver)
-            elif re.search("g-recaptcha", driver.page_source):
-                self.resolve_recaptcha(
-                    driver, checkbox, afterlogin_string or "")
-            return BeautifulSoup(driver.page_source, 'lxml')
-
-        resp = requests.get(url, headers=self.HEADERS, timeout=30)
-        if resp.status_code not in (200, 405):
-            user_agent = 'Unknown'
-            if 'User-Agent' in self.HEADERS:
-                user_agent = self.HEADERS['User-Agent']
-            logger.error("Got response (%i): %s\n%s",
-                         resp.status_code, resp.content, user_agent)
-
-        return BeautifulSoup(resp.content, 'lxml')
+        with timings.measure('selenium.captcha_check'):
+            captcha = driver.execute_script(CAPTCHA_DETECTION_SCRIPT)
+        if captcha == 'geetest':
+            self.resolve_geetest(driver)
+        elif captcha == 'recaptcha':
+            self.resolve_recaptcha(driver, checkbox, afterlogin_string or "")
+
+    def _get_soup_with_driver(self, driver: Chrome, url: str, checkbox: bool = False,
+                             afterlogin_string: Optional[str] = None) -> BeautifulSoup:
+        """Load the URL in the browser, and parse a single snapshot of the
+           resulting page"""
+        self._load_page_in_driver(driver, url, checkbox, afterlogin_string)
+        with timings.measure('selenium.page_source'):
+            page_source = driver.page_source
+        return self._parse_html(page_source)
+
+    async def get_soup_from_url_async(self, client: AsyncHttpClient, url: str) -> BeautifulSoup:
+        """Async variant of `get_soup_from_url` for plain requests. Requests through
+           proxies or the response cache run `get_soup_from_url` in a worker thread"""
+        if self.config.use_proxy() \
+                or (self.response_cache is not None and parsing_results.get()):
+            return await asyncio.to_thread(self.get_soup_from_url, url)
+        resp = await client.get(url, headers=self.HEADERS)
+        self.log_unexpected_response(resp)
+        return await asyncio.to_thread(self._parse_html, resp.content)
+
+    async def get_page_async(self, client: AsyncHttpClient, search_url,
+                             driver=None, page_no=None) -> BeautifulSoup:
+        """Async variant of `get_page`. Crawlers that override `get_page`, and
+           requests through a webdriver, run `get_page` in a worker thread"""
+        if type(self).get_page is not Crawler.get_page or driver is not None:
+            return await asyncio.to_thread(self.get_page, search_url, driver, page_no)
+        return await self.get_soup_from_url_async(client, search_url)
+
+    def get_soup_with_cache(self, url: str, cache: ResponseCache) -> BeautifulSoup:
+        """Fetch the URL with a conditional request, and reuse the previously parsed
+           soup if the page has not been modified. Only used for search result
+           pages, which are fetched again in every hunt"""
+        headers = {**self.HEADERS, **cache.conditional_headers(url)}
+        resp = get_session().get(url, headers=headers, timeout=30)
+        if resp.status_code == 304:
+            soup = cache.get_soup(url)
+            if soup is not None:
+                logger.debug("Page not modified: %s", url)
+                return soup
+            resp = get_session().get(url, headers=self.HEADERS, timeout=30)
+        self.log_unexpected_response(resp)
+        if resp.status_code != 200:
+            return self._parse_html(resp.content)
+
+        digest = content_hash(resp.content)
+        soup = cache.get_soup(url, digest)
+        if soup is not None:
+            logger.debug("Page content unchanged: %s", url)
+            return soup
+        soup = self._parse_html(resp.content)
+        cache.store(url, resp, soup, digest)
+        return soup
+
+    def log_unexpected_response(self, resp):
+        """Log the response if the request did not succeed"""
+        if resp.status_code in (200, 304, 405):
+            return
+        user_agent = 'Unknown'
+        if 'User-Agent' in self.HEADERS:
+            user_agent = self.HEADERS['User-Agent']
+        logger.error("Got response (%i): %s\n%s",
+                     resp.status_code, resp.content, user_agent)
 
     def get_soup_with_proxy(self, url) -> BeautifulSoup:
         """Will try proxies until it's possible to crawl and return a soup"""
@@ -96,7 +261,7 @@ class Crawler(ABC):
             for proxy in proxies_list:
                 try:
                     # Very low proxy read timeout, or it will get stuck on slow proxies
-                    resp = requests.get(
+                    resp = get_session().get(
                         url,
                         headers=self.HEADERS,
                         proxies={"http": proxy, "https": proxy},
@@ -124,12 +289,37 @@ class Crawler(ABC):
             raise ProxyException(
                 "An error occurred while fetching proxies or content")
 
-        return BeautifulSoup(resp.content, 'lxml')
+        return self._parse_html(resp.content)
 
     def extract_data(self, soup):
         """Should be implemented in subclass"""
         raise NotImplementedError
 
+    def extract_data_cached(self, soup):
+        """Extract the exposes from a soup, skipping the extraction if the soup
+           is a cached page that has already been processed"""
+        if self.response_cache is None:
+            return self.extract_data(soup)
+        entries = self.response_cache.get_entries(soup)
+        if entries is not None:
+            return entries
+        entries = self.extract_data(soup)
+        self.response_cache.store_entries(soup, entries)
+        return entries
+
+    def set_seen_oracle(self, seen_oracle: Optional[Callable[[List[Any]], Set[Any]]]):
+        """Enable (or, with None, disable) incremental crawling. Paginating crawlers
+           stop at the first page on which the oracle knows every expose ID"""
+        self.seen_oracle = seen_oracle
+
+    def all_entries_seen(self, entries: List[Dict]) -> bool:
+        """True if incremental crawling is enabled and every expose in the list
+           has already been seen. Used to stop paginating early"""
+        if self.seen_oracle is None or len(entries) == 0:
+            return False
+        expose_ids = [entry['id'] for entry in entries]
+        return set(expose_ids) <= set(self.seen_oracle(expose_ids))
+
     # pylint: disable=unused-argument
     def get_results(self, search_url, max_pages=None):
         """Loads the exposes from the site, starting at the provided URL"""
@@ -139,7 +329,7 @@ class Crawler(ABC):
         soup = self.get_page(search_url)
 
         # get data from first page
-        entries = self.extract_data(soup)
+        entries = self.extract_data_cached(soup)
         logger.debug('Number of found entries: %d', len(entries))
 
         return entries
@@ -148,13 +338,33 @@ class Crawler(ABC):
         """Load as many exposes as possible from the provided URL"""
         if re.search(self.URL_PATTERN, url):
             try:
-                return self.get_results(url, max_pages)
+                with self._results_pages():
+                    return self.get_results(url, max_pages)
             except requests.exceptions.ConnectionError:
                 logger.warning(
                     "Connection to %s failed. Retrying.", url.split('/')[2])
                 return []
         return []
 
+    async def crawl_async(self, client: AsyncHttpClient, url, max_pages=None):
+        """Async variant of `crawl`. Crawlers that implement their own `get_results`
+           run it in a worker thread"""
+        if not re.search(self.URL_PATTERN, url):
+            return []
+        try:
+            with self._results_pages():
+                if type(self).get_results is not Crawler.get_results:
+                    return await asyncio.to_thread(self.get_results, url, max_pages)
+                logger.debug("Got search URL %s", url)
+                soup = await self.get_page_async(client, url)
+                entries = await asyncio.to_thread(self.extract_data_cached, soup)
+                logger.debug('Number of found entries: %d', len(entries))
+                return entries
+        except requests.exceptions.ConnectionError:
+            logger.warning(
+                "Connection to %s failed. Retrying.", url.split('/')[2])
+            return []
+
     def get_name(self):
         """Returns the name of this crawler"""
         return type(self).__name__
@@ -168,12 +378,13 @@ class Crawler(ABC):
                           max_tries=3)
     def resolve_geetest(self, driver):
         """Resolve GeeTest Captcha"""
+        geetest_script = driver.execute_script(GEETEST_SCRIPT)
         data = re.findall(
             "geetest_validate: obj.geetest_validate,\n.*?data: \"(.*)\"",
-            driver.page_source
+            geetest_script
         )[0]
         result = re.findall(
-            r"initGeetest\({(.*?)}", driver.page_source, re.DOTALL)
+            r"initGeetest\({(.*?)}", geetest_script, re.DOTALL)
 
         geetest = re.findall("gt: \"(.*?)\"", result[0])[0]
         challenge = re.findall("challenge: \"(.*?)\"", result[0])[0]
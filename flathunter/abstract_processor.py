@@ -1,5 +1,6 @@
 """Abstract class defining the 'Processor' interface"""
-from typing import Dict
+import asyncio
+from typing import Dict, List
 
 class Processor:
     """Processor interface. Flathunter runs sequences of exposes through
@@ -12,3 +13,25 @@ class Processor:
     def process_exposes(self, exposes):
         """Apply the processor to every expose in the sequence"""
         return map(self.process_expose, exposes)
+
+    def process_batch(self, exposes: List[Dict]) -> List[Dict]:
+        """Process a batch of exposes, returning the exposes to pass on. Processors
+           that can handle several exposes more cheaply at once override this;
+           the processor chain then hands them batches of exposes"""
+        return [self.process_expose(expose) for expose in exposes]
+
+    # pylint: disable=unused-argument
+    async def process_expose_async(self, expose: Dict, client) -> Dict:
+        """Process an expose from the asyncio pipeline, sending any HTTP requests
+           with the given `AsyncHttpClient`. By default, `process_expose` runs in
+           a worker thread"""
+        return await asyncio.to_thread(self.process_expose, expose)
+
+    def finish(self):
+        """Called by the processor chain once the sequence of exposes has been
+           processed. Processors that buffer or defer work complete it here"""
+
+
+def supports_batches(processor: Processor) -> bool:
+    """True if the processor implements its own `process_batch`"""
+    return type(processor).process_batch is not Processor.process_batch
@@ -0,0 +1,109 @@
+"""Asynchronous HTTP client for the asyncio hunt pipeline. Requests are sent with
+aiohttp when it is installed; otherwise they run on the shared, pooled `requests`
+sessions in worker threads, so the pipeline works the same either way"""
+import asyncio
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping, Optional
+
+import requests
+
+from flathunter.http_pool import get_rate_limiter, get_session
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+@dataclass
+class AsyncResponse:
+    """Status, headers and body of a completed request. Header lookups are
+       case-insensitive, as with `requests`"""
+    status_code: int
+    headers: Mapping[str, str]
+    content: bytes
+
+    @property
+    def text(self) -> str:
+        """The body, decoded as UTF-8"""
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self) -> Any:
+        """The body, decoded as JSON"""
+        return json.loads(self.content)
+
+
+class AsyncHttpClient:
+    """Sends HTTP requests from coroutines.
+
+    With aiohttp, all requests share one `ClientSession` (created on first use,
+    inside the running event loop) that keeps at most `max_connections`
+    connections open, and `max_connections_per_host` to any one host. Without
+    aiohttp, each request runs `requests` in a worker thread. In both cases,
+    requests wait for the rate limiter of the shared connection pools, and
+    connection failures raise `requests.exceptions.ConnectionError` and other
+    failures `requests.exceptions.RequestException`, so callers handle errors
+    the same way as for synchronous requests."""
+
+    def __init__(self, max_connections: int = 100, max_connections_per_host: int = 10):
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.session = None
+
+    def _get_session(self):
+        """Return the aiohttp session, creating it on first use"""
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_connections,
+                                             limit_per_host=self.max_connections_per_host)
+            self.session = aiohttp.ClientSession(connector=connector)
+        return self.session
+
+    async def request(self, method: str, url: str,
+                      headers: Optional[Dict[str, str]] = None,
+                      data: Optional[Any] = None,
+                      timeout: float = 30) -> AsyncResponse:
+        """Send a request and read the complete response"""
+        if aiohttp is None:
+            return await asyncio.to_thread(self._request_in_thread,
+                                           method, url, headers, data, timeout)
+        rate_limiter = get_rate_limiter()
+        if rate_limiter is not None:
+            await rate_limiter.wait_async(url)
+        try:
+            async with self._get_session().request(
+                    method, url, headers=headers, data=data,
+                    timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                content = await response.read()
+                return AsyncResponse(response.status, response.headers, content)
+        except aiohttp.ClientConnectionError as error:
+            raise requests.exceptions.ConnectionError(str(error)) from error
+        except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+            raise requests.exceptions.RequestException(str(error)) from error
+
+    @staticmethod
+    def _request_in_thread(method, url, headers, data, timeout) -> AsyncResponse:
+        """Send a request with the pooled session of the current (worker) thread"""
+        response = get_session().request(method, url, headers=headers, data=data,
+                                         timeout=timeout)
+        return AsyncResponse(response.status_code, response.headers, response.content)
+
+    async def get(self, url: str, **kwargs) -> AsyncResponse:
+        """Send a GET request"""
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> AsyncResponse:
+        """Send a POST request"""
+        return await self.request('POST', url, **kwargs)
+
+    async def close(self):
+        """Close the connections of the aiohttp session"""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self) -> 'AsyncHttpClient':
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
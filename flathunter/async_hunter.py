@@ -0,0 +1,119 @@
+"""Flathunter implementation running the hunt on an asyncio event loop"""
+import asyncio
+import traceback
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import requests
+
+from flathunter.abstract_processor import Processor, supports_batches
+from flathunter.async_http import AsyncHttpClient
+from flathunter.captcha.captcha_solver import CaptchaUnsolvableError
+from flathunter.crawl_executor import domain_of
+from flathunter.hunter import Hunter
+from flathunter.logging import logger
+from flathunter.processor import ParallelProcessor, ProcessorChain
+from flathunter.utils.timing import timings
+
+
+class AsyncHunter(Hunter):
+    """Hunter that crawls and processes exposes with coroutines.
+
+    All search URLs are crawled at the same time, at most
+    `crawl.max_workers_per_domain` per portal. The exposes then pass through
+    the stages of the usual processor chain: stages that handle batches (or a
+    whole stream of exposes) run in a worker thread, and all other stages
+    process the exposes concurrently, with `process_expose_async`. No more
+    than `async.max_concurrency` crawls or expose stages run at once.
+
+    Crawlers and processors that have no coroutine implementation run their
+    synchronous methods in worker threads, so third-party crawlers keep
+    working unchanged."""
+
+    def hunt_flats(self, max_pages: None|int = None):
+        """Crawl, process and filter exposes on a new event loop"""
+        return asyncio.run(self._hunt_with_executor(max_pages))
+
+    async def _hunt_with_executor(self, max_pages):
+        """Size the thread pool for the synchronous adapters, then hunt"""
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(
+            max_workers=self.config.async_max_concurrency(), thread_name_prefix="hunter"))
+        return await self.hunt_flats_async(max_pages)
+
+    async def hunt_flats_async(self, max_pages: None|int = None) -> List[Dict]:
+        """Crawl, process and filter exposes"""
+        processor_chain = self.build_processor_chain()
+        async with AsyncHttpClient(self.config.async_max_concurrency(),
+                                   self.config.http_pool_maxsize()) as client:
+            exposes = await self.crawl_for_exposes_async(client, max_pages)
+            result = await self.process_async(processor_chain, exposes, client)
+
+        for expose in result:
+            logger.info('New offer: %s', expose['title'])
+        timings.log_and_reset()
+        return result
+
+    async def crawl_for_exposes_async(self, client: AsyncHttpClient,
+                                      max_pages=None) -> List[Dict]:
+        """Crawl all configured URLs concurrently, returning the exposes in the
+           order of the URLs"""
+        limit = asyncio.Semaphore(self.config.async_max_concurrency())
+        per_domain = self.config.crawl_max_workers_per_domain()
+        domain_limits: Dict[str, asyncio.Semaphore] = \
+            defaultdict(lambda: asyncio.Semaphore(per_domain))
+
+        async def try_crawl(searcher, url):
+            async with domain_limits[domain_of(url)], limit:
+                try:
+                    crawl_async = getattr(searcher, 'crawl_async', None)
+                    if crawl_async is None:
+                        return await asyncio.to_thread(searcher.crawl, url, max_pages)
+                    return await crawl_async(client, url, max_pages)
+                except CaptchaUnsolvableError:
+                    logger.info("Error while scraping url %s: the captcha was unsolvable", url)
+                    return []
+                except requests.exceptions.RequestException:
+                    logger.info("Error while scraping url %s:\n%s", url, traceback.format_exc())
+                    return []
+
+        results = await asyncio.gather(*(try_crawl(searcher, url)
+                                         for url, searcher in self.searchers_for_target_urls()))
+        return [expose for exposes in results for expose in exposes]
+
+    async def process_async(self, processor_chain: ProcessorChain, exposes: List[Dict],
+                            client: AsyncHttpClient) -> List[Dict]:
+        """Run the exposes through the processors of the chain, stage by stage,
+           finishing every processor at the end"""
+        limit = asyncio.Semaphore(self.config.async_max_concurrency())
+        try:
+            for processor in processor_chain.processors:
+                exposes = await self._apply_async(processor_chain, processor,
+                                                  exposes, client, limit)
+        finally:
+            await asyncio.to_thread(processor_chain.finish)
+        return exposes
+
+    @staticmethod
+    async def _apply_async(processor_chain: ProcessorChain, processor: Processor,
+                           exposes: List[Dict], client: AsyncHttpClient,
+                           limit: asyncio.Semaphore) -> List[Dict]:
+        """Run a single processor over the list of exposes"""
+        if isinstance(processor, ParallelProcessor):
+            # the event loop already processes the exposes concurrently
+            processor = processor.processor
+        if processor_chain.batch_size > 1 and supports_batches(processor):
+            size = processor_chain.batch_size
+            result = []
+            for start in range(0, len(exposes), size):
+                result.extend(await asyncio.to_thread(processor.process_batch,
+                                                      exposes[start:start + size]))
+            return result
+        if type(processor).process_exposes is not Processor.process_exposes:
+            return await asyncio.to_thread(lambda: list(processor.process_exposes(exposes)))
+
+        async def process(expose):
+            async with limit:
+                return await processor.process_expose_async(expose, client)
+
+        return list(await asyncio.gather(*(process(expose) for expose in exposes)))
@@ -7,6 +7,7 @@ import backoff
 import requests
 
 from flathunter.logging import logger
+from flathunter.http_pool import get_session
 from flathunter.captcha.captcha_solver import (
     CaptchaSolver,
     CaptchaUnsolvableError,
@@ -61,7 +62,7 @@ class ImageTyperzSolver(CaptchaSolver):
 
     @backoff.on_exception(**CaptchaSolver.backoff_options)
     def __submit_imagetyperz_request(self, submit_url: str, params: Dict[str, str]) -> str:
-        submit_response = requests.get(submit_url, params=params, timeout=30)
+        submit_response = get_session().get(submit_url, params=params, timeout=30)
         logger.debug("Got response from imagetyperz/request: %s:", submit_response.text)
 
         if "error" in submit_response.text.lower():
@@ -83,7 +84,7 @@ class ImageTyperzSolver(CaptchaSolver):
         }
 
         while True:
-            retrieve_response = requests.get(retrieve_url, params=params, timeout=30)
+            retrieve_response = get_session().get(retrieve_url, params=params, timeout=30)
             logger.debug("Got response from imagetyperz: %s:", retrieve_response.text)
             response = json.loads(retrieve_response.text)[0]
             if response["Status"] == "Pending":
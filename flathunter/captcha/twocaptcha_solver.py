@@ -6,6 +6,7 @@ import backoff
 import requests
 
 from flathunter.logging import logger
+from flathunter.http_pool import get_session
 from flathunter.captcha.captcha_solver import (
     CaptchaSolver,
     CaptchaBalanceEmpty,
@@ -50,7 +51,7 @@ class TwoCaptchaSolver(CaptchaSolver):
     @backoff.on_exception(**CaptchaSolver.backoff_options)
     def __submit_2captcha_request(self, params: Dict[str, str]) -> str:
         submit_url = "http://2captcha.com/in.php"
-        submit_response = requests.post(submit_url, params=params, timeout=30)
+        submit_response = get_session().post(submit_url, params=params, timeout=30)
         logger.debug("Got response from 2captcha/in: %s", submit_response.text)
 
         if not submit_response.text.startswith("OK"):
@@ -68,7 +69,7 @@ class TwoCaptchaSolver(CaptchaSolver):
             "id": captcha_id,
         }
         while True:
-            retrieve_response = requests.get(retrieve_url, params=params, timeout=30)
+            retrieve_response = get_session().get(retrieve_url, params=params, timeout=30)
             logger.debug("Got response from 2captcha/res: %s", retrieve_response.text)
 
             if "CAPCHA_NOT_READY" in retrieve_response.text:
@@ -9,6 +9,7 @@ import undetected_chromedriver as uc
 
 from flathunter.logging import logger
 from flathunter.exceptions import ChromeNotFound
+from flathunter.resource_blocking import ALWAYS_BLOCKED
 
 CHROME_VERSION_REGEXP = re.compile(r'.* (\d+\.\d+\.\d+\.\d+)( .*)?')
 WINDOWS_CHROME_REG_PATH = r'HKEY_CURRENT_USER\Software\Google\Chrome\BLBeacon'
@@ -78,6 +79,6 @@ def get_chrome_driver(driver_arguments):
     )
 
     driver.execute_cdp_cmd('Network.setBlockedURLs',
-        {"urls": ["https://api.geetest.com/get.*"]})
+        {"urls": list(ALWAYS_BLOCKED)})
     driver.execute_cdp_cmd('Network.enable', {})
     return driver
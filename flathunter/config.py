@@ -1,11 +1,14 @@
 """Wrap configuration options as an object"""
 import os
-from typing import Optional, Dict, Any, List
+import re
+from typing import Optional, Dict, Any, List, Tuple
+from urllib.parse import urlparse
 
 import json
 import yaml
 from dotenv import load_dotenv
 
+from flathunter.abstract_crawler import Crawler
 from flathunter.captcha.captcha_solver import CaptchaSolver
 from flathunter.captcha.imagetyperz_solver import ImageTyperzSolver
 from flathunter.captcha.twocaptcha_solver import TwoCaptchaSolver
@@ -20,6 +23,7 @@ from flathunter.crawler.vrmimmo import VrmImmo
 from flathunter.crawler.subito import Subito
 from flathunter.filter import Filter
 from flathunter.logging import logger
+from flathunter.resource_blocking import DEFAULT_BLOCKED_TYPES, RESOURCE_TYPE_PATTERNS
 from flathunter.exceptions import ConfigException
 
 load_dotenv()
@@ -105,6 +109,7 @@ Preis: {price}
             config = {}
         self.config = config
         self.__searchers__ = []
+        self.__searchers_by_host__ = {}
         self.check_deprecated()
 
     def __iter__(self):
@@ -128,6 +133,7 @@ Preis: {price}
             MeineStadt(self),
             VrmImmo(self)
         ]
+        self.__searchers_by_host__ = {}
 
     def check_deprecated(self):
         """Notifies user of deprecated config items"""
@@ -167,11 +173,30 @@ Preis: {price}
     def set_searchers(self, searchers):
         """Update the active search plugins"""
         self.__searchers__ = searchers
+        self.__searchers_by_host__ = {}
 
     def searchers(self):
         """Get the list of search plugins"""
         return self.__searchers__
 
+    def searcher_for_url(self, url: str) -> Optional[Crawler]:
+        """Find the search plugin responsible for a (search or expose) URL.
+
+        Results are indexed by scheme and host, so the URL patterns of the
+        search plugins are only scanned once per host."""
+        parsed = urlparse(url)
+        host = f"{parsed.scheme}://{parsed.netloc}"
+        if host not in self.__searchers_by_host__:
+            self.__searchers_by_host__[host] = next(
+                (searcher for searcher in self.__searchers__
+                 if re.search(searcher.URL_PATTERN, host)), None)
+        searcher = self.__searchers_by_host__[host]
+        if searcher is not None:
+            return searcher
+        # Fall back to matching the full URL, for patterns that include a path
+        return next((searcher for searcher in self.__searchers__
+                     if re.search(searcher.URL_PATTERN, url)), None)
+
     def get_filter(self):
         """Read the configured filter"""
         builder = Filter.builder()
@@ -201,6 +226,166 @@ Preis: {price}
         """List of target URLs for crawling"""
         return self._read_yaml_path('urls', [])
 
+    def crawl_max_workers(self) -> int:
+        """Maximum number of search URLs that are crawled at the same time"""
+        return int(self._read_yaml_path('crawl.max_workers', 1))
+
+    def crawl_max_workers_per_domain(self) -> int:
+        """Maximum number of concurrent crawls against the same portal"""
+        return int(self._read_yaml_path('crawl.max_workers_per_domain', 1))
+
+    def crawl_incremental(self) -> bool:
+        """True if crawlers should stop paginating at a page of already-seen exposes"""
+        return bool(self._read_yaml_path('crawl.incremental', False))
+
+    def crawl_response_cache(self) -> bool:
+        """True if search result pages should be fetched with conditional requests,
+           reusing the parsed page when it has not changed"""
+        return bool(self._read_yaml_path('crawl.response_cache', False))
+
+    def html_parser(self) -> str:
+        """Name of the parser for fetched pages (see `flathunter.html_parser`)"""
+        return str(self._read_yaml_path('crawl.html_parser', 'bs4'))
+
+    def processing_workers(self) -> int:
+        """Number of exposes that network-bound processors work on at the same time"""
+        return int(self._read_yaml_path('processing.workers', 1))
+
+    def processing_ordered(self) -> bool:
+        """False if parallel processors may pass on exposes in the order they finish"""
+        return bool(self._read_yaml_path('processing.ordered', True))
+
+    def processing_batch_size(self) -> int:
+        """Number of exposes handed at once to processors that work on batches.
+           1 (the default) disables batching"""
+        return int(self._read_yaml_path('processing.batch_size', 1))
+
+    def processing_batch_delay(self) -> float:
+        """Seconds after which a batch of exposes is passed on, even if not full"""
+        return float(self._read_yaml_path('processing.batch_delay', 2.0))
+
+    def async_enabled(self) -> bool:
+        """True if the hunt should run on an asyncio event loop"""
+        return bool(self._read_yaml_path('async.enabled', False))
+
+    def async_max_concurrency(self) -> int:
+        """Maximum number of crawls or expose stages in flight in the asyncio hunt"""
+        return int(self._read_yaml_path('async.max_concurrency', 100))
+
+    def digest_enabled(self) -> bool:
+        """True if the exposes of a hunt should be sent in a few combined messages"""
+        return bool(self._read_yaml_path('digest.enabled', False))
+
+    def digest_min_exposes(self) -> int:
+        """Fewest exposes in a hunt for which a digest is sent, instead of one
+           message per expose"""
+        return int(self._read_yaml_path('digest.min_exposes', 3))
+
+    def digest_max_exposes_per_message(self) -> int:
+        """Most exposes described in one digest message"""
+        return int(self._read_yaml_path('digest.max_exposes_per_message', 10))
+
+    def digest_max_message_length(self) -> int:
+        """Longest digest message, in characters"""
+        return int(self._read_yaml_path('digest.max_message_length', 4000))
+
+    def driver_pool_size(self) -> int:
+        """Most Chrome drivers shared by the Selenium-backed crawlers"""
+        return int(self._read_yaml_path('driver_pool.size', 1))
+
+    def driver_pool_max_page_loads(self) -> int:
+        """Number of page loads after which a Chrome driver is restarted"""
+        return int(self._read_yaml_path('driver_pool.max_page_loads', 100))
+
+    def driver_pool_max_rss_growth_mb(self) -> Optional[int]:
+        """Growth of a Chrome driver's memory use, in megabytes, after which
+           it is restarted. None to never restart drivers for their memory use"""
+        growth = self._read_yaml_path('driver_pool.max_rss_growth_mb', 512)
+        return None if growth is None else int(growth)
+
+    def resource_blocking_types(self) -> List[str]:
+        """Resource types Chrome does not load for the crawlers"""
+        types = self._read_yaml_path('resource_blocking.types', None)
+        if types is None:
+            return list(DEFAULT_BLOCKED_TYPES)
+        unknown = [str(resource_type) for resource_type in types
+                   if resource_type not in RESOURCE_TYPE_PATTERNS]
+        if len(unknown) > 0:
+            raise ConfigException(
+                f"Unknown resource types in resource_blocking.types: {', '.join(unknown)}, "
+                f"expected some of: {', '.join(RESOURCE_TYPE_PATTERNS)}")
+        return list(types)
+
+    def resource_blocking_urls(self) -> List[str]:
+        """Further URL patterns Chrome does not load for the crawlers"""
+        return list(self._read_yaml_path('resource_blocking.urls', []) or [])
+
+    def resource_blocking_allow(self) -> List[str]:
+        """Resource types or URL patterns that are loaded, even if they
+           would be blocked otherwise"""
+        return list(self._read_yaml_path('resource_blocking.allow', []) or [])
+
+    def outbox_enabled(self) -> bool:
+        """True if notifications should be queued in the database, and delivered
+           (and retried) by a background worker"""
+        return bool(self._read_yaml_path('outbox.enabled', False))
+
+    def outbox_max_attempts(self) -> int:
+        """Number of attempts to deliver a notification before giving up"""
+        return int(self._read_yaml_path('outbox.max_attempts', 10))
+
+    def outbox_base_delay(self) -> float:
+        """Seconds before the first retry of a notification, doubling after each retry"""
+        return float(self._read_yaml_path('outbox.base_delay', 30.0))
+
+    def outbox_max_delay(self) -> float:
+        """Longest wait, in seconds, between attempts to deliver a notification"""
+        return float(self._read_yaml_path('outbox.max_delay', 3600.0))
+
+    def outbox_poll_interval(self) -> float:
+        """Seconds between checks for notifications that are due to be retried"""
+        return float(self._read_yaml_path('outbox.poll_interval', 60.0))
+
+    def write_behind_enabled(self) -> bool:
+        """True if exposes should be saved to the database from a background thread"""
+        return bool(self._read_yaml_path('write_behind.enabled', False))
+
+    def write_behind_batch_size(self) -> int:
+        """Number of exposes to save to the database in one transaction"""
+        return int(self._read_yaml_path('write_behind.batch_size', 50))
+
+    def write_behind_max_delay(self) -> float:
+        """Seconds that an expose may wait in the write-behind queue before it is saved"""
+        return float(self._read_yaml_path('write_behind.max_delay', 1.0))
+
+    def write_behind_queue_size(self) -> int:
+        """Number of unsaved exposes after which the pipeline waits for the writer"""
+        return int(self._read_yaml_path('write_behind.queue_size', 1000))
+
+    def http_pool_connections(self) -> int:
+        """Number of hosts to keep a pool of HTTP connections for"""
+        return int(self._read_yaml_path('http.pool_connections', 10))
+
+    def http_pool_maxsize(self) -> int:
+        """Number of HTTP connections to keep open per host"""
+        return int(self._read_yaml_path('http.pool_maxsize', 10))
+
+    def http_pool_block(self) -> bool:
+        """True if requests should wait for a free connection when a pool is exhausted"""
+        return bool(self._read_yaml_path('http.pool_block', False))
+
+    def http_rate_limits(self) -> Dict[str, Tuple[float, int]]:
+        """Requests per second and burst size per host, overriding the default
+           rate limits. A rate of 0 removes the limit for a host"""
+        limits = self._read_yaml_path('http.rate_limits', {}) or {}
+        return {host: (float(limit.get('rate', 0) or 0), int(limit.get('burst', 1)))
+                for host, limit in limits.items()}
+
+    def http_host_limits(self) -> Dict[str, int]:
+        """Per-host overrides of the number of HTTP connections to keep open"""
+        limits = self._read_yaml_path('http.host_limits', {}) or {}
+        return {host: int(limit) for host, limit in limits.items()}
+
     def verbose_logging(self):
         """Return true if logging should be verbose"""
         return self._read_yaml_path('verbose', None) is not None
@@ -266,6 +451,14 @@ Preis: {price}
         """Static list of receiver IDs for notification messages"""
         return self._read_yaml_path('telegram.receiver_ids', [])
 
+    def telegram_dispatch_workers(self) -> int:
+        """Number of chats that Telegram messages are sent to at the same time"""
+        return int(self._read_yaml_path('telegram.dispatch_workers', 8))
+
+    def telegram_max_retries(self) -> int:
+        """Number of times a Telegram message is retried after 'Too Many Requests'"""
+        return int(self._read_yaml_path('telegram.max_retries', 1))
+
     def mattermost_webhook_url(self):
         """Webhook for sending Mattermost messages"""
         return self._read_yaml_path('mattermost.webhook_url', None)
@@ -0,0 +1,60 @@
+"""Run crawl jobs for several search URLs concurrently"""
+from collections import defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import chain
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Tuple
+from urllib.parse import urlparse
+
+CrawlJob = Tuple[str, Callable[[], List[Dict]]]
+
+
+def domain_of(url: str) -> str:
+    """Return the host part of a URL, used to group crawls by portal"""
+    return urlparse(url).netloc
+
+
+class CrawlExecutor:
+    """Runs crawl jobs on a bounded thread pool.
+
+    Concurrency is capped overall by `max_workers`, and per domain by
+    `max_workers_per_domain`. Jobs for the same domain are handed out to at
+    most that many workers, so a busy portal never occupies idle threads.
+    Results are streamed in job order: the exposes of a job are yielded as
+    soon as it, and every job before it, has completed."""
+
+    def __init__(self, max_workers: int = 1, max_workers_per_domain: int = 1):
+        self.max_workers = max(1, max_workers)
+        self.max_workers_per_domain = max(1, max_workers_per_domain)
+
+    def run(self, jobs: Iterable[CrawlJob]) -> Iterator[Dict]:
+        """Run all jobs, returning a stream of the exposes they found"""
+        jobs = list(jobs)
+        if self.max_workers == 1 or len(jobs) <= 1:
+            return chain.from_iterable(crawl() for _, crawl in jobs)
+        return self._run_concurrently(jobs)
+
+    def _run_concurrently(self, jobs: List[CrawlJob]) -> Iterator[Dict]:
+        """Distribute the jobs over the thread pool, one queue per domain"""
+        results: List[Future] = [Future() for _ in jobs]
+        queues: Dict[str, Deque[int]] = defaultdict(deque)
+        for index, (url, _) in enumerate(jobs):
+            queues[domain_of(url)].append(index)
+
+        def drain(queue: Deque[int]):
+            while True:
+                try:
+                    index = queue.popleft()
+                except IndexError:
+                    return
+                try:
+                    results[index].set_result(jobs[index][1]())
+                except BaseException as error: # pylint: disable=broad-exception-caught
+                    results[index].set_exception(error)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers,
+                                thread_name_prefix="crawler") as pool:
+            for queue in queues.values():
+                for _ in range(min(self.max_workers_per_domain, len(queue))):
+                    pool.submit(drain, queue)
+            for result in results:
+                yield from result.result()
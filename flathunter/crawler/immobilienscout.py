@@ -1,5 +1,4 @@
 """Expose crawler for ImmobilienScout"""
-from typing import Optional
 import datetime
 import re
 
@@ -10,8 +9,6 @@ from selenium.webdriver import Chrome
 
 from flathunter.abstract_crawler import Crawler
 from flathunter.logging import logger
-from flathunter.chrome_wrapper import get_chrome_driver
-from flathunter.exceptions import DriverLoadException
 
 STATIC_URL_PATTERN = re.compile(r'https://www\.immobilienscout24\.de')
 
@@ -41,6 +38,10 @@ class Immobilienscout(Crawler):
 
     RESULT_LIMIT = 50
 
+    # The exposes are read from `window.IS24.resultList`, so the page does
+    # not need its stylesheets either
+    BLOCKED_RESOURCES = ('stylesheet',)
+
     FALLBACK_IMAGE_URL = "https://www.static-immobilienscout24.de/statpic/placeholder_house/" + \
                          "496c95154de31a357afa978cdb7f15f0_placeholder_medium.png"
 
@@ -48,7 +49,6 @@ class Immobilienscout(Crawler):
         super().__init__(config)
 
         self.config = config
-        self.driver = None
         self.checkbox = False
         self.afterlogin_string = None
         if "immoscout_cookie" in self.config:
@@ -57,22 +57,9 @@ class Immobilienscout(Crawler):
             self.checkbox = config.get_captcha_checkbox()
             self.afterlogin_string = config.get_captcha_afterlogin_string()
 
-    def get_driver(self) -> Optional[Chrome]:
-        """Lazy method to fetch the driver as required at runtime"""
-        if self.driver is not None:
-            return self.driver
-        if not (self.config.captcha_enabled() and self.captcha_solver):
-            return None
-        driver_arguments = self.config.captcha_driver_arguments()
-        self.driver = get_chrome_driver(driver_arguments)
-        return self.driver
-
-    def get_driver_force(self) -> Chrome:
-        """Fetch the driver, and throw an exception if it is not configured or available"""
-        res = self.get_driver()
-        if res is None:
-            raise DriverLoadException("Unable to load chrome driver when expected")
-        return res
+    def uses_driver(self) -> bool:
+        """Pages are loaded in Chrome if a captcha solver is configured"""
+        return bool(self.config.captcha_enabled() and self.captcha_solver)
 
     def get_results(self, search_url, max_pages=None):
         """Loads the exposes from the ImmoScout site, starting at the provided URL"""
@@ -89,38 +76,46 @@ class Immobilienscout(Crawler):
 
         # load first page to get number of entries
         page_no = 1
-        soup = self.get_page(search_url, self.get_driver(), page_no)
 
         # If we are using Selenium, just parse the results from the JSON in the page response
-        if self.get_driver() is not None:
-            return self.get_entries_from_javascript()
+        with self.checkout_driver() as driver:
+            if driver is not None:
+                self._load_page_in_driver(driver, search_url.format(page_no),
+                                         self.checkbox, self.afterlogin_string)
+                return self.get_entries_from_javascript(driver)
+
+        soup = self.get_page(search_url, None, page_no)
 
         no_of_results = get_result_count(soup)
 
         # get data from first page
-        entries = self.extract_data(soup)
+        entries = self.extract_data_cached(soup)
+        page_seen = self.all_entries_seen(entries)
 
         # iterate over all remaining pages
-        while len(entries) < min(no_of_results, self.RESULT_LIMIT) and \
+        while not page_seen and len(entries) < min(no_of_results, self.RESULT_LIMIT) and \
                 (max_pages is None or page_no < max_pages):
             logger.debug(
                 '(Next page) Number of entries: %d / Number of results: %d',
                 len(entries), no_of_results)
             page_no += 1
-            soup = self.get_page(search_url, self.get_driver(), page_no)
-            cur_entry = self.extract_data(soup)
-            if isinstance(cur_entry, list):
+            soup = self.get_page(search_url, None, page_no)
+            cur_entry = self.extract_data_cached(soup)
+            if not cur_entry:
                 break
             entries.extend(cur_entry)
+            page_seen = self.all_entries_seen(cur_entry)
+        if page_seen:
+            logger.debug('Stopped at page %d - all exposes on it have been seen', page_no)
         return entries
 
-    def get_entries_from_javascript(self):
+    def get_entries_from_javascript(self, driver: Chrome):
         """Get entries from JavaScript"""
         try:
-            result_json = self.get_driver_force().execute_script('return window.IS24.resultList;')
+            result_json = driver.execute_script('return window.IS24.resultList;')
         except JavascriptException:
             logger.warning("Unable to find IS24 variable in window")
-            if "Warum haben wir deine Anfrage blockiert?" in self.get_driver_force().page_source:
+            if "Warum haben wir deine Anfrage blockiert?" in driver.page_source:
                 logger.error(
                     "IS24 bot detection has identified our script as a bot - we've been blocked"
                 )
@@ -12,6 +12,7 @@ class Immowelt(Crawler):
     """Implementation of Crawler interface for ImmoWelt"""
 
     URL_PATTERN = re.compile(r'https://www\.immowelt\.de')
+    RESULTS_SUBTREE = 'main'
 
     def __init__(self, config):
         super().__init__(config)
@@ -1,20 +1,17 @@
 """Expose crawler for Ebay Kleinanzeigen"""
 import re
 import datetime
-from typing import Optional
 
 from bs4 import Tag
-from selenium.webdriver import Chrome
 
 from flathunter.abstract_crawler import Crawler
-from flathunter.chrome_wrapper import get_chrome_driver
-from flathunter.exceptions import DriverLoadException
 from flathunter.logging import logger
 
 class Kleinanzeigen(Crawler):
     """Implementation of Crawler interface for Ebay Kleinanzeigen"""
 
     URL_PATTERN = re.compile(r'https://www\.kleinanzeigen\.de')
+    RESULTS_SUBTREE = '#srchrslt-adtable'
     MONTHS = {
         "Januar": "01",
         "Februar": "02",
@@ -33,30 +30,20 @@ class Kleinanzeigen(Crawler):
     def __init__(self, config):
         super().__init__(config)
         self.config = config
-        self.driver = None
 
-
-    def get_driver(self) -> Optional[Chrome]:
-        """Lazy method to fetch the driver as required at runtime"""
-        if self.driver is not None:
-            return self.driver
-        driver_arguments = self.config.captcha_driver_arguments()
-        self.driver = get_chrome_driver(driver_arguments)
-        return self.driver
-
-    def get_driver_force(self) -> Chrome:
-        """Fetch the driver, and throw an exception if it is not configured or available"""
-        res = self.get_driver()
-        if res is None:
-            raise DriverLoadException("Unable to load chrome driver when expected")
-        return res
+    def uses_driver(self) -> bool:
+        """Kleinanzeigen pages are always loaded in Chrome"""
+        return True
 
     def get_page(self, search_url, driver=None, page_no=None):
         """Applies a page number to a formatted search URL and fetches the exposes at that page"""
-        return self.get_soup_from_url(search_url, driver=self.get_driver())
+        if driver is not None:
+            return self.get_soup_from_url(search_url, driver=driver)
+        with self.checkout_driver() as pooled_driver:
+            return self.get_soup_from_url(search_url, driver=pooled_driver)
 
     def get_expose_details(self, expose):
-        soup = self.get_page(expose['url'], self.get_driver())
+        soup = self.get_page(expose['url'])
         for detail in soup.find_all('li', {"class": "addetailslist--detail"}):
             if re.match(r'Verfügbar ab', detail.text):
                 date_string = re.match(r'(\w+) (\d{4})', detail.text)
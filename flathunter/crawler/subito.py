@@ -9,6 +9,8 @@ class Subito(Crawler):
     """Implementation of Crawler interface for Subito"""
 
     URL_PATTERN = re.compile(r'https://www\.subito\.it')
+    # The search results are read from the JSON state of the page
+    RESULTS_SUBTREE = 'script#__NEXT_DATA__'
 
     def __init__(self, config):
         super().__init__(config)
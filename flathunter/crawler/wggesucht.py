@@ -2,11 +2,11 @@
 import re
 from typing import Optional, List, Dict, Any, Union
 
-import requests
 from bs4 import BeautifulSoup, Tag
 
 from flathunter.logging import logger
 from flathunter.abstract_crawler import Crawler
+from flathunter.http_pool import new_session
 
 
 def get_title(title_row: Tag) -> str:
@@ -165,6 +165,9 @@ class WgGesucht(Crawler):
 
     URL_PATTERN = re.compile(r'https://www\.wg-gesucht\.de')
 
+    # The listings are all inside the main column
+    RESULTS_SUBTREE = '#main_column'
+
     def __init__(self, config):
         super().__init__(config)
         self.config = config
@@ -215,7 +218,7 @@ class WgGesucht(Crawler):
         necessary as we need to reload the page once for all filters to
         be applied correctly on wg-gesucht.
         """
-        sess = requests.session()
+        sess = new_session()
         # First page load to set filters; response is discarded
         sess.get(url, headers=self.HEADERS)
         # Second page load
@@ -227,11 +230,5 @@ class WgGesucht(Crawler):
         if self.config.use_proxy():
             return self.get_soup_with_proxy(url)
         if driver is not None:
-            driver.get(url)
-            if re.search("initGeetest", driver.page_source):
-                self.resolve_geetest(driver)
-            elif re.search("g-recaptcha", driver.page_source):
-                self.resolve_recaptcha(
-                    driver, checkbox, afterlogin_string or "")
-            return BeautifulSoup(driver.page_source, 'lxml')
-        return BeautifulSoup(resp.content, 'lxml')
+            return self._get_soup_with_driver(driver, url, checkbox, afterlogin_string)
+        return self._parse_html(resp.content)
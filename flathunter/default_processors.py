@@ -1,7 +1,5 @@
 """Built-in expose processor implementations. Used by the processor pipelines
    in flathunter and in the webservice"""
-import re
-
 from flathunter.logging import logger
 from flathunter.abstract_processor import Processor
 
@@ -15,6 +13,10 @@ class Filter(Processor):
     def process_exposes(self, exposes):
         return self.filter.filter(exposes)
 
+    def process_batch(self, exposes):
+        """Filter a batch of exposes, checking the seen IDs together"""
+        return list(self.filter.filter(exposes))
+
 class AddressResolver(Processor):
     """Processor to extract apartment addresses from expose links"""
 
@@ -25,11 +27,10 @@ class AddressResolver(Processor):
         """Fetches the expose from the expose URL and extracts the address"""
         if expose['address'].startswith('http'):
             url = expose['address']
-            for searcher in self.config.searchers():
-                if re.search(searcher.URL_PATTERN, url):
-                    expose['address'] = searcher.load_address(url)
-                    logger.debug("Loaded address %s for url %s", expose['address'], url)
-                    break
+            searcher = self.config.searcher_for_url(url)
+            if searcher is not None:
+                expose['address'] = searcher.load_address(url)
+                logger.debug("Loaded address %s for url %s", expose['address'], url)
         return expose
 
 class CrawlExposeDetails(Processor):
@@ -40,9 +41,9 @@ class CrawlExposeDetails(Processor):
 
     def process_expose(self, expose):
         """Fetches the page at exposes['url'] and extracts additional details from it"""
-        for searcher in self.config.searchers():
-            if re.search(searcher.URL_PATTERN, expose['url']):
-                expose = searcher.get_expose_details(expose)
+        searcher = self.config.searcher_for_url(expose['url'])
+        if searcher is not None:
+            expose = searcher.get_expose_details(expose)
         return expose
 
 class LambdaProcessor(Processor):
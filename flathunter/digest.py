@@ -0,0 +1,86 @@
+"""Digest mode: notify about all exposes of a hunt in a few combined messages,
+instead of one message per expose"""
+from typing import Dict, List, Optional
+
+from flathunter.abstract_processor import Processor
+
+# Separates the exposes within a digest message
+SEPARATOR = "\n\n"
+
+
+def format_expose(config, expose: Dict) -> str:
+    """Describe an expose with the configured message format"""
+    return config.message_format().format(
+        title=expose.get('title', 'N/A'),
+        rooms=expose.get('rooms', 'N/A'),
+        size=expose.get('size', 'N/A'),
+        price=expose.get('price', 'N/A'),
+        url=expose.get('url', 'N/A'),
+        address=expose.get('address', 'N/A'),
+        durations=expose.get('durations', '')
+    ).strip()
+
+
+def digest_messages(config, exposes: List[Dict], max_exposes: int,
+                    max_length: int) -> List[str]:
+    """Combine the descriptions of the exposes into messages of at most
+       `max_exposes` exposes and (where possible) `max_length` characters"""
+    groups: List[List[str]] = []
+    length = 0
+    for expose in exposes:
+        text = format_expose(config, expose)
+        if len(groups) == 0 or len(groups[-1]) >= max_exposes \
+                or length + len(SEPARATOR) + len(text) > max_length:
+            groups.append([])
+            length = 0
+        groups[-1].append(text)
+        length += len(SEPARATOR) + len(text)
+
+    messages = []
+    first = 1
+    for group in groups:
+        last = first + len(group) - 1
+        header = f"{len(exposes)} new offers" if len(groups) == 1 \
+            else f"New offers {first}-{last} of {len(exposes)}"
+        messages.append(header + ":" + SEPARATOR + SEPARATOR.join(group))
+        first = last + 1
+    return messages
+
+
+def digest_for(config, exposes: List[Dict]) -> Optional[List[str]]:
+    """The digest messages about the exposes, or None if digests are disabled
+       or the exposes are too few and should be sent one by one"""
+    if not config.digest_enabled() or len(exposes) < config.digest_min_exposes():
+        return None
+    return digest_messages(config, exposes, config.digest_max_exposes_per_message(),
+                           config.digest_max_message_length())
+
+
+class DigestProcessor(Processor):
+    """Collects the exposes passing through the chain, and sends them with the
+       wrapped notifier once the chain has finished: as a few digest messages,
+       or one by one if fewer than `digest.min_exposes` exposes were found"""
+
+    def __init__(self, config, sender):
+        self.config = config
+        self.sender = sender
+        self.exposes: List[Dict] = []
+
+    def process_expose(self, expose: Dict) -> Dict:
+        """Collect an expose for the digest"""
+        self.exposes.append(expose)
+        return expose
+
+    def finish(self):
+        """Send the collected exposes"""
+        exposes, self.exposes = self.exposes, []
+        try:
+            messages = digest_for(self.config, exposes)
+            if messages is None:
+                for expose in exposes:
+                    self.sender.process_expose(expose)
+            else:
+                for message in messages:
+                    self.sender.notify(message)
+        finally:
+            self.sender.finish()
@@ -0,0 +1,189 @@
+"""Pool of Chrome WebDriver instances, shared by all Selenium-backed crawlers.
+Crawlers check a driver out for each page load and return it afterwards, so a
+few browsers serve every crawler, and several crawls can use Selenium at once"""
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from selenium.common.exceptions import WebDriverException
+
+from flathunter.chrome_wrapper import get_chrome_driver
+from flathunter.logging import logger
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def process_tree_rss(pid: Optional[int]) -> Optional[int]:
+    """Resident memory, in bytes, of a process and all its descendants. Only
+       available on Linux; returns None elsewhere, or if the process is gone"""
+    if pid is None or not os.path.isdir('/proc'):
+        return None
+    children: Dict[int, List[int]] = {}
+    rss: Dict[int, int] = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', encoding='utf-8') as stat_file:
+                # the fields after the command name, which may contain spaces
+                fields = stat_file.read().rsplit(')', 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        children.setdefault(int(fields[1]), []).append(int(entry))
+        rss[int(entry)] = int(fields[21]) * PAGE_SIZE
+    if pid not in rss:
+        return None
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        total += rss.get(current, 0)
+        pending.extend(children.get(current, []))
+    return total
+
+
+@dataclass
+class PooledDriver:
+    """A driver in the pool, with the bookkeeping needed to recycle it"""
+    driver: Any
+    page_loads: int = 0
+    initial_rss: Optional[int] = None
+    broken: bool = field(default=False)
+    blocked_urls: Optional[List[str]] = None
+
+    def rss(self) -> Optional[int]:
+        """Current resident memory of the browser"""
+        return process_tree_rss(getattr(self.driver, 'browser_pid', None))
+
+
+class DriverPool:
+    """Hands out up to `size` WebDriver instances, created by `factory` as needed.
+
+    `checkout` blocks while all drivers are in use. Returned drivers are kept
+    for the next checkout, unless they have served `max_page_loads` checkouts,
+    their browser has grown by more than `max_rss_growth_mb` megabytes, or an
+    exception from the driver escaped the checkout; such drivers are quit, and
+    replaced when next needed. Idle drivers are checked to be responsive before
+    they are handed out again."""
+
+    def __init__(self, factory: Callable[[], Any], size: int = 1,
+                 max_page_loads: int = 100, max_rss_growth_mb: Optional[int] = 512):
+        self.factory = factory
+        self.size = max(1, size)
+        self.max_page_loads = max_page_loads
+        self.max_rss_growth = None if max_rss_growth_mb is None \
+            else max_rss_growth_mb * 1024 * 1024
+        self.idle: List[PooledDriver] = []
+        self.slots = threading.BoundedSemaphore(self.size)
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def from_config(config) -> 'DriverPool':
+        """Create a pool of Chrome drivers, as configured"""
+        return DriverPool(partial(get_chrome_driver, config.captcha_driver_arguments()),
+                          size=config.driver_pool_size(),
+                          max_page_loads=config.driver_pool_max_page_loads(),
+                          max_rss_growth_mb=config.driver_pool_max_rss_growth_mb())
+
+    @contextmanager
+    def checkout(self, blocked_urls: Optional[List[str]] = None) -> Iterator[Any]:
+        """Context holding a driver for exclusive use. If given, the driver
+           blocks requests to the `blocked_urls` patterns while it is held"""
+        self.slots.acquire() # pylint: disable=consider-using-with
+        try:
+            pooled = self._take_idle() or self._create()
+            try:
+                if blocked_urls is not None and blocked_urls != pooled.blocked_urls:
+                    pooled.driver.execute_cdp_cmd('Network.setBlockedURLs',
+                                                  {"urls": blocked_urls})
+                    pooled.blocked_urls = blocked_urls
+                yield pooled.driver
+            except WebDriverException:
+                pooled.broken = True
+                raise
+            finally:
+                self._return(pooled)
+        finally:
+            self.slots.release()
+
+    def _take_idle(self) -> Optional[PooledDriver]:
+        """Take a responsive idle driver, quitting the ones that are not"""
+        while True:
+            with self.lock:
+                if len(self.idle) == 0:
+                    return None
+                pooled = self.idle.pop()
+            if self.is_healthy(pooled.driver):
+                return pooled
+            logger.info("Replacing unresponsive Chrome driver")
+            self._quit(pooled)
+
+    def _create(self) -> PooledDriver:
+        """Start a new driver"""
+        pooled = PooledDriver(self.factory())
+        pooled.initial_rss = pooled.rss()
+        return pooled
+
+    def _return(self, pooled: PooledDriver):
+        """Keep a driver for reuse, or quit it if it should be recycled"""
+        pooled.page_loads += 1
+        if self.should_recycle(pooled):
+            self._quit(pooled)
+            return
+        with self.lock:
+            self.idle.append(pooled)
+
+    def should_recycle(self, pooled: PooledDriver) -> bool:
+        """True if a returned driver should be quit instead of reused"""
+        if pooled.broken:
+            return True
+        if pooled.page_loads >= self.max_page_loads:
+            logger.debug("Recycling Chrome driver after %d page loads", pooled.page_loads)
+            return True
+        if self.max_rss_growth is not None and pooled.initial_rss is not None:
+            rss = pooled.rss()
+            if rss is not None and rss - pooled.initial_rss > self.max_rss_growth:
+                logger.debug("Recycling Chrome driver using %d MB", rss // (1024 * 1024))
+                return True
+        return False
+
+    @staticmethod
+    def is_healthy(driver) -> bool:
+        """True if the browser still responds"""
+        try:
+            driver.execute_script('return 1')
+            return True
+        except WebDriverException:
+            return False
+
+    @staticmethod
+    def _quit(pooled: PooledDriver):
+        """Quit a driver, ignoring errors from browsers that are already gone"""
+        try:
+            pooled.driver.quit()
+        except (WebDriverException, OSError):
+            logger.debug("Error while quitting Chrome driver", exc_info=True)
+
+    def close(self):
+        """Quit all idle drivers"""
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for pooled in idle:
+            self._quit(pooled)
+
+
+_pools: Dict[Tuple[str, ...], DriverPool] = {}
+_pools_lock = threading.Lock()
+
+
+def shared_driver_pool(config) -> DriverPool:
+    """Return the pool shared by all crawlers starting Chrome with the same
+       driver arguments"""
+    key = tuple(config.captcha_driver_arguments() or [])
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = DriverPool.from_config(config)
+        return _pools[key]
@@ -0,0 +1,92 @@
+"""Write-behind persistence of exposes, so that saving exposes does not hold up
+the processor chain that sends the notifications"""
+import queue
+import time
+from typing import Dict, List
+
+from flathunter.logging import logger
+from flathunter.utils.background import BackgroundThread
+
+# Markers passed through the queue to control the writer thread
+_FLUSH = object()
+_STOP = object()
+
+
+class ExposeWriter:
+    """Saves exposes from a background thread, in batches.
+
+    Exposes are queued by `save`, and the writer thread group-commits them with
+    the `save_exposes` method of the ID maintainer as soon as `batch_size`
+    exposes are waiting, or `max_delay` seconds after the oldest of them was
+    queued. `max_delay` is therefore the window in which queued exposes can be
+    lost on a crash. When `queue_size` exposes are waiting, `save` blocks until
+    the writer catches up. The queue is flushed on `close`, and at exit."""
+
+    def __init__(self, id_watch, batch_size: int = 50, max_delay: float = 1.0,
+                 queue_size: int = 1000):
+        self.id_watch = id_watch
+        self.batch_size = max(1, batch_size)
+        self.max_delay = max_delay
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.thread = BackgroundThread("expose-writer", self._run,
+                                       lambda: self.queue.put(_STOP))
+
+    @staticmethod
+    def from_config(config, id_watch) -> 'ExposeWriter':
+        """Create a writer with the batch settings from the config"""
+        return ExposeWriter(id_watch,
+                            batch_size=config.write_behind_batch_size(),
+                            max_delay=config.write_behind_max_delay(),
+                            queue_size=config.write_behind_queue_size())
+
+    def save(self, expose: Dict):
+        """Queue an expose to be saved. Later changes to the expose dictionary
+           are not saved"""
+        self.thread.start()
+        self.queue.put(expose.copy())
+
+    def flush(self):
+        """Wait until every queued expose has been saved"""
+        if not self.thread.running:
+            return
+        self.queue.put(_FLUSH)
+        self.queue.join()
+
+    def close(self):
+        """Save all queued exposes and stop the writer thread"""
+        self.thread.stop()
+
+    def _run(self):
+        """Writer thread: collect batches from the queue and save them"""
+        stopped = False
+        while not stopped:
+            batch: List[Dict] = []
+            markers = 0
+            deadline = None
+            while len(batch) < self.batch_size:
+                timeout = None if deadline is None else deadline - time.monotonic()
+                if timeout is not None and timeout <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _FLUSH or item is _STOP:
+                    markers += 1
+                    stopped = item is _STOP
+                    break
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.max_delay
+            self._write(batch)
+            for _ in range(len(batch) + markers):
+                self.queue.task_done()
+
+    def _write(self, batch: List[Dict]):
+        """Save a batch of exposes, logging (and dropping) them on failure"""
+        if len(batch) == 0:
+            return
+        try:
+            self.id_watch.save_exposes(batch)
+        except Exception: # pylint: disable=broad-exception-caught
+            logger.exception("Failed to save %d exposes", len(batch))
@@ -1,17 +1,38 @@
 """Module with implementations of standard expose filters"""
-from functools import reduce
+from itertools import islice
 import re
 from abc import ABC, ABCMeta
-from typing import List, Any
+from typing import Callable, Dict, Iterable, Iterator, List, Any, Optional
 
 
 class AbstractFilter(ABC):
     """Abstract base class for filters"""
 
+    # Relative cost of evaluating the filter. The compiled filter runs cheap
+    # checks first, so that expensive ones are skipped for rejected exposes.
+    cost = 10
+
+    # Stateful filters (like the already-seen filter) are evaluated for every
+    # expose, as they record the exposes they see.
+    stateful = False
+
     def is_interesting(self, _expose) -> bool:
         """Return True if an expose should be included in the output, False otherwise"""
         return True
 
+    def are_interesting(self, exposes: List[Dict]) -> List[bool]:
+        """Apply the filter to a batch of exposes. Filters that can check several
+           exposes at once more cheaply than one by one override this"""
+        return [self.is_interesting(expose) for expose in exposes]
+
+    def matches(self, values: 'ExposeValues') -> bool:
+        """Check an expose whose values have been (lazily) parsed. Filters that
+           use the parsed values override this"""
+        return self.is_interesting(values.expose)
+
+
+NUMBER_PATTERN = re.compile(r'\d+([\.,]\d+)?')
+
 
 class ExposeHelper:
     """Helper functions for extracting data from expose text"""
@@ -19,7 +40,7 @@ class ExposeHelper:
     @staticmethod
     def get_price(expose):
         """Extracts the price from a price text"""
-        price_match = re.search(r'\d+([\.,]\d+)?', expose['price'])
+        price_match = NUMBER_PATTERN.search(expose['price'])
         if price_match is None:
             return None
         return float(price_match[0].replace(".", "").replace(",", "."))
@@ -27,7 +48,7 @@ class ExposeHelper:
     @staticmethod
     def get_size(expose):
         """Extracts the size from a size text"""
-        size_match = re.search(r'\d+([\.,]\d+)?', expose['size'])
+        size_match = NUMBER_PATTERN.search(expose['size'])
         if size_match is None:
             return None
         return float(size_match[0].replace(",", "."))
@@ -35,15 +56,68 @@ class ExposeHelper:
     @staticmethod
     def get_rooms(expose):
         """Extracts the number of rooms from a room text"""
-        rooms_match = re.search(r'\d+([\.,]\d+)?', expose['rooms'])
+        rooms_match = NUMBER_PATTERN.search(expose['rooms'])
         if rooms_match is None:
             return None
         return float(rooms_match[0].replace(",", "."))
 
 
+_UNPARSED = object()
+
+
+class ExposeValues:
+    """The numeric values of an expose. Each value is parsed on first access,
+       and only once, however many filters use it"""
+
+    __slots__ = ('expose', '_price', '_size', '_rooms')
+
+    def __init__(self, expose: Dict):
+        self.expose = expose
+        self._price = _UNPARSED
+        self._size = _UNPARSED
+        self._rooms = _UNPARSED
+
+    @property
+    def price(self) -> Optional[float]:
+        """Price of the expose, or None if it has none"""
+        if self._price is _UNPARSED:
+            self._price = ExposeHelper.get_price(self.expose)
+        return self._price
+
+    @property
+    def size(self) -> Optional[float]:
+        """Size of the expose, or None if it has none"""
+        if self._size is _UNPARSED:
+            self._size = ExposeHelper.get_size(self.expose)
+        return self._size
+
+    @property
+    def rooms(self) -> Optional[float]:
+        """Number of rooms of the expose, or None if it has none"""
+        if self._rooms is _UNPARSED:
+            self._rooms = ExposeHelper.get_rooms(self.expose)
+        return self._rooms
+
+
+class ValueFilter(AbstractFilter):
+    """Base class for filters that check the parsed values of an expose"""
+
+    cost = 1
+
+    def is_interesting(self, expose):
+        """Check a single expose"""
+        return self.matches(ExposeValues(expose))
+
+    def matches(self, values: ExposeValues) -> bool:
+        """Should be implemented in the subclass"""
+        raise NotImplementedError
+
+
 class AlreadySeenFilter(AbstractFilter):
     """Filter exposes that have already been processed"""
 
+    stateful = True
+
     def __init__(self, id_watch):
         self.id_watch = id_watch
 
@@ -54,86 +128,102 @@ class AlreadySeenFilter(AbstractFilter):
             return True
         return False
 
-
-class MaxPriceFilter(AbstractFilter):
+    def are_interesting(self, exposes):
+        """Check and mark a batch of exposes with one lookup and one write. Only the
+           first occurrence of an ID in the batch counts as new"""
+        expose_ids = [expose['id'] for expose in exposes]
+        seen = set(self.id_watch.get_processed_ids(expose_ids))
+        new_ids = []
+        result = []
+        for expose_id in expose_ids:
+            is_new = expose_id not in seen
+            if is_new:
+                seen.add(expose_id)
+                new_ids.append(expose_id)
+            result.append(is_new)
+        self.id_watch.mark_processed_many(new_ids)
+        return result
+
+
+class MaxPriceFilter(ValueFilter):
     """Exclude exposes above a given price"""
 
     def __init__(self, max_price):
         self.max_price = max_price
 
-    def is_interesting(self, expose):
+    def matches(self, values):
         """True if expose is below the max price"""
-        price = ExposeHelper.get_price(expose)
+        price = values.price
         if price is None:
             return True
         return price <= self.max_price
 
 
-class MinPriceFilter(AbstractFilter):
+class MinPriceFilter(ValueFilter):
     """Exclude exposes below a given price"""
 
     def __init__(self, min_price):
         self.min_price = min_price
 
-    def is_interesting(self, expose):
+    def matches(self, values):
         """True if expose is above the min price"""
-        price = ExposeHelper.get_price(expose)
+        price = values.price
         if price is None:
             return True
         return price >= self.min_price
 
 
-class MaxSizeFilter(AbstractFilter):
+class MaxSizeFilter(ValueFilter):
     """Exclude exposes above a given size"""
 
     def __init__(self, max_size):
         self.max_size = max_size
 
-    def is_interesting(self, expose):
+    def matches(self, values):
         """True if expose is below the max size"""
-        size = ExposeHelper.get_size(expose)
+        size = values.size
         if size is None:
             return True
         return size <= self.max_size
 
 
-class MinSizeFilter(AbstractFilter):
+class MinSizeFilter(ValueFilter):
     """Exclude exposes below a given size"""
 
     def __init__(self, min_size):
         self.min_size = min_size
 
-    def is_interesting(self, expose):
+    def matches(self, values):
         """True if expose is above the min size"""
-        size = ExposeHelper.get_size(expose)
+        size = values.size
         if size is None:
             return True
         return size >= self.min_size
 
 
-class MaxRoomsFilter(AbstractFilter):
+class MaxRoomsFilter(ValueFilter):
     """Exclude exposes above a given number of rooms"""
 
     def __init__(self, max_rooms):
         self.max_rooms = max_rooms
 
-    def is_interesting(self, expose):
+    def matches(self, values):
         """True if expose is below the max number of rooms"""
-        rooms = ExposeHelper.get_rooms(expose)
+        rooms = values.rooms
         if rooms is None:
             return True
         return rooms <= self.max_rooms
 
 
-class MinRoomsFilter(AbstractFilter):
+class MinRoomsFilter(ValueFilter):
     """Exclude exposes below a given number of rooms"""
 
     def __init__(self, min_rooms):
         self.min_rooms = min_rooms
 
-    def is_interesting(self, expose):
+    def matches(self, values):
         """True if expose is above the min number of rooms"""
-        rooms = ExposeHelper.get_rooms(expose)
+        rooms = values.rooms
         if rooms is None:
             return True
         return rooms >= self.min_rooms
@@ -142,36 +232,52 @@ class MinRoomsFilter(AbstractFilter):
 class TitleFilter(AbstractFilter):
     """Exclude exposes whose titles match the provided terms"""
 
+    cost = 3
+
     def __init__(self, filtered_titles):
         self.filtered_titles = filtered_titles
+        combined_excludes = "(" + ")|(".join(self.filtered_titles) + ")"
+        self.pattern = re.compile(combined_excludes, re.IGNORECASE)
 
     def is_interesting(self, expose):
         """True unless title matches the filtered titles"""
-        combined_excludes = "(" + ")|(".join(self.filtered_titles) + ")"
-        found_objects = re.search(
-            combined_excludes, expose['title'], re.IGNORECASE)
         # send all non matching regex patterns
-        if not found_objects:
-            return True
-        return False
+        return self.pattern.search(expose['title']) is None
 
 
-class PPSFilter(AbstractFilter):
+class PPSFilter(ValueFilter):
     """Exclude exposes above a given price per square"""
 
+    cost = 2
+
     def __init__(self, max_pps):
         self.max_pps = max_pps
 
-    def is_interesting(self, expose):
+    def matches(self, values):
         """True if price per square is below max price per square"""
-        size = ExposeHelper.get_size(expose)
-        price = ExposeHelper.get_price(expose)
+        size = values.size
+        price = values.price
         if size is None or price is None:
             return True
         pps = price / size
         return pps <= self.max_pps
 
 
+def compile_predicate(checks: List[AbstractFilter]) -> Callable[[Dict], bool]:
+    """Combine stateless filters into a predicate that evaluates them in order,
+       and stops at the first filter that rejects the expose"""
+    matchers = tuple(check.matches for check in checks)
+
+    def predicate(expose: Dict) -> bool:
+        values = ExposeValues(expose)
+        for matcher in matchers:
+            if not matcher(values):
+                return False
+        return True
+
+    return predicate
+
+
 class FilterBuilder:
     """Construct a filter chain"""
     filters: List[AbstractFilter]
@@ -209,21 +315,41 @@ class FilterBuilder:
 
 
 class Filter:
-    """Abstract filter object"""
+    """Abstract filter object. On construction, the filters are compiled into a
+       single predicate: stateless filters are run cheapest first, stopping at
+       the first one that rejects an expose, and share the parsed expose values"""
 
     filters: List[AbstractFilter]
 
+    # Number of exposes handed to the filters at once
+    BATCH_SIZE = 50
+
     def __init__(self, filters: List[AbstractFilter]):
         self.filters = filters
+        self.stateful_filters = [f for f in filters if f.stateful]
+        self.checks = sorted((f for f in filters if not f.stateful), key=lambda f: f.cost)
+        self.predicate = compile_predicate(self.checks)
 
     def is_interesting_expose(self, expose):
         """Apply all filters to this expose"""
-        return reduce((lambda x, y: x and y),
-                      map((lambda x: x.is_interesting(expose)), self.filters), True)
-
-    def filter(self, exposes):
-        """Apply all filters to every expose in the list"""
-        return filter(self.is_interesting_expose, exposes)
+        # Stateful filters see every expose, even those other filters reject
+        interesting = True
+        for stateful_filter in self.stateful_filters:
+            interesting = stateful_filter.is_interesting(expose) and interesting
+        return interesting and self.predicate(expose)
+
+    def filter(self, exposes: Iterable[Dict]) -> Iterator[Dict]:
+        """Apply all filters to every expose in the list. Exposes are filtered in
+           batches, so that stateful filters can look them up together"""
+        exposes = iter(exposes)
+        while True:
+            batch = list(islice(exposes, self.BATCH_SIZE))
+            if len(batch) == 0:
+                return
+            verdicts = [f.are_interesting(batch) for f in self.stateful_filters]
+            for index, expose in enumerate(batch):
+                if all(verdict[index] for verdict in verdicts) and self.predicate(expose):
+                    yield expose
 
     @staticmethod
     def builder():
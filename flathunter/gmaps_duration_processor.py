@@ -1,11 +1,12 @@
 """Calculate Google-Maps distances between specific locations and the target flat"""
 import datetime
 import time
+from typing import List, Optional
 from urllib.parse import quote_plus
-import requests
 
 from flathunter.logging import logger
 from flathunter.abstract_processor import Processor
+from flathunter.http_pool import get_session
 
 class GMapsDurationProcessor(Processor):
     """Implementation of Processor class to calculate travel durations"""
@@ -14,6 +15,9 @@ class GMapsDurationProcessor(Processor):
     GM_MODE_BICYCLE = 'bicycling'
     GM_MODE_DRIVING = 'driving'
 
+    # The Distance Matrix API accepts up to 25 origins per request
+    MAX_ORIGINS = 25
+
     def __init__(self, config):
         self.config = config
 
@@ -22,9 +26,21 @@ class GMapsDurationProcessor(Processor):
         expose['durations'] = self.get_formatted_durations(expose['address']).strip()
         return expose
 
+    def process_batch(self, exposes):
+        """Calculate the durations for a batch of exposes, with one request per
+           destination and mode for up to MAX_ORIGINS exposes"""
+        addresses = [expose['address'] for expose in exposes]
+        for expose, durations in zip(exposes, self.get_formatted_durations_batch(addresses)):
+            expose['durations'] = durations
+        return exposes
+
     def get_formatted_durations(self, address):
         """Return a formatted list of GoogleMaps durations"""
-        out = ""
+        return self.get_formatted_durations_batch([address])[0]
+
+    def get_formatted_durations_batch(self, addresses: List[str]) -> List[str]:
+        """Return a formatted list of GoogleMaps durations for each address"""
+        outs = ["" for _ in addresses]
         for duration in self.config.get('durations', []):
             if 'destination' in duration and 'name' in duration:
                 dest = duration.get('destination')
@@ -32,23 +48,37 @@ class GMapsDurationProcessor(Processor):
                 for mode in duration.get('modes', []):
                     if 'gm_id' in mode and 'title' in mode \
                                        and 'key' in self.config.get('google_maps_api', {}):
-                        duration = self.get_gmaps_distance(address, dest, mode['gm_id'])
+                        durations = self.get_gmaps_distances(addresses, dest, mode['gm_id'])
                         title = mode['title']
-                        out += f"> {name} ({title}): {duration}\n"
+                        for index, duration_text in enumerate(durations):
+                            outs[index] += f"> {name} ({title}): {duration_text}\n"
 
-        return out.strip()
+        return [out.strip() for out in outs]
 
     def get_gmaps_distance(self, address, dest, mode):
         """Get the distance"""
+        return self.get_gmaps_distances([address], dest, mode)[0]
+
+    def get_gmaps_distances(self, addresses: List[str], dest, mode) -> List[Optional[str]]:
+        """Get the distances from several addresses to a destination, requesting
+           them for up to MAX_ORIGINS addresses at a time"""
+        distances: List[Optional[str]] = []
+        for start in range(0, len(addresses), self.MAX_ORIGINS):
+            distances.extend(
+                self._request_distances(addresses[start:start + self.MAX_ORIGINS], dest, mode))
+        return distances
+
+    def _request_distances(self, addresses: List[str], dest, mode) -> List[Optional[str]]:
+        """Request the distances from a list of origins to a destination"""
         # get timestamp for next monday at 9:00:00 o'clock
         now = datetime.datetime.today().replace(hour=9, minute=0, second=0)
         next_monday = now + datetime.timedelta(days=7 - now.weekday())
         arrival_time = str(int(time.mktime(next_monday.timetuple())))
 
         # decode from unicode and url encode addresses
-        address = quote_plus(address.strip().encode('utf8'))
+        origins = [quote_plus(address.strip().encode('utf8')) for address in addresses]
         dest = quote_plus(dest.strip().encode('utf8'))
-        logger.debug("Got address: %s", address)
+        logger.debug("Got addresses: %s", origins)
 
         # get google maps config stuff
         base_url = self.config.get('google_maps_api', {}).get('url')
@@ -62,27 +92,34 @@ class GMapsDurationProcessor(Processor):
             base_url = base_url.replace('&key={key}', '')
 
         # retrieve the result
-        url = base_url.format(dest=dest, mode=mode, origin=address,
+        url = base_url.format(dest=dest, mode=mode, origin='|'.join(origins),
                               key=gm_key, arrival=arrival_time)
-        result = requests.get(url, timeout=30).json()
+        result = get_session().get(url, timeout=30).json()
         if result['status'] != 'OK':
-            logger.error("Failed retrieving distance to address %s: %s", address, result)
-            return None
+            logger.error("Failed retrieving distance to addresses %s: %s", origins, result)
+            return [None for _ in addresses]
+
+        # the response has one row per origin
+        rows = result['rows']
+        if len(rows) != len(addresses):
+            logger.warning("Expected %d rows in the response, got %d", len(addresses), len(rows))
+        return [self._fastest_route(rows[index]) if index < len(rows) else None
+                for index in range(len(addresses))]
 
-        # get the fastest route
+    @staticmethod
+    def _fastest_route(row) -> Optional[str]:
+        """Get the fastest route from the elements of a response row"""
         distances = {}
-        for row in result['rows']:
-            for element in row['elements']:
-                if 'status' in element and element['status'] != 'OK':
-                    logger.warning("For address %s we got the status message: %s",
-                                         address, element['status'])
-                    logger.debug("We got this result: %s", repr(result))
-                    continue
-                logger.debug("Got distance and duration: %s / %s (%i seconds)",
-                                   element['distance']['text'],
-                                   element['duration']['text'],
-                                   element['duration']['value'])
-                duration_text = element['duration']['text']
-                distance_text = element['distance']['text']
-                distances[element['duration']['value']] = f"{duration_text} ({distance_text})"
+        for element in row['elements']:
+            if 'status' in element and element['status'] != 'OK':
+                logger.warning("We got the status message: %s", element['status'])
+                logger.debug("We got this row: %s", repr(row))
+                continue
+            logger.debug("Got distance and duration: %s / %s (%i seconds)",
+                               element['distance']['text'],
+                               element['duration']['text'],
+                               element['duration']['value'])
+            duration_text = element['duration']['text']
+            distance_text = element['distance']['text']
+            distances[element['duration']['value']] = f"{duration_text} ({distance_text})"
         return distances[min(distances.keys())] if distances else None
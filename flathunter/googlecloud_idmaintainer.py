@@ -1,14 +1,20 @@
 """Storage back-end implementation using Google Cloud Firestore"""
 import datetime
+from typing import Dict, Iterable, List, Set
+
 import pytz
 import firebase_admin
 from firebase_admin import credentials
 from firebase_admin import firestore
+from google.cloud.firestore_v1 import Increment
 from google.cloud.firestore_v1.base_query import BaseQuery
 
 from flathunter.logging import logger
 from flathunter.exceptions import PersistenceException
 
+# Firestore accepts at most 500 writes in a single batch
+MAX_BATCH_WRITES = 500
+
 
 class GoogleCloudIdMaintainer:
     """Storage back-end - implementation of IdMaintainer API"""
@@ -35,13 +41,50 @@ class GoogleCloudIdMaintainer:
         doc = self.database.collection('processed').document(str(expose_id))
         return doc.get().exists
 
+    def get_processed_ids(self, expose_ids: Iterable) -> Set:
+        """Returns those of the given expose IDs that have already been marked as
+           processed, fetching all documents in a single request"""
+        expose_ids = list(expose_ids)
+        if len(expose_ids) == 0:
+            return set()
+        logger.debug('get_processed_ids(%d IDs)', len(expose_ids))
+        collection = self.database.collection('processed')
+        refs = [collection.document(str(expose_id)) for expose_id in expose_ids]
+        found = {doc.id for doc in self.database.get_all(refs) if doc.exists}
+        return {expose_id for expose_id in expose_ids if str(expose_id) in found}
+
+    def mark_processed_many(self, expose_ids: Iterable):
+        """Mark several exposes as processed, using batched writes"""
+        expose_ids = list(expose_ids)
+        logger.debug('mark_processed_many(%d IDs)', len(expose_ids))
+        collection = self.database.collection('processed')
+        for start in range(0, len(expose_ids), MAX_BATCH_WRITES):
+            batch = self.database.batch()
+            for expose_id in expose_ids[start:start + MAX_BATCH_WRITES]:
+                batch.set(collection.document(str(expose_id)), {'id': expose_id})
+            batch.commit()
+
     def save_expose(self, expose):
         """Writes an expose to the storage backend"""
+        self.database.collection('exposes').document(
+            str(expose['id'])).set(self._expose_record(expose))
+
+    def save_exposes(self, exposes: List[Dict]):
+        """Writes several exposes to the storage backend, using batched writes"""
+        collection = self.database.collection('exposes')
+        for start in range(0, len(exposes), MAX_BATCH_WRITES):
+            batch = self.database.batch()
+            for expose in exposes[start:start + MAX_BATCH_WRITES]:
+                batch.set(collection.document(str(expose['id'])), self._expose_record(expose))
+            batch.commit()
+
+    @staticmethod
+    def _expose_record(expose: Dict) -> Dict:
+        """The document stored for an expose"""
         record = expose.copy()
         record.update({'created_at': pytz.utc.localize(datetime.datetime.now()),
                        'created_sort': (0 - datetime.datetime.now().timestamp())})
-        self.database.collection('exposes').document(
-            str(expose['id'])).set(record)
+        return record
 
     def get_exposes_since(self, min_datetime):
         """Returns all exposes since the supplied datetime"""
@@ -73,8 +116,20 @@ class GoogleCloudIdMaintainer:
         return doc.to_dict()
 
     def save_settings_for_user(self, user_id, settings):
-        """Saves the user settings to the database"""
-        self.database.collection('users').document(str(user_id)).set(settings)
+        """Saves the user settings to the database, counting the change in the
+           settings version"""
+        batch = self.database.batch()
+        batch.set(self.database.collection('users').document(str(user_id)), settings)
+        batch.set(self.database.collection('meta').document('user_settings'),
+                  {'version': Increment(1)}, merge=True)
+        batch.commit()
+
+    def get_user_settings_version(self) -> int:
+        """Returns a number that grows with every change to the users' settings"""
+        doc = self.database.collection('meta').document('user_settings').get()
+        if not doc.exists:
+            return 0
+        return int(doc.to_dict().get('version', 0))
 
     def get_user_settings(self):
         """Loads all users' settings from the database"""
@@ -0,0 +1,103 @@
+"""Parsing of fetched pages into soups. Crawlers only need a part of their
+search result pages, so the parsers can limit the soup to a subtree of the
+page, selected with a simple CSS selector (`tag`, `#id`, `.class`, `tag#id`
+or `tag.class`).
+
+The `bs4` parser builds the soup with a `SoupStrainer`, which skips creating
+objects for the rest of the page. The `lxml` parser parses the page with lxml,
+finds the subtree with XPath, and only builds a soup of the subtree; pages are
+parsed twice, but the first pass runs entirely in C"""
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional, Type, Union
+
+from bs4 import BeautifulSoup, SoupStrainer, UnicodeDammit
+from lxml import etree, html
+
+from flathunter.exceptions import ConfigException
+
+SELECTOR_PATTERN = re.compile(
+    r'^(?P<tag>[a-zA-Z][\w-]*)?(?:#(?P<element_id>[\w-]+)|\.(?P<css_class>[\w-]+))?$')
+
+
+@dataclass(frozen=True)
+class Subtree:
+    """The elements of a page matching a simple CSS selector"""
+    tag: Optional[str] = None
+    element_id: Optional[str] = None
+    css_class: Optional[str] = None
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def parse(selector: str) -> 'Subtree':
+        """Create the subtree for a selector"""
+        match = SELECTOR_PATTERN.match(selector.strip())
+        if match is None or not any(match.groups()):
+            raise ValueError(f"Unsupported subtree selector: {selector}")
+        return Subtree(**match.groupdict())
+
+    def strainer(self) -> SoupStrainer:
+        """A strainer keeping the subtree, for BeautifulSoup"""
+        attrs = {}
+        if self.element_id is not None:
+            attrs['id'] = self.element_id
+        if self.css_class is not None:
+            # the strainer sees the whole class attribute, not the single classes
+            attrs['class'] = re.compile(rf'(^|\s){re.escape(self.css_class)}(\s|$)')
+        return SoupStrainer(self.tag, attrs)
+
+    def xpath(self) -> str:
+        """An XPath expression finding the subtree"""
+        condition = ''
+        if self.element_id is not None:
+            condition = f'[@id="{self.element_id}"]'
+        elif self.css_class is not None:
+            condition = '[contains(concat(" ", normalize-space(@class), " "), ' \
+                        f'" {self.css_class} ")]'
+        return f'//{self.tag or "*"}{condition}'
+
+
+class HtmlParser:
+    """Builds soups with BeautifulSoup and lxml. Also the fallback of the
+       other parsers"""
+
+    def parse(self, markup: Union[str, bytes], subtree: Optional[Subtree] = None) \
+            -> BeautifulSoup:
+        """Parse a page, or only the subtree of it if one is given"""
+        if subtree is None:
+            return BeautifulSoup(markup, 'lxml')
+        return BeautifulSoup(markup, 'lxml', parse_only=subtree.strainer())
+
+
+class LxmlParser(HtmlParser):
+    """Finds the subtree with lxml and XPath before building the soup. Pages
+       without a subtree, or that lxml cannot parse, are parsed like `HtmlParser`"""
+
+    def parse(self, markup: Union[str, bytes], subtree: Optional[Subtree] = None) \
+            -> BeautifulSoup:
+        if subtree is None:
+            return super().parse(markup)
+        if isinstance(markup, bytes):
+            markup = UnicodeDammit(markup, is_html=True).unicode_markup
+        try:
+            document = html.document_fromstring(markup)
+        except (ValueError, etree.ParserError): # pylint: disable=c-extension-no-member
+            return super().parse(markup, subtree)
+        fragment = ''.join(html.tostring(element, encoding='unicode', with_tail=False)
+                           for element in document.xpath(subtree.xpath()))
+        return BeautifulSoup(fragment, 'lxml')
+
+
+PARSERS: Dict[str, Type[HtmlParser]] = {
+    'bs4': HtmlParser,
+    'lxml': LxmlParser,
+}
+
+
+def get_parser(name: str) -> HtmlParser:
+    """Create the parser with the given name"""
+    if name not in PARSERS:
+        raise ConfigException(
+            f"Unknown HTML parser '{name}', expected one of: {', '.join(PARSERS)}")
+    return PARSERS[name]()
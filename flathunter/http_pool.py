@@ -0,0 +1,113 @@
+"""Shared HTTP connection pools. Crawlers, notifiers, processors and captcha
+solvers get their `requests` sessions from here, so that connections (and TLS
+sessions) to the same hosts are reused over the whole hunt, and requests to
+each host are rate limited"""
+import threading
+from http.cookiejar import DefaultCookiePolicy
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from flathunter.rate_limiter import DEFAULT_RATE_LIMITS, RateLimiter
+
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """Transport adapter that waits for the rate limiter before sending a request"""
+
+    def __init__(self, rate_limiter: Optional[RateLimiter] = None, **kwargs):
+        self.rate_limiter = rate_limiter
+        super().__init__(**kwargs)
+
+    def send(self, request, *args, **kwargs): # pylint: disable=arguments-differ
+        if self.rate_limiter is not None:
+            self.rate_limiter.wait(request.url)
+        return super().send(request, *args, **kwargs)
+
+
+class ConnectionPoolManager:
+    """Owns the transport adapters (and with them the connection pools) that
+    all sessions share. `pool_connections` is the number of hosts to keep a
+    pool for, `pool_maxsize` the number of connections kept per host.
+    `host_limits` overrides the per-host pool size for individual hosts.
+    Requests wait for the `rate_limiter`, if one is given."""
+
+    def __init__(self,
+                 pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+                 pool_block: bool = False,
+                 host_limits: Optional[Dict[str, int]] = None,
+                 rate_limiter: Optional[RateLimiter] = None):
+        self.rate_limiter = rate_limiter
+        self.default_adapter = RateLimitedAdapter(rate_limiter,
+                                                  pool_connections=pool_connections,
+                                                  pool_maxsize=pool_maxsize,
+                                                  pool_block=pool_block)
+        self.host_adapters = {
+            host: RateLimitedAdapter(rate_limiter, pool_connections=1,
+                                     pool_maxsize=limit, pool_block=pool_block)
+            for host, limit in (host_limits or {}).items()
+        }
+        self.threadlocal = threading.local()
+
+    @staticmethod
+    def from_config(config) -> 'ConnectionPoolManager':
+        """Create a pool manager with the sizes from the config"""
+        return ConnectionPoolManager(
+            pool_connections=config.http_pool_connections(),
+            pool_maxsize=config.http_pool_maxsize(),
+            pool_block=config.http_pool_block(),
+            host_limits=config.http_host_limits(),
+            rate_limiter=RateLimiter.from_config(config))
+
+    def _mount(self, session: requests.Session) -> requests.Session:
+        """Route the requests of a session through the shared adapters"""
+        session.mount('https://', self.default_adapter)
+        session.mount('http://', self.default_adapter)
+        for host, adapter in self.host_adapters.items():
+            session.mount(f'https://{host}', adapter)
+            session.mount(f'http://{host}', adapter)
+        return session
+
+    def session(self) -> requests.Session:
+        """Return the shared session of the current thread. Like the module-level
+           `requests` functions, it does not keep cookies between requests"""
+        session = getattr(self.threadlocal, 'session', None)
+        if session is None:
+            session = self._mount(requests.Session())
+            session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+            self.threadlocal.session = session
+        return session
+
+    def new_session(self) -> requests.Session:
+        """Return a new session that keeps its own cookies, but shares the
+           connection pools. Sessions must not be closed, as that would close
+           the shared pools"""
+        return self._mount(requests.Session())
+
+
+_manager = ConnectionPoolManager(rate_limiter=RateLimiter(DEFAULT_RATE_LIMITS))
+
+
+def configure_connection_pools(config):
+    """Replace the shared connection pools with ones sized from the config"""
+    global _manager # pylint: disable=global-statement
+    _manager = ConnectionPoolManager.from_config(config)
+
+
+def get_rate_limiter() -> Optional[RateLimiter]:
+    """Return the rate limiter of the shared connection pools"""
+    return _manager.rate_limiter
+
+
+def get_session() -> requests.Session:
+    """Return the shared, cookie-less session for the current thread"""
+    return _manager.session()
+
+
+def new_session() -> requests.Session:
+    """Return a new cookie-keeping session on top of the shared connection pools"""
+    return _manager.new_session()
@@ -1,14 +1,20 @@
 """Default Flathunter implementation for the command line"""
 import traceback
-from itertools import chain
+from functools import partial
+from typing import List, Optional, Tuple
+
 import requests
 
 from flathunter.logging import logger
+from flathunter.abstract_crawler import Crawler
 from flathunter.config import YamlConfig
+from flathunter.crawl_executor import CrawlExecutor
 from flathunter.filter import Filter
+from flathunter.outbox import OutboxWorker
 from flathunter.processor import ProcessorChain
 from flathunter.captcha.captcha_solver import CaptchaUnsolvableError
 from flathunter.exceptions import ConfigException
+from flathunter.utils.timing import timings
 
 class Hunter:
     """Basic methods for crawling and processing / filtering exposes"""
@@ -18,7 +24,12 @@ class Hunter:
         if not isinstance(self.config, YamlConfig):
             raise ConfigException(
                 "Invalid config for hunter - should be a 'Config' object")
+        if self.config.outbox_enabled() and self.config.digest_enabled():
+            raise ConfigException(
+                "The digest can not be used with the outbox, which delivers "
+                "notifications one by one - disable 'digest' or 'outbox' in the config")
         self.id_watch = id_watch
+        self.outbox_worker: Optional[OutboxWorker] = None
 
     def crawl_for_exposes(self, max_pages=None):
         """Trigger a new crawl of the configured URLs"""
@@ -32,24 +43,53 @@ class Hunter:
                 logger.info("Error while scraping url %s:\n%s", url, traceback.format_exc())
                 return []
 
-        return chain(*[try_crawl(searcher, url, max_pages)
-                       for searcher in self.config.searchers()
-                       for url in self.config.target_urls()])
+        executor = CrawlExecutor(self.config.crawl_max_workers(),
+                                 self.config.crawl_max_workers_per_domain())
+        jobs = [(url, partial(try_crawl, searcher, url, max_pages))
+                for url, searcher in self.searchers_for_target_urls()]
+        return executor.run(jobs)
 
-    def hunt_flats(self, max_pages: None|int = None):
-        """Crawl, process and filter exposes"""
+    def searchers_for_target_urls(self) -> List[Tuple[str, Crawler]]:
+        """Pair every configured URL with the crawler for it, preparing the
+           crawlers for the next crawl"""
+        seen_oracle = self.id_watch.get_processed_ids if self.config.crawl_incremental() else None
+        for searcher in self.config.searchers():
+            searcher.set_seen_oracle(seen_oracle)
+
+        pairs = []
+        for url in self.config.target_urls():
+            searcher = self.config.searcher_for_url(url)
+            if searcher is None:
+                logger.warning("No crawler found for url %s - skipping", url)
+                continue
+            pairs.append((url, searcher))
+        return pairs
+
+    def build_processor_chain(self) -> ProcessorChain:
+        """Build the chain that saves, filters, enriches and notifies new exposes"""
         filter_set = Filter.builder() \
                            .read_config(self.config) \
                            .filter_already_seen(self.id_watch) \
                            .build()
 
-        processor_chain = ProcessorChain.builder(self.config) \
-                                        .save_all_exposes(self.id_watch) \
-                                        .apply_filter(filter_set) \
-                                        .resolve_addresses() \
-                                        .calculate_durations() \
-                                        .send_messages() \
-                                        .build()
+        builder = ProcessorChain.builder(self.config) \
+                                .save_all_exposes(self.id_watch) \
+                                .apply_filter(filter_set) \
+                                .resolve_addresses() \
+                                .calculate_durations()
+        if self.config.outbox_enabled():
+            return builder.queue_messages(self.id_watch, self.get_outbox_worker()).build()
+        return builder.send_messages().build()
+
+    def get_outbox_worker(self) -> OutboxWorker:
+        """Return the worker delivering the notifications queued in the outbox"""
+        if self.outbox_worker is None:
+            self.outbox_worker = OutboxWorker.from_config(self.config, self.id_watch)
+        return self.outbox_worker
+
+    def hunt_flats(self, max_pages: None|int = None):
+        """Crawl, process and filter exposes"""
+        processor_chain = self.build_processor_chain()
 
         result = []
         # We need to iterate over this list to force the evaluation of the pipeline
@@ -57,4 +97,5 @@ class Hunter:
             logger.info('New offer: %s', expose['title'])
             result.append(expose)
 
+        timings.log_and_reset()
         return result
@@ -1,11 +1,16 @@
 """SQLite implementation of IDMaintainer interface"""
-import threading
 import sqlite3 as lite
 import datetime
 import json
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional, Set
 
 from flathunter.logging import logger
 from flathunter.abstract_processor import Processor
+from flathunter.expose_writer import ExposeWriter
+from flathunter.outbox import OutboxEntry
+from flathunter.sqlite_connections import SqliteConnectionManager
 
 __author__ = "Nody"
 __version__ = "0.1"
@@ -13,68 +18,177 @@ __maintainer__ = "Nody"
 __email__ = "harrymcfly@protonmail.com"
 __status__ = "Prodction"
 
+# SQLite limits the number of bound parameters in a statement
+MAX_QUERY_PARAMETERS = 500
+
+
+def create_tables(cur: lite.Cursor):
+    """Schema version 1: the original tables"""
+    cur.execute('CREATE TABLE IF NOT EXISTS processed (ID INTEGER)')
+    cur.execute('CREATE TABLE IF NOT EXISTS executions (timestamp timestamp)')
+    cur.execute('CREATE TABLE IF NOT EXISTS exposes (id INTEGER, created TIMESTAMP, \
+                        crawler STRING, details BLOB, PRIMARY KEY (id, crawler))')
+    cur.execute('CREATE TABLE IF NOT EXISTS users \
+                        (id INTEGER PRIMARY KEY, settings BLOB)')
+
+
+def index_processed_ids(cur: lite.Cursor):
+    """Schema version 2: key the processed table by expose ID, dropping duplicate
+       rows, and index exposes by creation time"""
+    cur.execute('CREATE TABLE processed_keyed (id INTEGER PRIMARY KEY) WITHOUT ROWID')
+    cur.execute('INSERT OR IGNORE INTO processed_keyed (id) \
+                 SELECT ID FROM processed WHERE ID IS NOT NULL')
+    cur.execute('DROP TABLE processed')
+    cur.execute('ALTER TABLE processed_keyed RENAME TO processed')
+    cur.execute('CREATE INDEX IF NOT EXISTS exposes_created ON exposes (created)')
+
+
+def create_outbox(cur: lite.Cursor):
+    """Schema version 3: the outbox of notifications waiting to be delivered"""
+    cur.execute("CREATE TABLE IF NOT EXISTS outbox (id INTEGER PRIMARY KEY, \
+                        idempotency_key TEXT NOT NULL UNIQUE, notifier TEXT NOT NULL, \
+                        receiver TEXT, expose BLOB NOT NULL, \
+                        state TEXT NOT NULL DEFAULT 'pending', \
+                        attempts INTEGER NOT NULL DEFAULT 0, next_attempt REAL NOT NULL, \
+                        claim TEXT, last_error TEXT, updated REAL)")
+    cur.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (next_attempt) \
+                 WHERE state = 'pending'")
+
+
+def version_user_settings(cur: lite.Cursor):
+    """Schema version 4: a counter of the changes to the users' settings"""
+    cur.execute('CREATE TABLE IF NOT EXISTS user_settings_version (version INTEGER NOT NULL)')
+    cur.execute('INSERT INTO user_settings_version (version) VALUES (0)')
+
+
+# Schema migrations, in order. The schema version of a database (stored as its
+# `user_version`) is the number of migrations that have been applied to it.
+MIGRATIONS: List[Callable[[lite.Cursor], None]] = [
+    create_tables,
+    index_processed_ids,
+    create_outbox,
+    version_user_settings,
+]
+
+
+def migrate(connection: lite.Connection):
+    """Bring the database schema up to date. The version is checked again inside an
+       exclusive write transaction, so concurrent processes migrate only once"""
+    version = connection.execute('PRAGMA user_version').fetchone()[0]
+    if version >= len(MIGRATIONS):
+        return
+    cur = connection.cursor()
+    cur.execute('BEGIN IMMEDIATE')
+    try:
+        version = cur.execute('PRAGMA user_version').fetchone()[0]
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            logger.info('Migrating database to schema version %d', number)
+            migration(cur)
+        cur.execute(f'PRAGMA user_version = {len(MIGRATIONS)}')
+        connection.commit()
+    except lite.Error:
+        connection.rollback()
+        raise
+
 class SaveAllExposesProcessor(Processor):
-    """Processor that saves all exposes to the database"""
+    """Processor that saves all exposes to the database. With write-behind
+       enabled, exposes are saved from a background thread, and all of them
+       have been saved once the processor chain has finished"""
 
     def __init__(self, config, id_watch):
         self.config = config
         self.id_watch = id_watch
+        self.writer = None
+        if config.write_behind_enabled():
+            self.writer = ExposeWriter.from_config(config, id_watch)
 
     def process_expose(self, expose):
         """Save a single expose"""
-        self.id_watch.save_expose(expose)
+        if self.writer is not None:
+            self.writer.save(expose)
+        else:
+            self.id_watch.save_expose(expose)
         return expose
 
-class IdMaintainer:
+    def process_batch(self, exposes):
+        """Save a batch of exposes in a single transaction"""
+        if self.writer is not None:
+            for expose in exposes:
+                self.writer.save(expose)
+        else:
+            self.id_watch.save_exposes(exposes)
+        return exposes
+
+    def finish(self):
+        """Wait for the write-behind queue to be saved"""
+        if self.writer is not None:
+            self.writer.close()
+
+class IdMaintainer:  # pylint: disable=too-many-public-methods
     """SQLite back-end for the database"""
 
     def __init__(self, db_name):
         self.db_name = db_name
-        self.threadlocal = threading.local()
+        self.connections = SqliteConnectionManager(db_name, initialize=migrate)
 
     def get_connection(self):
-        """Connects to the SQLite database. Connections are thread-local"""
-        connection = getattr(self.threadlocal, 'connection', None)
-        if connection is None:
-            try:
-                self.threadlocal.connection = lite.connect(self.db_name)
-                connection = self.threadlocal.connection
-                cur = self.threadlocal.connection.cursor()
-                cur.execute('CREATE TABLE IF NOT EXISTS processed (ID INTEGER)')
-                cur.execute('CREATE TABLE IF NOT EXISTS executions (timestamp timestamp)')
-                cur.execute('CREATE TABLE IF NOT EXISTS exposes (id INTEGER, created TIMESTAMP, \
-                                    crawler STRING, details BLOB, PRIMARY KEY (id, crawler))')
-                cur.execute('CREATE TABLE IF NOT EXISTS users \
-                                    (id INTEGER PRIMARY KEY, settings BLOB)')
-                self.threadlocal.connection.commit()
-            except lite.Error as error:
-                logger.error("Error %s:", error.args[0])
-                raise error
-        return connection
+        """Connects to the SQLite database, returning the read connection of the
+           current thread. Writes go through `self.connections.writer()`"""
+        try:
+            return self.connections.get_reader()
+        except lite.Error as error:
+            logger.error("Error %s:", error.args[0])
+            raise error
 
     def is_processed(self, expose_id):
         """Returns true if an expose has already been processed"""
         logger.debug('is_processed(%d)', expose_id)
-        cur = self.get_connection().cursor()
-        cur.execute('SELECT id FROM processed WHERE id = ?', (expose_id,))
-        row = cur.fetchone()
+        with self.connections.reader() as connection:
+            row = connection.execute('SELECT id FROM processed WHERE id = ?',
+                                     (expose_id,)).fetchone()
         return row is not None
 
+    def get_processed_ids(self, expose_ids: Iterable) -> Set:
+        """Returns those of the given expose IDs that have already been processed"""
+        expose_ids = list(expose_ids)
+        logger.debug('get_processed_ids(%d IDs)', len(expose_ids))
+        found = set()
+        with self.connections.reader() as connection:
+            for start in range(0, len(expose_ids), MAX_QUERY_PARAMETERS):
+                chunk = expose_ids[start:start + MAX_QUERY_PARAMETERS]
+                placeholders = ', '.join('?' * len(chunk))
+                rows = connection.execute(
+                    f'SELECT id FROM processed WHERE id IN ({placeholders})', chunk)
+                found.update(str(row[0]) for row in rows)
+        return {expose_id for expose_id in expose_ids if str(expose_id) in found}
+
     def mark_processed(self, expose_id):
         """Mark an expose as processed in the database"""
         logger.debug('mark_processed(%d)', expose_id)
-        cur = self.get_connection().cursor()
-        cur.execute('INSERT INTO processed VALUES(?)', (expose_id,))
-        self.get_connection().commit()
+        with self.connections.writer() as connection:
+            connection.execute('INSERT OR IGNORE INTO processed VALUES(?)', (expose_id,))
+
+    def mark_processed_many(self, expose_ids: Iterable):
+        """Mark several exposes as processed, in a single transaction"""
+        rows = [(expose_id,) for expose_id in expose_ids]
+        if len(rows) == 0:
+            return
+        logger.debug('mark_processed_many(%d IDs)', len(rows))
+        with self.connections.writer() as connection:
+            connection.executemany('INSERT OR IGNORE INTO processed VALUES(?)', rows)
 
     def save_expose(self, expose):
         """Saves an expose to a database"""
-        cur = self.get_connection().cursor()
-        cur.execute('INSERT OR REPLACE INTO exposes(id, created, crawler, details) \
-                     VALUES (?, ?, ?, ?)',
-                    (int(expose['id']), datetime.datetime.now(),
-                     expose['crawler'], json.dumps(expose)))
-        self.get_connection().commit()
+        self.save_exposes([expose])
+
+    def save_exposes(self, exposes: List[Dict]):
+        """Saves several exposes to the database, in a single transaction"""
+        now = datetime.datetime.now()
+        rows = [(int(expose['id']), now, expose['crawler'], json.dumps(expose))
+                for expose in exposes]
+        with self.connections.writer() as connection:
+            connection.executemany('INSERT OR REPLACE INTO exposes(id, created, crawler, details) \
+                                    VALUES (?, ?, ?, ?)', rows)
 
     def get_exposes_since(self, min_datetime):
         """Loads all exposes since the specified date"""
@@ -82,64 +196,130 @@ class IdMaintainer:
             obj = json.loads(row[2])
             obj['created_at'] = row[0]
             return obj
-        cur = self.get_connection().cursor()
-        cur.execute('SELECT created, crawler, details FROM exposes \
-                     WHERE created >= ? ORDER BY created DESC', (min_datetime,))
-        return list(map(row_to_expose, cur.fetchall()))
+        with self.connections.reader() as connection:
+            rows = connection.execute('SELECT created, crawler, details FROM exposes \
+                                       WHERE created >= ? ORDER BY created DESC',
+                                      (min_datetime,)).fetchall()
+        return list(map(row_to_expose, rows))
 
     def get_recent_exposes(self, count, filter_set=None):
         """Returns up to 'count' recent exposes, filtered by the provided filter"""
-        cur = self.get_connection().cursor()
-        cur.execute('SELECT details FROM exposes ORDER BY created DESC')
         res = []
-        next_batch = []
-        while len(res) < count:
-            if len(next_batch) == 0:
-                next_batch = cur.fetchmany()
+        with self.connections.reader() as connection:
+            cur = connection.execute('SELECT details FROM exposes ORDER BY created DESC')
+            next_batch = []
+            while len(res) < count:
                 if len(next_batch) == 0:
-                    break
-            expose = json.loads(next_batch.pop()[0])
-            if filter_set is None or filter_set.is_interesting_expose(expose):
-                res.append(expose)
+                    next_batch = cur.fetchmany()
+                    if len(next_batch) == 0:
+                        break
+                expose = json.loads(next_batch.pop()[0])
+                if filter_set is None or filter_set.is_interesting_expose(expose):
+                    res.append(expose)
+            cur.close()
         return res
 
     def save_settings_for_user(self, user_id, settings):
         """Saves the user settings to the database"""
-        cur = self.get_connection().cursor()
-        cur.execute('INSERT OR REPLACE INTO users VALUES (?, ?)', (user_id, json.dumps(settings)))
-        self.get_connection().commit()
+        with self.connections.writer() as connection:
+            connection.execute('INSERT OR REPLACE INTO users VALUES (?, ?)',
+                               (user_id, json.dumps(settings)))
+            connection.execute('UPDATE user_settings_version SET version = version + 1')
 
     def get_settings_for_user(self, user_id):
         """Loads the settings for a user from the database"""
-        cur = self.get_connection().cursor()
-        cur.execute('SELECT settings FROM users WHERE id = ?', (user_id,))
-        row = cur.fetchone()
+        with self.connections.reader() as connection:
+            row = connection.execute('SELECT settings FROM users WHERE id = ?',
+                                     (user_id,)).fetchone()
         if row is None:
             return None
         return json.loads(row[0])
 
     def get_user_settings(self):
         """Loads all users' settings from the database"""
-        cur = self.get_connection().cursor()
-        cur.execute('SELECT id, settings FROM users')
-        res = []
-        for row in cur.fetchall():
-            res.append((row[0], json.loads(row[1])))
-        return res
+        with self.connections.reader() as connection:
+            rows = connection.execute('SELECT id, settings FROM users').fetchall()
+        return [(row[0], json.loads(row[1])) for row in rows]
+
+    def get_user_settings_version(self) -> int:
+        """Returns a number that grows with every change to the users' settings"""
+        with self.connections.reader() as connection:
+            return connection.execute(
+                'SELECT version FROM user_settings_version').fetchone()[0]
 
     def get_last_run_time(self):
         """Returns the time of the last hunt"""
-        cur = self.get_connection().cursor()
-        cur.execute("SELECT * FROM executions ORDER BY timestamp DESC LIMIT 1")
-        row = cur.fetchone()
+        with self.connections.reader() as connection:
+            row = connection.execute(
+                "SELECT * FROM executions ORDER BY timestamp DESC LIMIT 1").fetchone()
         if row is None:
             return None
         return datetime.datetime.strptime(row[0], '%Y-%m-%d %H:%M:%S.%f')
 
     def update_last_run_time(self):
         """Saves the time of the most recent hunt to the database"""
-        cur = self.get_connection().cursor()
         result = datetime.datetime.now()
-        cur.execute('INSERT INTO executions VALUES(?);', (result,))
-        self.get_connection().commit()
+        with self.connections.writer() as connection:
+            connection.execute('INSERT INTO executions VALUES(?);', (result,))
         return result
+
+    def enqueue_notifications(self, entries: List[OutboxEntry]):
+        """Add notifications to the outbox, in a single transaction. Entries with
+           the idempotency key of an earlier notification are ignored"""
+        now = time.time()
+        rows = [(entry.idempotency_key, entry.notifier, json.dumps(entry.receiver),
+                 json.dumps(entry.expose), now, now) for entry in entries]
+        if len(rows) == 0:
+            return
+        with self.connections.writer() as connection:
+            connection.executemany('INSERT OR IGNORE INTO outbox (idempotency_key, notifier, \
+                                    receiver, expose, next_attempt, updated) \
+                                    VALUES (?, ?, ?, ?, ?, ?)', rows)
+
+    def claim_notifications(self, limit: int, lease: float) -> List[OutboxEntry]:
+        """Claim up to `limit` pending notifications that are due. Claimed entries
+           are not due again for `lease` seconds, so that an entry is retried if
+           its sender dies before it is completed"""
+        now = time.time()
+        claim = uuid.uuid4().hex
+        with self.connections.writer() as connection:
+            connection.execute("UPDATE outbox SET next_attempt = ?, claim = ? WHERE id IN \
+                                (SELECT id FROM outbox WHERE state = 'pending' \
+                                 AND next_attempt <= ? ORDER BY next_attempt, id LIMIT ?)",
+                               (now + lease, claim, now, limit))
+            rows = connection.execute('SELECT id, idempotency_key, notifier, receiver, \
+                                       expose, attempts FROM outbox WHERE claim = ? \
+                                       ORDER BY id', (claim,)).fetchall()
+        return [OutboxEntry(notifier=row[2], receiver=json.loads(row[3]),
+                            expose=json.loads(row[4]), idempotency_key=row[1],
+                            entry_id=row[0], attempts=row[5])
+                for row in rows]
+
+    def complete_notification(self, entry: OutboxEntry, error: Optional[str] = None):
+        """Mark a notification as delivered, or as failed for good if an error is given"""
+        state = 'delivered' if error is None else 'failed'
+        with self.connections.writer() as connection:
+            connection.execute('UPDATE outbox SET state = ?, attempts = attempts + 1, \
+                                last_error = ?, claim = NULL, updated = ? WHERE id = ?',
+                               (state, error, time.time(), entry.entry_id))
+
+    def retry_notification(self, entry: OutboxEntry, delay: float, error: str):
+        """Schedule another attempt to deliver a notification"""
+        now = time.time()
+        with self.connections.writer() as connection:
+            connection.execute('UPDATE outbox SET attempts = attempts + 1, next_attempt = ?, \
+                                last_error = ?, claim = NULL, updated = ? WHERE id = ?',
+                               (now + delay, error, now, entry.entry_id))
+
+    def count_pending_notifications(self) -> int:
+        """Number of notifications that have not been delivered yet"""
+        with self.connections.reader() as connection:
+            row = connection.execute(
+                "SELECT COUNT(*) FROM outbox WHERE state = 'pending'").fetchone()
+        return row[0]
+
+    def purge_notifications(self, before: float):
+        """Delete delivered and failed notifications last updated before the given time"""
+        with self.connections.writer() as connection:
+            connection.execute("DELETE FROM outbox WHERE state != 'pending' AND updated < ?",
+                               (before,))
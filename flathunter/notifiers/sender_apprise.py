@@ -1,9 +1,29 @@
 """Functions and classes related to sending Apprise messages"""
+import asyncio
+import threading
+from typing import Dict, List, Tuple
+
 import apprise
 
 from flathunter.abstract_notifier import Notifier
 from flathunter.abstract_processor import Processor
 
+_instances: Dict[Tuple[str, ...], apprise.Apprise] = {}
+_instances_lock = threading.Lock()
+
+
+def get_apprise(apprise_urls) -> apprise.Apprise:
+    """Return the Apprise object notifying the given urls. It is set up (and the
+       urls are parsed) only once per process"""
+    key = tuple(apprise_urls)
+    with _instances_lock:
+        if key not in _instances:
+            apobj = apprise.Apprise()
+            for apprise_url in key:
+                apobj.add(apprise_url)
+            _instances[key] = apobj
+        return _instances[key]
+
 
 class SenderApprise(Processor, Notifier):
     """Expose processor that sends Apprise messages"""
@@ -14,7 +34,21 @@ class SenderApprise(Processor, Notifier):
 
     def process_expose(self, expose):
         """Send a message to a user describing the expose"""
-        message = self.config.get('message', "").format(
+        self.__send_msg(self.__expose_message(expose))
+        return expose
+
+    def process_batch(self, exposes: List[Dict]) -> List[Dict]:
+        """Send the messages for a batch of exposes to all Apprise urls at once"""
+        self.__send_msgs([self.__expose_message(expose) for expose in exposes])
+        return exposes
+
+    def deliver(self, expose) -> bool:
+        """Send the message describing the expose, returning True on success"""
+        return self.__send_msg(self.__expose_message(expose))
+
+    def __expose_message(self, expose) -> str:
+        """Format the message describing an expose"""
+        return self.config.get('message', "").format(
             title=expose['title'],
             rooms=expose['rooms'],
             size=expose['size'],
@@ -22,23 +56,34 @@ class SenderApprise(Processor, Notifier):
             url=expose['url'],
             address=expose['address'],
             durations="" if 'durations' not in expose else expose['durations']).strip()
-        self.__send_msg(message)
-        return expose
 
     def notify(self, message: str):
         """ Send the given message to users """
         self.__send_msg(message=message)
 
-    def __send_msg(self, message):
-        """Send messages to each of the Apprise urls"""
-        apobj = apprise.Apprise()
-        if self.apprise_urls is None:
-            return
-        for apprise_url in self.apprise_urls:
-            apobj.add(apprise_url)
-
-        apobj.notify(
+    def __send_msg(self, message) -> bool:
+        """Send messages to each of the Apprise urls, returning True if all of
+           them were notified"""
+        if not self.apprise_urls:
+            return True
+        return bool(get_apprise(self.apprise_urls).notify(
             body=message,
             title='',
             body_format=apprise.NotifyFormat.TEXT,
-        )
+        ))
+
+    def __send_msgs(self, messages: List[str]) -> List[bool]:
+        """Send several messages to each of the Apprise urls concurrently,
+           returning for each message whether all urls were notified"""
+        if not self.apprise_urls or len(messages) == 0:
+            return [True] * len(messages)
+        apobj = get_apprise(self.apprise_urls)
+
+        async def send_all():
+            return await asyncio.gather(*(apobj.async_notify(
+                body=message,
+                title='',
+                body_format=apprise.NotifyFormat.TEXT,
+            ) for message in messages))
+
+        return [bool(result) for result in asyncio.run(send_all())]
@@ -1,10 +1,9 @@
 """Functions and classes related to sending Telegram messages"""
 import json
 
-import requests
-
 from flathunter.abstract_notifier import Notifier
 from flathunter.abstract_processor import Processor
+from flathunter.http_pool import get_session
 from flathunter.logging import logger
 
 
@@ -17,7 +16,22 @@ class SenderMattermost(Processor, Notifier):
 
     def process_expose(self, expose):
         """Send a message to a user describing the expose"""
-        message = self.config.message_format().format(
+        self.notify(self.__expose_message(expose))
+        return expose
+
+    async def process_expose_async(self, expose, client):
+        """Send the message describing the expose with the async HTTP client"""
+        response = await client.post(
+            self.webhook_url,
+            data=json.dumps({"text": self.__expose_message(expose)}),
+            timeout=30
+        )
+        self.__log_response(response)
+        return expose
+
+    def __expose_message(self, expose) -> str:
+        """Format the message describing an expose"""
+        return self.config.message_format().format(
             title=expose['title'],
             rooms=expose['rooms'],
             size=expose['size'],
@@ -26,22 +40,28 @@ class SenderMattermost(Processor, Notifier):
             address=expose['address'],
             durations="" if 'durations' not in expose else expose[
                 'durations']).strip()
-        self.notify(message)
-        return expose
+
+    def deliver(self, expose) -> bool:
+        """Send the message describing the expose, returning True on success"""
+        return self.__send_text(self.__expose_message(expose))
 
     def notify(self, message):
         """Send message to the mattermost webhook"""
         self.__send_text(message)
 
-    def __send_text(self, message: str):
+    def __send_text(self, message: str) -> bool:
         """Send messages to the mattermost webhook"""
         logger.debug(('webhook_url:', self.webhook_url))
         logger.debug(('message', message))
-        resp = requests.post(
+        resp = get_session().post(
             self.webhook_url,
             data=json.dumps({"text": message}),
             timeout=30
         )
+        return self.__log_response(resp)
+
+    def __log_response(self, resp) -> bool:
+        """Log the webhook response, and an error if the message was not accepted"""
         logger.debug("Got response (%i): %s", resp.status_code, resp.content)
 
         # handle error
@@ -51,3 +71,5 @@ class SenderMattermost(Processor, Notifier):
                 resp.status_code,
                 resp.text
             )
+            return False
+        return True
@@ -2,11 +2,10 @@
 import json
 from typing import Dict
 
-import requests
-
 from flathunter.abstract_notifier import Notifier
 from flathunter.abstract_processor import Processor
 from flathunter.config import YamlConfig
+from flathunter.http_pool import get_session
 from flathunter.logging import logger
 
 
@@ -19,7 +18,22 @@ class SenderSlack(Processor, Notifier):
 
     def process_expose(self, expose: Dict) -> Dict:
         """Send a message to a Slack channel describing the expose"""
-        message = self.config.message_format().format(
+        self.notify(self.__expose_message(expose))
+        return expose
+
+    async def process_expose_async(self, expose: Dict, client) -> Dict:
+        """Send the message describing the expose with the async HTTP client"""
+        response = await client.post(
+            self.webhook_url,
+            data=json.dumps({"text": self.__expose_message(expose)}),
+            timeout=30
+        )
+        self.__log_response(response)
+        return expose
+
+    def __expose_message(self, expose: Dict) -> str:
+        """Format the message describing an expose"""
+        return self.config.message_format().format(
             title=expose['title'],
             rooms=expose['rooms'],
             size=expose['size'],
@@ -28,22 +42,28 @@ class SenderSlack(Processor, Notifier):
             address=expose['address'],
             durations="" if 'durations' not in expose else expose[
                 'durations']).strip()
-        self.notify(message)
-        return expose
+
+    def deliver(self, expose: Dict) -> bool:
+        """Send the message describing the expose, returning True on success"""
+        return self.__send_message(self.__expose_message(expose))
 
     def notify(self, message: str) -> None:
         """Send message to the Slack webhook"""
         self.__send_message(message)
 
-    def __send_message(self, message: str) -> None:
+    def __send_message(self, message: str) -> bool:
         """Send messages to the Slack webhook"""
         logger.debug(('webhook_url:', self.webhook_url))
         logger.debug(('message', message))
-        response = requests.post(
+        response = get_session().post(
             self.webhook_url,
             data=json.dumps({"text": message}),
             timeout=30
         )
+        return self.__log_response(response)
+
+    def __log_response(self, response) -> bool:
+        """Log the webhook response, and an error if the message was not accepted"""
         logger.debug("Got response (%i): %s", response.status_code, response.content)
 
         if response.status_code != 200:
@@ -52,3 +72,5 @@ class SenderSlack(Processor, Notifier):
                 response.status_code,
                 response.text
             )
+            return False
+        return True
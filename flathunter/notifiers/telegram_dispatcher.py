@@ -0,0 +1,201 @@
+"""Concurrent delivery of Telegram messages to many chats"""
+import heapq
+import json
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+from flathunter.exceptions import BotBlockedException, UserDeactivatedException
+from flathunter.http_pool import get_session
+from flathunter.logging import logger
+from flathunter.rate_limiter import TokenBucket
+from flathunter.utils.list import chunk_list
+
+# Telegram delivers about one message per second to the same chat, with short bursts
+CHAT_RATE = 1.0
+CHAT_BURST = 3
+# Longest 'retry_after' that is honoured before retrying a chat
+MAX_RETRY_AFTER = 30
+
+
+@dataclass
+class TelegramMessage:
+    """A text message to a chat, followed by images sent as replies to it"""
+    chat_id: int
+    text: str
+    images: List[str] = field(default_factory=list)
+    message_id: Optional[int] = None
+    text_sent: bool = False
+    retries: int = 0
+
+    def __post_init__(self):
+        # maximum number of images in a media group is 10
+        self.image_chunks: Deque[List[str]] = deque(chunk_list(self.images, 10))
+
+
+class RetryAfter(Exception):
+    """Telegram asked to wait before sending more messages to a chat"""
+
+    def __init__(self, seconds: float):
+        super().__init__(f"Retry after {seconds} seconds")
+        self.seconds = seconds
+
+
+class TelegramDispatcher:
+    """Sends messages to many chats at once.
+
+    Messages are queued per chat, and each chat keeps the order of its
+    messages. Chats take turns on a pool of `workers` threads, one API call
+    at a time, and a chat is paced by its own token bucket. The global limit
+    of about 30 messages per second is enforced by the rate limiter of the
+    shared connection pools (see `http.rate_limits`). When Telegram answers
+    with '429 Too Many Requests', only that chat is put back in the queue,
+    after the requested delay; a message is dropped after `max_retries`
+    retries. Chats that blocked the bot or were deactivated are skipped, and
+    reported to the caller."""
+
+    def __init__(self, bot_token: str, workers: int = 8, max_retries: int = 1):
+        self.text_message_url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+        self.media_group_url = f"https://api.telegram.org/bot{bot_token}/sendMediaGroup"
+        self.workers = max(1, workers)
+        self.max_retries = max_retries
+
+    def send(self, messages: Iterable[TelegramMessage]) -> Dict[int, Exception]:
+        """Deliver the messages, returning the chats that can no longer be
+           messaged, with the reason"""
+        queues: Dict[int, Deque[TelegramMessage]] = {}
+        for message in messages:
+            queues.setdefault(message.chat_id, deque()).append(message)
+        buckets = {chat_id: TokenBucket(CHAT_RATE, CHAT_BURST) for chat_id in queues}
+        failures: Dict[int, Exception] = {}
+        # (time at which the chat can continue, sequence number, chat)
+        ready: List[Tuple[float, int, int]] = [(0.0, seq, chat_id)
+                                               for seq, chat_id in enumerate(queues)]
+        sequence = len(ready)
+        running: Dict[Future, int] = {}
+
+        with ThreadPoolExecutor(max_workers=self.workers,
+                                thread_name_prefix="telegram") as pool:
+            while ready or running:
+                now = time.monotonic()
+                while ready and ready[0][0] <= now and len(running) < self.workers:
+                    _, _, chat_id = heapq.heappop(ready)
+                    running[pool.submit(self._send_next, queues[chat_id],
+                                        buckets[chat_id], failures)] = chat_id
+                timeout = max(0.0, ready[0][0] - now) if ready else None
+                if len(running) == 0:
+                    time.sleep(timeout or 0)
+                    continue
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chat_id = running.pop(future)
+                    delay = future.result()
+                    if delay is not None:
+                        heapq.heappush(ready, (time.monotonic() + delay, sequence, chat_id))
+                        sequence += 1
+        return failures
+
+    def _send_next(self, queue: Deque[TelegramMessage], bucket: TokenBucket,
+                   failures: Dict[int, Exception]) -> Optional[float]:
+        """Make the next API call for a chat. Returns the seconds after which the
+           chat can continue, or None once it has no more messages"""
+        if not bucket.try_acquire():
+            return 1 / bucket.rate
+        message = queue[0]
+        try:
+            if self._send_step(message):
+                queue.popleft()
+        except RetryAfter as retry:
+            message.retries += 1
+            if message.retries <= self.max_retries:
+                return min(retry.seconds, MAX_RETRY_AFTER)
+            logger.warning("Dropping message to chat %s after %d retries",
+                           message.chat_id, self.max_retries)
+            queue.popleft()
+        except (BotBlockedException, UserDeactivatedException) as error:
+            failures[message.chat_id] = error
+            queue.clear()
+        return 0.0 if len(queue) > 0 else None
+
+    def _send_step(self, message: TelegramMessage) -> bool:
+        """Send the text of a message, or its next group of images. Returns True
+           if nothing is left to send for the message"""
+        if not message.text_sent:
+            result = self._send_text(message.chat_id, message.text)
+            if not result:
+                return True
+            message.text_sent = True
+            message.message_id = result.get('message_id')
+        elif not self._send_images(message, message.image_chunks[0]):
+            return True
+        else:
+            message.image_chunks.popleft()
+        return len(message.image_chunks) == 0
+
+    def _send_text(self, chat_id: int, text: str) -> Dict:
+        """Send a text message, returning the sent message information"""
+        payload = {
+            'chat_id': str(chat_id),
+            'text': text,
+        }
+        logger.debug(('chat_id:', chat_id))
+        logger.debug(('text:', text))
+        logger.debug("Retrieving URL %s, payload %s", self.text_message_url, payload)
+        response = get_session().post(self.text_message_url, data=payload, timeout=30)
+        logger.debug("Got response (%i): %s", response.status_code, response.content)
+
+        if response.status_code != 200:
+            self._handle_error("When sending bot text message, we got an error.",
+                               response, chat_id)
+            return {}
+        return response.json().get('result', {})
+
+    def _send_images(self, message: TelegramMessage, images: List[str]) -> bool:
+        """Send a group of images as a reply to the message. Returns False on error"""
+        payload = {
+            'chat_id': str(message.chat_id),
+            # media expected to be an array of objects in string format
+            'media': json.dumps([{"type": "photo", "media": url} for url in images]),
+            'disable_notification': True,
+        }
+        if message.message_id:
+            payload['reply_to_message_id'] = message.message_id
+
+        response = get_session().post(self.media_group_url, data=payload, timeout=30)
+        if response.status_code != 200:
+            logger.warning("Error sending media group: %s", json.dumps(payload))
+            self._handle_error("When sending media group, we got an error.",
+                               response, message.chat_id)
+            return False
+        return True
+
+    @staticmethod
+    def _handle_error(msg: str, response, chat_id) -> None:
+        """
+        Handles telegram API error responses
+        :param msg: the message for logging
+        :param response: the response that is received form the API
+        :param chat_id: the receiver that was supposed to get the message
+        :return: None
+
+        :raise BotBlockedException: Happens when bot trys to send a message to a user that
+            has already blocked the bot
+        :raise UserDeactivatedException: Happens when bot try to send a message to a
+            deactivated user
+        :raise RetryAfter: Happens when too many messages were sent
+        """
+        status_code = response.status_code
+        data = response.json()
+
+        logger.error("%s, status code: %i, data: %s", msg, status_code, data)
+
+        if status_code == 403:
+            if "bot was blocked by the user" in data.get("description", ""):
+                raise BotBlockedException(f"User {chat_id} blocked the bot")
+            if "user is deactivated" in data.get("description", ""):
+                raise UserDeactivatedException(f"User {chat_id} has been deactivated")
+        if status_code == 429:
+            if "Too Many Requests" in data.get("description", ""):
+                raise RetryAfter(data.get("parameters", {}).get("retry_after", MAX_RETRY_AFTER))
@@ -0,0 +1,212 @@
+"""Durable delivery of notifications. Instead of being sent right away,
+notifications are queued in the outbox table of the database, and delivered by
+a background worker that retries failed deliveries with exponential backoff.
+Notifications queued before a crash are delivered when flathunter restarts."""
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from flathunter.abstract_processor import Processor
+from flathunter.exceptions import BotBlockedException, UserDeactivatedException
+from flathunter.logging import logger
+from flathunter.notifiers import SenderApprise, SenderMattermost, SenderSlack, SenderTelegram
+from flathunter.utils.background import BackgroundThread
+
+# Delivered and failed notifications are kept this long, so that their
+# idempotency keys keep notifications from being queued twice
+RETENTION_SECONDS = 7 * 24 * 3600
+# Entries are claimed for this long while they are being delivered
+LEASE_SECONDS = 300.0
+# Number of entries claimed at a time
+CLAIM_BATCH_SIZE = 50
+
+
+@dataclass
+class OutboxEntry:
+    """A notification about an expose, for one notifier and receiver"""
+    notifier: str
+    receiver: Any
+    expose: Dict
+    idempotency_key: str = ''
+    entry_id: Optional[int] = None
+    attempts: int = 0
+
+    def __post_init__(self):
+        if not self.idempotency_key:
+            self.idempotency_key = idempotency_key(self.notifier, self.receiver, self.expose)
+
+
+def idempotency_key(notifier: str, receiver: Any, expose: Dict) -> str:
+    """Key identifying the notification of a receiver about an expose"""
+    return f"{notifier}:{receiver if receiver is not None else ''}:" \
+           f"{expose.get('crawler', '')}:{expose['id']}"
+
+
+@dataclass
+class RetryPolicy:
+    """When to retry failed deliveries. The first retry is after `base_delay`
+       seconds, and the delay doubles with every attempt up to `max_delay`;
+       notifications are given up after `max_attempts` attempts. Due retries
+       are looked for every `poll_interval` seconds"""
+    max_attempts: int = 10
+    base_delay: float = 30.0
+    max_delay: float = 3600.0
+    poll_interval: float = 60.0
+
+    @staticmethod
+    def from_config(config) -> 'RetryPolicy':
+        """Create a retry policy with the settings from the config"""
+        return RetryPolicy(max_attempts=config.outbox_max_attempts(),
+                           base_delay=config.outbox_base_delay(),
+                           max_delay=config.outbox_max_delay(),
+                           poll_interval=config.outbox_poll_interval())
+
+    def delay(self, attempts: int) -> float:
+        """Seconds to wait before the next attempt, after `attempts` failed ones"""
+        return min(self.base_delay * 2 ** (attempts - 1), self.max_delay)
+
+
+def create_sender(config, notifier: str, receiver: Any):
+    """Create the sender delivering notifications for a notifier and receiver"""
+    if notifier == 'telegram':
+        return SenderTelegram(config, receivers=[receiver])
+    if notifier == 'mattermost':
+        return SenderMattermost(config)
+    if notifier == 'apprise':
+        return SenderApprise(config)
+    if notifier == 'slack':
+        return SenderSlack(config)
+    raise ValueError(f"Unknown notifier: {notifier}")
+
+
+class OutboxWorker:
+    """Delivers the notifications in the outbox from a background thread.
+
+    The worker wakes up when new notifications are queued, and regularly to
+    retry failed deliveries as set by the retry policy. Receivers that blocked
+    the bot are not retried. Entries are claimed for `LEASE_SECONDS` while they
+    are delivered; if the process dies in that time, they are delivered again
+    after a restart. At exit, due notifications are sent once more before the
+    worker stops."""
+
+    def __init__(self, config, id_watch, policy: Optional[RetryPolicy] = None):
+        self.config = config
+        self.id_watch = id_watch
+        self.policy = policy or RetryPolicy()
+        self.senders: Dict[Tuple[str, Any], Any] = {}
+        self.wakeup = threading.Event()
+        self.thread = BackgroundThread("outbox", self._run, self.wakeup.set)
+
+    @staticmethod
+    def from_config(config, id_watch) -> 'OutboxWorker':
+        """Create a worker with the retry policy from the config"""
+        return OutboxWorker(config, id_watch, RetryPolicy.from_config(config))
+
+    def sender_for(self, notifier: str, receiver: Any):
+        """Return the (cached) sender for a notifier and receiver"""
+        key = (notifier, receiver)
+        if key not in self.senders:
+            self.senders[key] = create_sender(self.config, notifier, receiver)
+        return self.senders[key]
+
+    def run_once(self) -> int:
+        """Deliver the notifications that are due, returning how many were delivered"""
+        delivered = 0
+        while True:
+            entries = self.id_watch.claim_notifications(CLAIM_BATCH_SIZE, LEASE_SECONDS)
+            for entry in entries:
+                delivered += self.deliver(entry)
+            if len(entries) < CLAIM_BATCH_SIZE:
+                return delivered
+
+    def deliver(self, entry: OutboxEntry) -> bool:
+        """Try to deliver a single notification, recording the outcome"""
+        try:
+            if self.sender_for(entry.notifier, entry.receiver).deliver(entry.expose):
+                self.id_watch.complete_notification(entry)
+                return True
+            error = "Notifier reported a failed delivery"
+        except (BotBlockedException, UserDeactivatedException) as exception:
+            logger.warning("Dropping notification %s: %s", entry.idempotency_key, exception)
+            self.id_watch.complete_notification(entry, str(exception))
+            return False
+        except Exception: # pylint: disable=broad-exception-caught
+            error = traceback.format_exc()
+        attempts = entry.attempts + 1
+        if attempts >= self.policy.max_attempts:
+            logger.error("Giving up on notification %s after %d attempts: %s",
+                         entry.idempotency_key, attempts, error)
+            self.id_watch.complete_notification(entry, error)
+        else:
+            delay = self.policy.delay(attempts)
+            logger.warning("Notification %s failed, retrying in %.0f seconds: %s",
+                           entry.idempotency_key, delay, error)
+            self.id_watch.retry_notification(entry, delay, error)
+        return False
+
+    def wake(self):
+        """Start delivering queued notifications"""
+        self.thread.start()
+        self.wakeup.set()
+
+    def close(self):
+        """Stop the worker thread, once it has sent the notifications that are due"""
+        self.thread.stop()
+
+    def _run(self):
+        """Worker thread: deliver due notifications whenever woken up, or polled,
+           and once more when stopped"""
+        while self.thread.is_current():
+            self.wakeup.clear()
+            try:
+                self.run_once()
+                self.id_watch.purge_notifications(time.time() - RETENTION_SECONDS)
+            except Exception: # pylint: disable=broad-exception-caught
+                logger.exception("Error while delivering notifications")
+            self.wakeup.wait(self.policy.poll_interval)
+        try:
+            self.run_once()
+        except Exception: # pylint: disable=broad-exception-caught
+            logger.exception("Error while delivering notifications")
+
+
+class OutboxProcessor(Processor):
+    """Processor that queues the notifications for exposes in the outbox, for
+       the configured notifiers (or the given subset of them), and wakes up the
+       outbox worker once the chain has finished"""
+
+    def __init__(self, config, id_watch, worker: OutboxWorker,
+                 receivers: Optional[List[Any]] = None,
+                 notifiers: Optional[List[str]] = None):
+        self.config = config
+        self.id_watch = id_watch
+        self.worker = worker
+        self.notifiers = config.notifiers() if notifiers is None else notifiers
+        self.receivers = config.telegram_receiver_ids() if receivers is None else receivers
+
+    def entries_for(self, expose: Dict) -> List[OutboxEntry]:
+        """The notifications to send about an expose"""
+        entries = []
+        for notifier in self.notifiers:
+            if notifier == 'telegram':
+                entries.extend(OutboxEntry(notifier, receiver, expose)
+                               for receiver in self.receivers or [])
+            else:
+                entries.append(OutboxEntry(notifier, None, expose))
+        return entries
+
+    def process_expose(self, expose: Dict) -> Dict:
+        """Queue the notifications about an expose"""
+        return self.process_batch([expose])[0]
+
+    def process_batch(self, exposes: List[Dict]) -> List[Dict]:
+        """Queue the notifications about a batch of exposes, in one transaction"""
+        self.id_watch.enqueue_notifications(
+            [entry for expose in exposes for entry in self.entries_for(expose)])
+        return exposes
+
+    def finish(self):
+        """Have the outbox worker deliver the queued notifications"""
+        self.worker.wake()
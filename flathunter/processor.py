@@ -1,53 +1,160 @@
 """Utility classes for building chains for processors"""
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from functools import reduce
-from typing import List
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Set
 
 from flathunter.default_processors import AddressResolver
 from flathunter.default_processors import Filter
 from flathunter.default_processors import LambdaProcessor
 from flathunter.default_processors import CrawlExposeDetails
+from flathunter.digest import DigestProcessor
 from flathunter.notifiers import SenderMattermost, SenderTelegram, SenderApprise, SenderSlack
 from flathunter.gmaps_duration_processor import GMapsDurationProcessor
 from flathunter.idmaintainer import SaveAllExposesProcessor
-from flathunter.abstract_processor import Processor
+from flathunter.outbox import OutboxProcessor, OutboxWorker
+from flathunter.abstract_processor import Processor, supports_batches
+from flathunter.logging import logger
+
+class ParallelProcessor(Processor):
+    """Runs a processor over a bounded thread pool. At most `workers` exposes are
+       processed at a time, and at most twice that many are taken from the input
+       before the results are consumed, so a slow consumer holds back the input.
+       Results are emitted in input order, or as they complete if `ordered` is
+       False"""
+
+    def __init__(self, processor: Processor, workers: int, ordered: bool = True):
+        self.processor = processor
+        self.workers = workers
+        self.ordered = ordered
+
+    def process_expose(self, expose: Dict) -> Dict:
+        """Process a single expose on the calling thread"""
+        return self.processor.process_expose(expose)
+
+    def finish(self):
+        """Finish the wrapped processor"""
+        self.processor.finish()
+
+    def process_exposes(self, exposes: Iterable[Dict]) -> Iterator[Dict]:
+        """Process the exposes on the thread pool"""
+        return self._map(self.processor.process_expose, exposes)
+
+    def process_batch(self, exposes: List[Dict]) -> List[Dict]:
+        """Process a batch of exposes with the wrapped processor, on the calling thread"""
+        return self.processor.process_batch(exposes)
+
+    def process_batches(self, batches_of_exposes: Iterable[List[Dict]]) -> Iterator[Dict]:
+        """Hand the batches to the wrapped processor's `process_batch`, on the thread pool"""
+        for batch in self._map(self.processor.process_batch, batches_of_exposes):
+            yield from batch
+
+    def _map(self, func: Callable[[Any], Any], items: Iterable) -> Iterator:
+        """Apply `func` to the items on the thread pool"""
+        max_in_flight = 2 * self.workers
+        items = iter(items)
+        with ThreadPoolExecutor(max_workers=self.workers,
+                                thread_name_prefix="processor") as pool:
+            try:
+                if self.ordered:
+                    yield from self._in_order(pool, func, items, max_in_flight)
+                else:
+                    yield from self._as_completed(pool, func, items, max_in_flight)
+            finally:
+                pool.shutdown(wait=True, cancel_futures=True)
+
+    @staticmethod
+    def _in_order(pool, func, items, max_in_flight) -> Iterator:
+        """Emit the results in input order"""
+        pending: Deque[Future] = deque()
+        for item in items:
+            pending.append(pool.submit(func, item))
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    @staticmethod
+    def _as_completed(pool, func, items, max_in_flight) -> Iterator:
+        """Emit the results as soon as they are available"""
+        pending: Set[Future] = set()
+        for item in items:
+            pending.add(pool.submit(func, item))
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
 
 class ProcessorChainBuilder:
-    """Builder pattern for building chains of processors"""
+    """Builder pattern for building chains of processors. Stages that spend their
+       time waiting on the network can be run on several worker threads, as set
+       by `processing.workers` in the config or by their `workers` argument"""
     processors: List[Processor]
 
     def __init__(self, config):
         self.processors = []
         self.config = config
 
-    def send_messages(self, receivers=None):
-        """Add processor that sends messages for exposes"""
-        notifiers = self.config.notifiers()
+    def _add_stage(self, processor: Processor, workers=None, ordered=None):
+        """Append a processor, running it in parallel if more than one worker is set"""
+        if workers is None:
+            workers = self.config.processing_workers()
+        if ordered is None:
+            ordered = self.config.processing_ordered()
+        if workers > 1:
+            processor = ParallelProcessor(processor, workers, ordered)
+        self.processors.append(processor)
+
+    def send_messages(self, receivers=None, notifiers=None):
+        """Add processor that sends messages for exposes, with the configured
+           notifiers or the given subset of them. In digest mode, the messages
+           are combined and sent once the chain has finished"""
+        if notifiers is None:
+            notifiers = self.config.notifiers()
+        senders: List[Processor] = []
         if 'telegram' in notifiers:
-            self.processors.append(SenderTelegram(self.config, receivers=receivers))
+            senders.append(SenderTelegram(self.config, receivers=receivers))
         if 'mattermost' in notifiers:
-            self.processors.append(SenderMattermost(self.config))
+            senders.append(SenderMattermost(self.config))
         if 'apprise' in notifiers:
-            self.processors.append(SenderApprise(self.config))
+            senders.append(SenderApprise(self.config))
         if 'slack' in notifiers:
-            self.processors.append(SenderSlack(self.config))
+            senders.append(SenderSlack(self.config))
+        if self.config.digest_enabled():
+            senders = [DigestProcessor(self.config, sender) for sender in senders]
+        self.processors.extend(senders)
         return self
 
-    def resolve_addresses(self):
+    def queue_messages(self, id_watch, worker: OutboxWorker, receivers=None, notifiers=None):
+        """Add processor that queues the messages for exposes in the outbox, to be
+           delivered by the outbox worker"""
+        self.processors.append(OutboxProcessor(self.config, id_watch, worker,
+                                               receivers=receivers, notifiers=notifiers))
+        return self
+
+    def resolve_addresses(self, workers=None, ordered=None):
         """Add processor that resolves addresses from expose pages"""
-        self.processors.append(AddressResolver(self.config))
+        self._add_stage(AddressResolver(self.config), workers, ordered)
         return self
 
-    def calculate_durations(self):
+    def calculate_durations(self, workers=None, ordered=None):
         """Add processor to calculate durations, if enabled"""
         durations_enabled = "google_maps_api" in self.config \
                             and self.config["google_maps_api"]["enable"]
         if durations_enabled:
-            self.processors.append(GMapsDurationProcessor(self.config))
+            self._add_stage(GMapsDurationProcessor(self.config), workers, ordered)
         return self
 
-    def crawl_expose_details(self):
+    def crawl_expose_details(self, workers=None, ordered=None):
         """Add processor to crawl expose details"""
-        self.processors.append(CrawlExposeDetails(self.config))
+        self._add_stage(CrawlExposeDetails(self.config), workers, ordered)
         return self
 
     def map(self, func):
@@ -67,19 +174,125 @@ class ProcessorChainBuilder:
 
     def build(self):
         """Build the processor chain"""
-        return ProcessorChain(self.processors)
+        return ProcessorChain(self.processors,
+                              batch_size=self.config.processing_batch_size(),
+                              batch_delay=self.config.processing_batch_delay())
+
+# Marks the end of the stream passed from the batching thread
+_END_OF_STREAM = object()
+
+
+class _StreamError:
+    """An exception raised by the stream, passed from the batching thread"""
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+def batches(exposes: Iterable[Dict], batch_size: int, batch_delay: float) -> Iterator[List[Dict]]:
+    """Group a stream of exposes into batches of up to `batch_size` exposes. A
+       batch is also passed on once its first expose has waited `batch_delay`
+       seconds, even while the stream is waiting for the next expose, and at
+       the end of the stream.
+
+    The stream is read on a separate thread, which takes at most `batch_size`
+    exposes ahead of the batches that were passed on. Batches of one expose
+    need no thread"""
+    if batch_size <= 1:
+        yield from ([expose] for expose in exposes)
+        return
+    pending: queue.Queue = queue.Queue(maxsize=batch_size)
+    stopped = threading.Event()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def read_stream():
+        try:
+            for expose in exposes:
+                if stopped.is_set():
+                    return
+                put(expose)
+        except Exception as error: # pylint: disable=broad-exception-caught
+            put(_StreamError(error))
+        put(_END_OF_STREAM)
+
+    threading.Thread(target=read_stream, name="batcher", daemon=True).start()
+    batch: List[Dict] = []
+    deadline: Optional[float] = None
+    try:
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = pending.get(timeout=timeout)
+            except queue.Empty:
+                yield batch
+                batch, deadline = [], None
+                continue
+            if item is _END_OF_STREAM:
+                break
+            if isinstance(item, _StreamError):
+                raise item.error
+            if deadline is None:
+                deadline = time.monotonic() + batch_delay
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield batch
+                batch, deadline = [], None
+        if len(batch) > 0:
+            yield batch
+    finally:
+        stopped.set()
 
 class ProcessorChain:
-    """Class to hold a chain of processors"""
+    """Class to hold a chain of processors. Processors that implement
+       `process_batch` are handed batches of exposes, all other processors
+       work through the exposes one by one"""
     processors: List[Processor]
 
-    def __init__(self, processors):
+    def __init__(self, processors, batch_size: int = 1, batch_delay: float = 0.0):
         self.processors = processors
+        self.batch_size = max(1, batch_size)
+        self.batch_delay = batch_delay
+
+    def _apply(self, exposes, processor: Processor):
+        """Run a single processor over the sequence of exposes"""
+        parallel = isinstance(processor, ParallelProcessor)
+        if self.batch_size == 1 \
+                or not supports_batches(processor.processor if parallel else processor):
+            return processor.process_exposes(exposes)
+        batches_of_exposes = batches(exposes, self.batch_size, self.batch_delay)
+        if parallel:
+            return processor.process_batches(batches_of_exposes)
+        return (expose for batch in batches_of_exposes
+                for expose in processor.process_batch(batch))
 
     def process(self, exposes):
-        """Process the sequences of exposes with the processor chain"""
-        return reduce((lambda exposes, processor: processor.process_exposes(exposes)),
-                      self.processors, exposes)
+        """Process the sequences of exposes with the processor chain. Once the
+           sequence is exhausted (or closed), every processor is finished"""
+        try:
+            yield from reduce(self._apply, self.processors, exposes)
+        finally:
+            self.finish()
+
+    def finish(self):
+        """Finish every processor, even if finishing an earlier one fails. The
+           first error is raised once all processors have been finished"""
+        error: Optional[Exception] = None
+        for processor in self.processors:
+            try:
+                processor.finish()
+            except Exception as exception: # pylint: disable=broad-exception-caught
+                logger.exception("Error while finishing %s", type(processor).__name__)
+                if error is None:
+                    error = exception
+        if error is not None:
+            raise error
 
     @staticmethod
     def builder(config):
@@ -1,13 +1,14 @@
 """ Gets proxies """
-import requests
 from lxml.html import fromstring
 
+from flathunter.http_pool import get_session
+
 def get_proxies():
     """
     Gets random, free proxies
     """
     url = "https://free-proxy-list.net/"
-    response = requests.get(url, timeout=30)
+    response = get_session().get(url, timeout=30)
     parser = fromstring(response.text)
     proxies = set()
     for i in parser.xpath('//tbody/tr')[:250]:
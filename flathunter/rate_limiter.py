@@ -0,0 +1,107 @@
+"""Per-host rate limiting of outgoing requests. Every request made through the
+shared connection pools (and the async HTTP client) waits for a token from the
+bucket of its host, so that concurrency can be raised without exceeding the
+request rates portals and APIs tolerate"""
+import asyncio
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+# Requests per second and burst size for the hosts flathunter talks to. Limits
+# apply to the host and all its subdomains.
+DEFAULT_RATE_LIMITS: Dict[str, Tuple[float, int]] = {
+    'immobilienscout24.de': (1.0, 3),
+    'kleinanzeigen.de': (1.0, 3),
+    'api.telegram.org': (30.0, 30),
+    'maps.googleapis.com': (10.0, 10),
+    '2captcha.com': (2.0, 5),
+    'captchatypers.com': (2.0, 5),
+}
+
+
+class TokenBucket:
+    """Token bucket holding up to `burst` tokens, refilled at `rate` tokens per
+    second. Callers that find the bucket empty reserve their token anyway and
+    wait until it has been refilled, so waiting callers are served in order."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        """Add the tokens accumulated since the last update"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, tokens: int = 1) -> float:
+        """Take tokens from the bucket, returning the seconds to wait before
+           they may be used"""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens -= tokens
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def try_acquire(self, tokens: int = 1) -> bool:
+        """Take tokens only if they are available right away"""
+        with self.lock:
+            self._refill(time.monotonic())
+            if self.tokens < tokens:
+                return False
+            self.tokens -= tokens
+            return True
+
+    def acquire(self, tokens: int = 1):
+        """Block until tokens are available, and take them"""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, tokens: int = 1):
+        """Wait without blocking the event loop until tokens are available"""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class RateLimiter:
+    """Keeps a token bucket per rate-limited host. A host without a limit of its
+       own uses the limit of its closest parent domain, if there is one, and is
+       not limited otherwise"""
+
+    def __init__(self, limits: Optional[Dict[str, Tuple[float, int]]] = None):
+        self.buckets = {host: TokenBucket(rate, burst)
+                        for host, (rate, burst) in (limits or {}).items() if rate > 0}
+        self.resolved: Dict[str, Optional[TokenBucket]] = {}
+
+    @staticmethod
+    def from_config(config) -> 'RateLimiter':
+        """Create a rate limiter with the default limits, updated from the config"""
+        return RateLimiter({**DEFAULT_RATE_LIMITS, **config.http_rate_limits()})
+
+    def bucket_for(self, url: str) -> Optional[TokenBucket]:
+        """Return the token bucket limiting requests to the host of the URL"""
+        host = urlparse(url).hostname or ''
+        if host not in self.resolved:
+            labels = host.split('.')
+            self.resolved[host] = next(
+                (self.buckets['.'.join(labels[index:])] for index in range(len(labels))
+                 if '.'.join(labels[index:]) in self.buckets), None)
+        return self.resolved[host]
+
+    def wait(self, url: str):
+        """Block until a request to the URL may be sent"""
+        bucket = self.bucket_for(url)
+        if bucket is not None:
+            bucket.acquire()
+
+    async def wait_async(self, url: str):
+        """Wait without blocking the event loop until a request to the URL may be sent"""
+        bucket = self.bucket_for(url)
+        if bucket is not None:
+            await bucket.acquire_async()
@@ -0,0 +1,60 @@
+"""Keep Chrome from loading resources the crawlers do not need. Chrome can
+only block requests by URL (with `Network.setBlockedURLs`), so resource types
+are blocked through the URL patterns of their files and hosts"""
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+
+RESOURCE_TYPE_PATTERNS: Dict[str, Tuple[str, ...]] = {
+    'image': ('*.jpg*', '*.jpeg*', '*.png*', '*.gif*', '*.webp*', '*.avif*', '*.svg*',
+              '*.ico*'),
+    'font': ('*.woff*', '*.ttf*', '*.otf*', '*.eot*'),
+    'media': ('*.mp4*', '*.webm*', '*.m3u8*', '*.mp3*', '*.ogg*'),
+    'stylesheet': ('*.css*',),
+    'analytics': ('*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+                  '*googlesyndication.com*', '*facebook.net*', '*hotjar.com*',
+                  '*criteo.com*', '*adnxs.com*', '*scorecardresearch.com*'),
+}
+
+DEFAULT_BLOCKED_TYPES = ('image', 'font', 'media', 'analytics')
+
+# Blocked for every page load, whatever the profile: requests the captcha
+# solving code expects to fail
+ALWAYS_BLOCKED = ("https://api.geetest.com/get.*",)
+
+
+@dataclass(frozen=True)
+class BlockingProfile:
+    """The resource types and URL patterns to block. Entries of `allowed` are
+       resource types or URL patterns that are not blocked, even if listed"""
+    resource_types: FrozenSet[str] = frozenset(DEFAULT_BLOCKED_TYPES)
+    url_patterns: Tuple[str, ...] = ()
+    allowed: FrozenSet[str] = frozenset()
+
+    @staticmethod
+    def from_config(config) -> 'BlockingProfile':
+        """The blocking profile configured for all crawlers"""
+        return BlockingProfile(frozenset(config.resource_blocking_types()),
+                               tuple(config.resource_blocking_urls()),
+                               frozenset(config.resource_blocking_allow()))
+
+    def extended(self, block: Iterable[str] = (), allow: Iterable[str] = ()) \
+            -> 'BlockingProfile':
+        """A profile that also blocks the resource types or URL patterns in
+           `block`, and allows the ones in `allow`"""
+        block = list(block)
+        types = {entry for entry in block if entry in RESOURCE_TYPE_PATTERNS}
+        patterns = tuple(entry for entry in block if entry not in RESOURCE_TYPE_PATTERNS)
+        return BlockingProfile(self.resource_types | types,
+                               self.url_patterns + patterns,
+                               self.allowed | frozenset(allow))
+
+    def blocked_urls(self) -> List[str]:
+        """The URL patterns to pass to `Network.setBlockedURLs`"""
+        patterns = list(ALWAYS_BLOCKED)
+        for resource_type in sorted(self.resource_types - self.allowed):
+            if resource_type not in RESOURCE_TYPE_PATTERNS:
+                raise ValueError(f"Unknown resource type: {resource_type}")
+            patterns.extend(RESOURCE_TYPE_PATTERNS[resource_type])
+        patterns.extend(self.url_patterns)
+        return list(dict.fromkeys(pattern for pattern in patterns
+                                  if pattern not in self.allowed))
@@ -0,0 +1,92 @@
+"""Cache of search result pages, used to send conditional requests and to skip
+parsing pages whose content has not changed since the last poll"""
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from bs4 import BeautifulSoup
+
+
+@dataclass
+class CachedResponse:
+    """Validators, content hash and parse results of the last response for a URL"""
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_hash: str
+    soup: BeautifulSoup
+    entries: Optional[List[Dict]] = None
+
+
+def content_hash(content: bytes) -> str:
+    """Digest used to detect unchanged response bodies"""
+    return hashlib.sha256(content).hexdigest()
+
+
+class ResponseCache:
+    """Remembers the last response for every fetched URL.
+
+    Crawlers use it to send `If-None-Match` / `If-Modified-Since` headers, and
+    to hand back the previously parsed soup when the server answers with
+    `304 Not Modified` or with a byte-identical body. The exposes extracted
+    from a cached soup are kept too, so `extract_data` can be skipped. Only the
+    `max_entries` most recently fetched URLs are kept."""
+
+    def __init__(self, max_entries: int = 100):
+        self.max_entries = max_entries
+        self.responses: OrderedDict[str, CachedResponse] = OrderedDict()
+        self.by_soup: Dict[int, CachedResponse] = {}
+        self.lock = threading.Lock()
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """Headers that make a request for the URL conditional on a change"""
+        cached = self.responses.get(url)
+        headers = {}
+        if cached is None:
+            return headers
+        if cached.etag is not None:
+            headers['If-None-Match'] = cached.etag
+        if cached.last_modified is not None:
+            headers['If-Modified-Since'] = cached.last_modified
+        return headers
+
+    def get_soup(self, url: str, digest: Optional[str] = None) -> Optional[BeautifulSoup]:
+        """Return the cached soup for the URL. If a content digest is given, only
+           return it if the cached response had the same content"""
+        cached = self.responses.get(url)
+        if cached is None:
+            return None
+        if digest is not None and cached.content_hash != digest:
+            return None
+        return cached.soup
+
+    def store(self, url: str, response, soup: BeautifulSoup, digest: str):
+        """Remember the response for a URL, replacing the previous one"""
+        cached = CachedResponse(etag=response.headers.get('ETag'),
+                                last_modified=response.headers.get('Last-Modified'),
+                                content_hash=digest,
+                                soup=soup)
+        with self.lock:
+            previous = self.responses.get(url)
+            if previous is not None:
+                self.by_soup.pop(id(previous.soup), None)
+            self.responses[url] = cached
+            self.responses.move_to_end(url)
+            self.by_soup[id(soup)] = cached
+            while len(self.responses) > self.max_entries:
+                _, evicted = self.responses.popitem(last=False)
+                self.by_soup.pop(id(evicted.soup), None)
+
+    def get_entries(self, soup: BeautifulSoup) -> Optional[List[Dict]]:
+        """Return copies of the exposes previously extracted from this soup"""
+        cached = self.by_soup.get(id(soup))
+        if cached is None or cached.soup is not soup or cached.entries is None:
+            return None
+        return [dict(entry) for entry in cached.entries]
+
+    def store_entries(self, soup: BeautifulSoup, entries: List[Dict]):
+        """Remember the exposes extracted from a cached soup"""
+        cached = self.by_soup.get(id(soup))
+        if cached is not None and cached.soup is soup:
+            cached.entries = [dict(entry) for entry in entries]
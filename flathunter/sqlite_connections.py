@@ -0,0 +1,87 @@
+"""Connection management for the SQLite database. Every thread reads through its
+own connection, while all writes go through a single, shared writer connection"""
+import sqlite3 as lite
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+# Pragmas applied to every connection. In WAL mode, readers do not block the
+# writer and the writer does not block readers; synchronous=NORMAL only syncs
+# at checkpoints, which is safe with WAL.
+CONNECTION_PRAGMAS = [
+    'PRAGMA busy_timeout = 5000',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA cache_size = -16000',
+    'PRAGMA mmap_size = 67108864',
+    'PRAGMA temp_store = MEMORY',
+]
+
+
+class SqliteConnectionManager:
+    """Hands out SQLite connections for a database.
+
+    File databases are switched to WAL journaling, so that reads (for example
+    from the web interface) proceed while a hunt is writing. Readers get a
+    connection per thread; writers share one connection and take turns through
+    a lock, so there is never more than one write transaction in flight.
+    In-memory databases exist only within a single connection, so there one
+    connection serves all threads, and reads take the lock too."""
+
+    def __init__(self, db_name: str,
+                 initialize: Optional[Callable[[lite.Connection], None]] = None):
+        self.db_name = db_name
+        self.initialize = initialize
+        self.in_memory = db_name == ':memory:'
+        self.threadlocal = threading.local()
+        self.lock = threading.RLock()
+        self.write_connection: Optional[lite.Connection] = None
+
+    def _connect(self) -> lite.Connection:
+        """Open a new connection with the standard pragmas"""
+        connection = lite.connect(self.db_name, check_same_thread=False)
+        for pragma in CONNECTION_PRAGMAS:
+            connection.execute(pragma)
+        return connection
+
+    def get_writer(self) -> lite.Connection:
+        """Return the shared writer connection, opening (and initialising the
+           database) on first use"""
+        with self.lock:
+            if self.write_connection is None:
+                connection = self._connect()
+                if not self.in_memory:
+                    connection.execute('PRAGMA journal_mode = WAL')
+                if self.initialize is not None:
+                    self.initialize(connection)
+                self.write_connection = connection
+            return self.write_connection
+
+    def get_reader(self) -> lite.Connection:
+        """Return the read connection of the current thread"""
+        if self.in_memory:
+            return self.get_writer()
+        connection = getattr(self.threadlocal, 'connection', None)
+        if connection is None:
+            if self.write_connection is None:
+                self.get_writer()
+            connection = self._connect()
+            self.threadlocal.connection = connection
+        return connection
+
+    @contextmanager
+    def reader(self) -> Iterator[lite.Connection]:
+        """Context for reading from the database"""
+        if self.in_memory:
+            with self.lock:
+                yield self.get_reader()
+        else:
+            yield self.get_reader()
+
+    @contextmanager
+    def writer(self) -> Iterator[lite.Connection]:
+        """Context for a write transaction, committed when the context exits
+           without an exception and rolled back otherwise"""
+        with self.lock:
+            connection = self.get_writer()
+            with connection:
+                yield connection
@@ -0,0 +1,236 @@
+"""Match a batch of exposes against the filters of many users at once.
+
+The numeric filters of all users (price, size, rooms and price per square
+meter bounds) are stored as threshold columns, and each expose's values are
+parsed only once. With NumPy installed, the whole user x expose match matrix
+is computed in a few vectorized comparisons; without it, the same thresholds
+are compared in plain Python. Filters that have no threshold column (like
+excluded titles) are only evaluated for the pairs that pass the thresholds.
+
+`UserFilterIndex` is meant to be kept for a long time and updated as users
+change their settings. Without NumPy, it keeps the thresholds in sorted
+boundary arrays, to find the candidate users of an expose without checking
+every user."""
+import math
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from flathunter.config import YamlConfig
+from flathunter.filter import AbstractFilter, ExposeValues, FilterBuilder, \
+    MaxPriceFilter, MinPriceFilter, MaxSizeFilter, MinSizeFilter, \
+    MaxRoomsFilter, MinRoomsFilter, PPSFilter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Expose value columns
+PRICE, SIZE, ROOMS, PPS = range(4)
+COLUMNS = 4
+
+# Threshold columns: filter class, attribute holding the threshold, value
+# column, and whether the threshold is a lower (True) or upper (False) bound
+THRESHOLDS = [
+    (MinPriceFilter, 'min_price', PRICE, True),
+    (MaxPriceFilter, 'max_price', PRICE, False),
+    (MinSizeFilter, 'min_size', SIZE, True),
+    (MaxSizeFilter, 'max_size', SIZE, False),
+    (MinRoomsFilter, 'min_rooms', ROOMS, True),
+    (MaxRoomsFilter, 'max_rooms', ROOMS, False),
+    (PPSFilter, 'max_pps', PPS, False),
+]
+
+
+def filters_for_settings(settings: Dict) -> List[AbstractFilter]:
+    """The filters configured in a user's settings"""
+    return FilterBuilder().read_config(YamlConfig(settings)).filters
+
+
+def user_thresholds(filters: List[AbstractFilter]) -> Tuple[List[float], List[AbstractFilter]]:
+    """Split a user's filters into a row of thresholds (infinite where the user
+       has no bound) and the filters that have no threshold column"""
+    row = [-math.inf if lower else math.inf for _, _, _, lower in THRESHOLDS]
+    others = []
+    for filter_ in filters:
+        for index, (filter_class, attribute, _, _) in enumerate(THRESHOLDS):
+            if type(filter_) is filter_class: # pylint: disable=unidiomatic-typecheck
+                row[index] = float(getattr(filter_, attribute))
+                break
+        else:
+            others.append(filter_)
+    return row, others
+
+
+def expose_row(expose: Dict) -> List[float]:
+    """Parse the values of an expose, using NaN for missing values"""
+    values = ExposeValues(expose)
+    price = math.nan if values.price is None else values.price
+    size = math.nan if values.size is None else values.size
+    rooms = math.nan if values.rooms is None else values.rooms
+    pps = price / size if size else math.nan
+    return [price, size, rooms, pps]
+
+
+def within_bounds(bounds: List[float], row: List[float]) -> bool:
+    """True if the expose values are within a user's thresholds. Comparisons
+       with NaN are False, so exposes without a value pass"""
+    for index, (_, _, column, lower) in enumerate(THRESHOLDS):
+        value = row[column]
+        if lower and value < bounds[index] or not lower and value > bounds[index]:
+            return False
+    return True
+
+
+class UserMatcher:
+    """Holds the filter thresholds of a set of users, and matches batches of
+       exposes against all of them"""
+
+    def __init__(self, user_settings: Iterable[Tuple[int, Dict]] = ()):
+        self.bounds: Dict[int, List[float]] = {}
+        self.other_checks: Dict[int, List[AbstractFilter]] = {}
+        for user_id, settings in user_settings:
+            self._store_user(user_id, settings)
+
+    def _store_user(self, user_id: int, settings: Dict):
+        """Store the thresholds and other filters of a user"""
+        row, others = user_thresholds(filters_for_settings(settings))
+        self.bounds[user_id] = row
+        if len(others) > 0:
+            self.other_checks[user_id] = others
+        else:
+            self.other_checks.pop(user_id, None)
+
+    def set_user(self, user_id: int, settings: Dict):
+        """Add a user, or replace the filters of a user, from their settings"""
+        self.remove_user(user_id)
+        self._store_user(user_id, settings)
+
+    def remove_user(self, user_id: int):
+        """Stop matching exposes for a user"""
+        self.bounds.pop(user_id, None)
+        self.other_checks.pop(user_id, None)
+
+    def passes_other_checks(self, user_id: int, expose: Dict) -> bool:
+        """True if the expose passes the user's filters without threshold column"""
+        others = self.other_checks.get(user_id)
+        return others is None or all(check.is_interesting(expose) for check in others)
+
+    def match(self, exposes: List[Dict]) -> Iterator[Tuple[int, List[Dict]]]:
+        """Yield each user with the exposes matching their filters"""
+        if len(self.bounds) == 0:
+            return
+        user_ids = list(self.bounds)
+        rows = [expose_row(expose) for expose in exposes]
+        if np is not None:
+            matrix = self._match_vectorized(user_ids, rows)
+            candidates = (np.flatnonzero(matches) for matches in matrix)
+        else:
+            candidates = ([index for index, row in enumerate(rows)
+                           if within_bounds(self.bounds[user_id], row)]
+                          for user_id in user_ids)
+        for user_id, expose_indices in zip(user_ids, candidates):
+            yield user_id, [exposes[index] for index in expose_indices
+                            if self.passes_other_checks(user_id, exposes[index])]
+
+    def _match_vectorized(self, user_ids: List[int], rows: List[List[float]]):
+        """Compute the user x expose match matrix with NumPy"""
+        values = np.array(rows, dtype=float).reshape(len(rows), COLUMNS)
+        bounds = np.array([self.bounds[user_id] for user_id in user_ids], dtype=float)
+        matrix = np.ones((len(user_ids), len(rows)), dtype=bool)
+        for index, (_, _, column, lower) in enumerate(THRESHOLDS):
+            # comparisons with NaN are False, so exposes without the value pass
+            expose_values = values[:, column][np.newaxis, :]
+            user_bounds = bounds[:, index][:, np.newaxis]
+            if lower:
+                matrix &= ~(expose_values < user_bounds)
+            else:
+                matrix &= ~(expose_values > user_bounds)
+        return matrix
+
+
+class UserFilterIndex(UserMatcher):
+    """User matcher that finds the candidate users for an expose without
+       looking at every user.
+
+    For every threshold column, the bounded users are kept in an array sorted
+    by their bound, so the users accepting a value form a prefix (for lower
+    bounds) or a suffix (for upper bounds) found by bisection. For each expose,
+    the column accepting the fewest users is picked, and only those users (and
+    the ones without a bound in that column) are checked in full. Users are
+    added, updated and removed incrementally. With NumPy installed, comparing
+    all users at once is faster, so exposes are matched with `UserMatcher`."""
+
+    def __init__(self, user_settings: Iterable[Tuple[int, Dict]] = ()):
+        super().__init__(user_settings)
+        self.columns: List[List[Tuple[float, int]]] = [[] for _ in THRESHOLDS]
+        self.unbounded: List[Set[int]] = [set() for _ in THRESHOLDS]
+        for user_id, row in self.bounds.items():
+            for index, bound in enumerate(row):
+                if math.isinf(bound):
+                    self.unbounded[index].add(user_id)
+                else:
+                    self.columns[index].append((bound, user_id))
+        for entries in self.columns:
+            entries.sort()
+
+    def set_user(self, user_id: int, settings: Dict):
+        """Add a user, or replace the filters of a user, from their settings"""
+        super().set_user(user_id, settings)
+        for index, bound in enumerate(self.bounds[user_id]):
+            if math.isinf(bound):
+                self.unbounded[index].add(user_id)
+            else:
+                insort(self.columns[index], (bound, user_id))
+
+    def remove_user(self, user_id: int):
+        """Stop matching exposes for a user"""
+        row = self.bounds.get(user_id)
+        if row is not None:
+            for index, bound in enumerate(row):
+                if math.isinf(bound):
+                    self.unbounded[index].discard(user_id)
+                else:
+                    entries = self.columns[index]
+                    del entries[bisect_left(entries, (bound, user_id))]
+        super().remove_user(user_id)
+
+    def candidates(self, row: List[float]) -> List[int]:
+        """The users that may accept an expose with the given values: those
+           accepting it in the most selective threshold column. Returns a copy,
+           so users may be changed while the candidates are checked"""
+        best_count = math.inf
+        best_range: Optional[Tuple[int, int, int]] = None
+        for index, (_, _, column, lower) in enumerate(THRESHOLDS):
+            value = row[column]
+            if math.isnan(value):
+                continue
+            entries = self.columns[index]
+            if lower:
+                start, end = 0, bisect_right(entries, (value, math.inf))
+            else:
+                start, end = bisect_left(entries, (value, -math.inf)), len(entries)
+            count = end - start + len(self.unbounded[index])
+            if count < best_count:
+                best_count, best_range = count, (index, start, end)
+        if best_range is None:
+            return list(self.bounds)
+        index, start, end = best_range
+        return list(self.unbounded[index]) \
+            + [user_id for _, user_id in self.columns[index][start:end]]
+
+    def match(self, exposes: List[Dict]) -> Iterator[Tuple[int, List[Dict]]]:
+        """Yield each user with matching exposes, together with those exposes"""
+        if np is not None:
+            yield from ((user_id, matches) for user_id, matches in super().match(exposes)
+                        if len(matches) > 0)
+            return
+        matches: Dict[int, List[Dict]] = {}
+        for expose in exposes:
+            row = expose_row(expose)
+            for user_id in self.candidates(row):
+                bounds = self.bounds.get(user_id)
+                if bounds is not None and within_bounds(bounds, row) \
+                        and self.passes_other_checks(user_id, expose):
+                    matches.setdefault(user_id, []).append(expose)
+        yield from matches.items()
@@ -0,0 +1,49 @@
+"""Background threads that are started on first use, and stopped at the latest
+when the interpreter exits"""
+import atexit
+import threading
+from typing import Callable, Optional
+
+
+class BackgroundThread:
+    """A daemon thread running `run`, started by `start` if it is not running
+    yet. `stop` calls `request_stop`, which has to make `run` return, and waits
+    for the thread to end. Threads that are still running at exit are stopped
+    the same way."""
+
+    def __init__(self, name: str, run: Callable[[], None],
+                 request_stop: Callable[[], None]):
+        self.name = name
+        self.run = run
+        self.request_stop = request_stop
+        self.thread: Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        """True if the thread has been started, and not been stopped since"""
+        return self.thread is not None
+
+    def is_current(self) -> bool:
+        """True if called from the running thread, which should keep running"""
+        return self.thread is threading.current_thread()
+
+    def start(self):
+        """Start the thread, if it is not running yet"""
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self.run, name=self.name, daemon=True)
+            self.thread.start()
+            atexit.register(self.stop)
+
+    def stop(self) -> bool:
+        """Stop the thread and wait for it to end. Returns False if it was not running"""
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is None:
+            return False
+        atexit.unregister(self.stop)
+        self.request_stop()
+        thread.join()
+        return True
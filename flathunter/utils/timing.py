@@ -0,0 +1,47 @@
+"""Timing instrumentation: accumulate the time spent in named stages, and log
+a summary after each hunt"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Tuple
+
+from flathunter.logging import logger
+
+
+class Timings:
+    """Total time and number of calls per named stage. Thread-safe"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages: Dict[str, Tuple[int, float]] = {}
+
+    @contextmanager
+    def measure(self, name: str) -> Iterator[None]:
+        """Context adding its duration to the stage `name`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float):
+        """Add a duration to the stage `name`"""
+        with self.lock:
+            calls, total = self.stages.get(name, (0, 0.0))
+            self.stages[name] = (calls + 1, total + seconds)
+
+    def snapshot(self) -> Dict[str, Tuple[int, float]]:
+        """The number of calls and the total seconds, per stage"""
+        with self.lock:
+            return dict(self.stages)
+
+    def log_and_reset(self):
+        """Log the recorded timings at debug level, and start over"""
+        with self.lock:
+            stages, self.stages = self.stages, {}
+        for name, (calls, total) in sorted(stages.items()):
+            logger.debug("Timing %s: %d calls, %.3fs total, %.1fms average",
+                         name, calls, total, 1000 * total / calls)
+
+
+timings = Timings()
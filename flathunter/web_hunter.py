@@ -1,16 +1,57 @@
 """Flathunter implementation for website"""
-from flathunter.config import YamlConfig
+import threading
+from typing import Dict, List, Optional, Tuple
+
 from flathunter.logging import logger
 from flathunter.hunter import Hunter
 from flathunter.filter import Filter
 from flathunter.processor import ProcessorChain
+from flathunter.user_matcher import UserFilterIndex
 from flathunter.exceptions import BotBlockedException, UserDeactivatedException
+from flathunter.notifiers import SenderTelegram
 
 class WebHunter(Hunter):
     """Flathunter implementation for website. Designed to hunt all exposes from
        all sites and save them to the database. Includes support for multiple users
        with individual filters implemented in-app"""
 
+    def __init__(self, config, id_watch):
+        super().__init__(config, id_watch)
+        self.user_index: Optional[UserFilterIndex] = None
+        self.user_settings_version: Optional[int] = None
+        self.user_index_lock = threading.Lock()
+
+    def get_user_index(self) -> UserFilterIndex:
+        """Return the index of the filters of all users receiving notifications.
+           Settings saved through this hunter update the index in place; it is
+           only loaded again when the settings version shows that another
+           instance serving the website changed them"""
+        version = self.id_watch.get_user_settings_version()
+        with self.user_index_lock:
+            if self.user_index is None or version != self.user_settings_version:
+                self.user_index = UserFilterIndex(
+                    (user_id, settings)
+                    for user_id, settings in self.id_watch.get_user_settings()
+                    if 'mute_notifications' not in settings)
+                self.user_settings_version = version
+            return self.user_index
+
+    def save_settings_for_user(self, user_id, settings):
+        """Save the settings of a user, updating the user filter index"""
+        self.id_watch.save_settings_for_user(user_id, settings)
+        version = self.id_watch.get_user_settings_version()
+        with self.user_index_lock:
+            if self.user_index is None:
+                return
+            if 'mute_notifications' in settings:
+                self.user_index.remove_user(user_id)
+            else:
+                self.user_index.set_user(user_id, settings)
+            # if other changes were saved in the meantime, the index is reloaded
+            if self.user_settings_version is not None \
+                    and version == self.user_settings_version + 1:
+                self.user_settings_version = version
+
     def hunt_flats(self, max_pages=1):
         """Crawl all URLs, and send notifications to users of new flats"""
         filter_set = Filter.builder() \
@@ -31,30 +72,44 @@ class WebHunter(Hunter):
         for expose in processor_chain.process(self.crawl_for_exposes(max_pages=max_pages)):
             new_exposes.append(expose)
 
-        for (user_id, settings) in self.id_watch.get_user_settings():
-            if 'mute_notifications' in settings:
-                continue
-            filter_set = Filter.builder().read_config(YamlConfig(settings)).build()
-            try:
-                processor_chain = ProcessorChain.builder(self.config) \
-                                                .apply_filter(filter_set) \
-                                                .send_messages([user_id]) \
-                                                .build()
-                for message in processor_chain.process(new_exposes):
-                    logger.debug("Sent expose %d to user %d", message['id'], user_id)
-            except BotBlockedException:
-                logger.warning("Bot has been blocked by user %d - updating settings", user_id)
-                settings["mute_notifications"] = True
-                self.id_watch.save_settings_for_user(user_id, settings)
-            except UserDeactivatedException:
-                logger.warning(
-                    "User %d has deactivated their telegram account - updating settings", user_id)
-                settings["mute_notifications"] = True
-                self.id_watch.save_settings_for_user(user_id, settings)
+        user_index = self.get_user_index()
+        with self.user_index_lock:
+            matches = list(user_index.match(new_exposes))
+        self.notify_users(matches)
 
         self.id_watch.update_last_run_time()
         return list(new_exposes)
 
+    def notify_users(self, matches: List[Tuple[int, List[Dict]]]):
+        """Send every user the exposes matching their filters. The Telegram
+           messages for all users are dispatched together"""
+        notifiers = self.config.notifiers()
+        if 'telegram' in notifiers:
+            sender = SenderTelegram(self.config, receivers=[])
+            for user_id, error in sender.send_exposes(matches).items():
+                self.handle_failed_delivery(user_id, error)
+
+        other_notifiers = [notifier for notifier in notifiers if notifier != 'telegram']
+        if len(other_notifiers) == 0:
+            return
+        for (user_id, exposes) in matches:
+            processor_chain = ProcessorChain.builder(self.config) \
+                                            .send_messages([user_id], other_notifiers) \
+                                            .build()
+            for message in processor_chain.process(exposes):
+                logger.debug("Sent expose %d to user %d", message['id'], user_id)
+
+    def handle_failed_delivery(self, user_id: int, error: Exception):
+        """Stop notifying users that blocked the bot or deactivated their account"""
+        if isinstance(error, BotBlockedException):
+            logger.warning("Bot has been blocked by user %d - updating settings", user_id)
+        elif isinstance(error, UserDeactivatedException):
+            logger.warning(
+                "User %d has deactivated their telegram account - updating settings", user_id)
+        else:
+            return
+        self.set_notification_status(user_id, False)
+
     def get_last_run_time(self):
         """Return the time of last run, for display on the website"""
         return self.id_watch.get_last_run_time()
@@ -73,7 +128,7 @@ class WebHunter(Hunter):
         if settings is None:
             settings = {}
         settings['filters'] = filters
-        self.id_watch.save_settings_for_user(user_id, settings)
+        self.save_settings_for_user(user_id, settings)
 
     def get_filters_for_user(self, user_id):
         """Return the filters for a given user"""
@@ -95,7 +150,7 @@ class WebHunter(Hunter):
             del settings['mute_notifications']
         if 'mute_notifications' not in settings and not receives_notifications:
             settings['mute_notifications'] = True
-        self.id_watch.save_settings_for_user(user_id, settings)
+        self.save_settings_for_user(user_id, settings)
 
     def toggle_notification_status(self, user_id):
         """Toggle notification status for the given user"""
@@ -7,6 +7,7 @@ from flathunter.googlecloud_idmaintainer import GoogleCloudIdMaintainer
 from flathunter.web_hunter import WebHunter
 from flathunter.config import Config
 from flathunter.logging import configure_logging
+from flathunter.http_pool import configure_connection_pools
 
 from flathunter.web import app
 
@@ -29,6 +30,9 @@ else:
 
 configure_logging(config)
 
+# share HTTP connection pools between all crawlers and notifiers
+configure_connection_pools(config)
+
 # initialize search plugins for config
 config.init_searchers()
 
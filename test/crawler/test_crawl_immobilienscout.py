@@ -31,7 +31,8 @@ def test_parse_exposes_from_json(crawler):
 def test_crawl_works(crawler):
     if not test_config.captcha_enabled():
         pytest.skip("Captcha solving is not enabled - skipping immoscout tests. Setup captcha solving")
-    soup = crawler.get_page(TEST_URL, crawler.get_driver(), page_no=1)
+    with crawler.checkout_driver() as driver:
+        soup = crawler.get_page(TEST_URL, driver, page_no=1)
     assert soup is not None
     print(soup)
     entries = crawler.extract_data(soup)
@@ -45,7 +46,8 @@ def test_crawl_works(crawler):
 def test_process_expose_fetches_details(crawler):
     if not test_config.captcha_enabled():
         pytest.skip("Captcha solving is not enabled - skipping immoscout tests. Setup captcha solving")
-    soup = crawler.get_page(TEST_URL, crawler.get_driver(), page_no=1)
+    with crawler.checkout_driver() as driver:
+        soup = crawler.get_page(TEST_URL, driver, page_no=1)
     assert soup is not None
     entries = crawler.extract_data(soup)
     assert entries is not None
@@ -65,4 +67,44 @@ def test_captcha_error_no_balance(crawler):
         m.post('http://2captcha.com/in.php', text='OK|asdfkjhsdf')
         m.get('http://2captcha.com/res.php', text='ERROR_ZERO_BALANCE')
         with pytest.raises(CaptchaBalanceEmpty):
-            assert crawler.get_page(TEST_URL, crawler.get_driver(), page_no=1)
+            with crawler.checkout_driver() as driver:
+                assert crawler.get_page(TEST_URL, driver, page_no=1)
+
+def mock_pages(crawler, mocker, pages):
+    mocker.patch.object(crawler, 'uses_driver', return_value=False)
+    mocker.patch('flathunter.crawler.immobilienscout.get_result_count',
+                 return_value=sum(len(page) for page in pages.values()))
+    get_page = mocker.patch.object(crawler, 'get_page',
+                                   side_effect=lambda url, driver, page_no: page_no)
+    mocker.patch.object(crawler, 'extract_data', side_effect=lambda page: list(pages[page]))
+    return get_page
+
+def test_crawl_loads_all_pages(crawler, mocker):
+    pages = { 1: [{'id': 1}, {'id': 2}], 2: [{'id': 3}], 3: [{'id': 4}] }
+    get_page = mock_pages(crawler, mocker, pages)
+    entries = crawler.get_results(TEST_URL)
+    assert [entry['id'] for entry in entries] == [1, 2, 3, 4]
+    assert get_page.call_count == 3
+
+def test_incremental_crawl_stops_at_seen_page(crawler, mocker):
+    pages = { 1: [{'id': 1}, {'id': 2}], 2: [{'id': 3}], 3: [{'id': 4}] }
+    get_page = mock_pages(crawler, mocker, pages)
+    crawler.set_seen_oracle(lambda expose_ids: {3} & set(expose_ids))
+    entries = crawler.get_results(TEST_URL)
+    assert [entry['id'] for entry in entries] == [1, 2, 3]
+    assert get_page.call_count == 2
+
+def test_incremental_crawl_looks_up_each_page_at_once(crawler, mocker):
+    pages = { 1: [{'id': 1}, {'id': 2}], 2: [{'id': 3}] }
+    mock_pages(crawler, mocker, pages)
+    lookups = []
+    crawler.set_seen_oracle(lambda expose_ids: lookups.append(expose_ids) or set())
+    crawler.get_results(TEST_URL)
+    assert lookups == [[1, 2], [3]]
+
+def test_incremental_crawl_stops_at_first_page(crawler, mocker):
+    pages = { 1: [{'id': 1}, {'id': 2}], 2: [{'id': 3}] }
+    get_page = mock_pages(crawler, mocker, pages)
+    crawler.set_seen_oracle(set)
+    crawler.get_results(TEST_URL)
+    assert get_page.call_count == 1
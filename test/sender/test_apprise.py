@@ -1,8 +1,14 @@
 import unittest
+from unittest import mock
 
+import apprise
 import requests_mock
 
 from flathunter.notifiers import SenderApprise
+from flathunter.notifiers.sender_apprise import get_apprise
+
+EXPOSE = {'id': 1, 'title': 'Flat', 'rooms': '2', 'size': '50', 'price': '900',
+          'url': 'https://www.example.com/expose/1', 'address': 'Street'}
 
 
 class SenderAppriseTest(unittest.TestCase):
@@ -11,3 +17,24 @@ class SenderAppriseTest(unittest.TestCase):
     def test_send_no_message_if_no_receivers(self, m):
         sender = SenderApprise({"apprise": []})
         self.assertEqual(None, sender.notify("result"), "Expected no message to be sent")
+
+    def test_apprise_object_is_reused(self):
+        urls = ["json://localhost:1/first", "json://localhost:1/second"]
+        with mock.patch.object(apprise.Apprise, 'add') as add:
+            first = get_apprise(urls)
+            second = SenderApprise({"apprise": list(urls)})
+            with mock.patch.object(first, 'notify', return_value=True) as notify:
+                self.assertTrue(second.deliver(EXPOSE))
+                self.assertTrue(second.deliver(EXPOSE))
+        self.assertEqual(2, add.call_count)
+        self.assertEqual(2, notify.call_count)
+
+    def test_batches_are_sent_concurrently(self):
+        urls = ["json://localhost:1/batch"]
+        exposes = [dict(EXPOSE, id=expose_id, title=f"Flat {expose_id}") for expose_id in range(3)]
+        sender = SenderApprise({"apprise": urls, "message": "{title}"})
+        with mock.patch.object(get_apprise(urls), 'async_notify',
+                               new=mock.AsyncMock(return_value=True)) as async_notify:
+            self.assertEqual(exposes, sender.process_batch(exposes))
+        bodies = sorted(call.kwargs['body'] for call in async_notify.call_args_list)
+        self.assertEqual(["Flat 0", "Flat 1", "Flat 2"], bodies)
@@ -0,0 +1,92 @@
+import json
+import threading
+import time
+from urllib.parse import parse_qs
+
+from requests_mock import Mocker
+
+from flathunter.exceptions import BotBlockedException
+from flathunter.notifiers.telegram_dispatcher import TelegramDispatcher, TelegramMessage
+
+TEXT_URL = 'https://api.telegram.org/botdummy_token/sendMessage'
+MEDIA_URL = 'https://api.telegram.org/botdummy_token/sendMediaGroup'
+
+
+class FakeTelegram:
+    """Answers Telegram API calls, recording them per chat"""
+
+    def __init__(self, rate_limited=(), blocked=()):
+        self.calls = []
+        self.rate_limited = set(rate_limited)
+        self.blocked = set(blocked)
+        self.lock = threading.Lock()
+
+    def respond(self, request, context):
+        payload = {key: values[0] for key, values in parse_qs(request.text).items()}
+        chat_id = int(payload['chat_id'])
+        with self.lock:
+            self.calls.append((time.monotonic(), chat_id, request.url, payload))
+            if chat_id in self.blocked:
+                context.status_code = 403
+                return json.dumps({"description": "Forbidden: bot was blocked by the user"})
+            if chat_id in self.rate_limited:
+                self.rate_limited.discard(chat_id)
+                context.status_code = 429
+                return json.dumps({"description": "Too Many Requests: retry after 1",
+                                   "parameters": {"retry_after": 1}})
+        return json.dumps({"ok": True, "result": {"message_id": 100 + chat_id}})
+
+    def texts(self, chat_id):
+        return [payload['text'] for _, chat, url, payload in self.calls
+                if chat == chat_id and url == TEXT_URL and chat_id not in self.blocked]
+
+
+def dispatch(fake, messages, **kwargs):
+    with Mocker() as mock:
+        mock.post(TEXT_URL, text=fake.respond)
+        mock.post(MEDIA_URL, text=fake.respond)
+        return TelegramDispatcher('dummy_token', **kwargs).send(messages)
+
+
+def test_messages_reach_every_chat_in_order():
+    fake = FakeTelegram()
+    messages = [TelegramMessage(chat_id=chat_id, text=f"{chat_id}-{index}")
+                for index in range(2) for chat_id in range(20)]
+    assert dispatch(fake, messages) == {}
+    for chat_id in range(20):
+        assert fake.texts(chat_id) == [f"{chat_id}-0", f"{chat_id}-1"]
+
+def test_images_are_sent_as_replies_in_groups():
+    fake = FakeTelegram()
+    message = TelegramMessage(chat_id=7, text="flat", images=[f"https://example.com/{i}"
+                                                                for i in range(15)])
+    dispatch(fake, [message])
+    media_calls = [payload for _, _, url, payload in fake.calls if url == MEDIA_URL]
+    assert len(media_calls) == 2
+    assert all(payload['reply_to_message_id'] == '107' for payload in media_calls)
+
+def test_rate_limited_chat_does_not_hold_up_others():
+    fake = FakeTelegram(rate_limited=[1])
+    start = time.monotonic()
+    messages = [TelegramMessage(chat_id=chat_id, text="flat") for chat_id in range(1, 5)]
+    assert dispatch(fake, messages) == {}
+    delivered = {chat: at - start for at, chat, _, _ in fake.calls}
+    assert fake.texts(1) == ["flat", "flat"]
+    assert delivered[1] >= 1
+    assert all(delivered[chat_id] < 0.5 for chat_id in range(2, 5))
+
+def test_rate_limited_message_is_dropped_after_retries():
+    fake = FakeTelegram(rate_limited=[1])
+    messages = [TelegramMessage(chat_id=1, text="flat")]
+    assert dispatch(fake, messages, max_retries=0) == {}
+    assert len(fake.calls) == 1
+
+def test_blocked_chats_are_reported():
+    fake = FakeTelegram(blocked=[2])
+    messages = [TelegramMessage(chat_id=chat_id, text="flat") for chat_id in range(1, 4)] \
+        + [TelegramMessage(chat_id=2, text="second")]
+    failures = dispatch(fake, messages)
+    assert list(failures) == [2]
+    assert isinstance(failures[2], BotBlockedException)
+    assert len([call for call in fake.calls if call[1] == 2]) == 1
+    assert fake.texts(1) == ["flat"] and fake.texts(3) == ["flat"]
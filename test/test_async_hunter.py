@@ -0,0 +1,147 @@
+import asyncio
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from flathunter import async_http
+from flathunter.abstract_crawler import Crawler
+from flathunter.async_http import AsyncHttpClient
+from flathunter.async_hunter import AsyncHunter
+from flathunter.hunter import Hunter
+from flathunter.idmaintainer import IdMaintainer
+from flathunter.notifiers.sender_slack import SenderSlack
+from test.dummy_crawler import DummyCrawler
+from test.utils.config import StringConfig
+
+FILTER_CONFIG = """
+urls:
+  - https://www.example.com/search/flats-in-berlin
+  - https://www.example.com/search/flats-in-hamburg
+
+filters:
+  excluded_titles:
+    - "wg"
+    - "tausch"
+  max_price: 2000
+"""
+
+SEARCH_PAGE = b"""<html><body>
+<div class="expose" data-id="1">Flat one</div>
+<div class="expose" data-id="2">Flat two</div>
+</body></html>"""
+
+
+class Handler(BaseHTTPRequestHandler):
+    posts = []
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('ETag', '"v1"')
+        self.end_headers()
+        self.wfile.write(SEARCH_PAGE)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        Handler.posts.append(json.loads(body))
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    Handler.posts = []
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=['aiohttp', 'threads'])
+def backend(request, monkeypatch):
+    if request.param == 'aiohttp':
+        if async_http.aiohttp is None:
+            pytest.skip("aiohttp is not installed")
+    else:
+        monkeypatch.setattr(async_http, 'aiohttp', None)
+    return request.param
+
+
+class LocalCrawler(Crawler):
+    URL_PATTERN = re.compile(r'http://127\.0\.0\.1')
+
+    def extract_data(self, soup):
+        return [{'id': int(div['data-id']), 'title': div.text}
+                for div in soup.find_all('div', {'class': 'expose'})]
+
+
+def run_with_client(coroutine_function):
+    async def run():
+        async with AsyncHttpClient() as client:
+            return await coroutine_function(client)
+    return asyncio.run(run())
+
+
+def test_client_reads_response(server_url, backend):
+    response = run_with_client(lambda client: client.get(server_url + '/search'))
+    assert response.status_code == 200
+    assert response.content == SEARCH_PAGE
+    assert response.headers['etag'] == '"v1"'
+
+
+def test_client_raises_connection_error(backend):
+    with pytest.raises(requests.exceptions.ConnectionError):
+        run_with_client(lambda client: client.get('http://127.0.0.1:1/search', timeout=5))
+
+
+def test_crawl_async_fetches_and_extracts(server_url, backend):
+    crawler = LocalCrawler(StringConfig(string=""))
+    entries = run_with_client(lambda client: crawler.crawl_async(client, server_url + '/search'))
+    assert entries == [{'id': 1, 'title': 'Flat one'}, {'id': 2, 'title': 'Flat two'}]
+
+
+def test_crawl_async_ignores_other_urls():
+    crawler = LocalCrawler(StringConfig(string=""))
+    entries = run_with_client(
+        lambda client: crawler.crawl_async(client, 'https://www.example.com/search'))
+    assert entries == []
+
+
+def test_slack_sends_with_async_client(server_url, backend):
+    config = StringConfig(string=f"slack:\n  webhook_url: {server_url}/hook\n")
+    expose = {'title': 'Flat', 'rooms': '2', 'size': '50', 'price': '900',
+              'url': 'https://www.example.com/expose/1', 'address': 'Street'}
+    result = run_with_client(lambda client: SenderSlack(config).process_expose_async(expose, client))
+    assert result is expose
+    assert len(Handler.posts) == 1
+    assert 'https://www.example.com/expose/1' in Handler.posts[0]['text']
+
+
+def test_async_hunter_matches_sync_hunter():
+    def hunt(hunter_class):
+        config = StringConfig(string=FILTER_CONFIG)
+        config.set_searchers([DummyCrawler()])
+        return hunter_class(config, IdMaintainer(":memory:")).hunt_flats()
+
+    exposes = hunt(AsyncHunter)
+    assert len(exposes) > 0
+    assert exposes == hunt(Hunter)
+
+
+def test_async_hunter_only_reports_new_exposes():
+    config = StringConfig(string=FILTER_CONFIG)
+    config.set_searchers([DummyCrawler()])
+    hunter = AsyncHunter(config, IdMaintainer(":memory:"))
+    exposes = hunter.hunt_flats()
+    ids = [expose['id'] for expose in exposes]
+    assert len(ids) == len(set(ids))
+    assert all(hunter.id_watch.is_processed(expose_id) for expose_id in ids)
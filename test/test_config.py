@@ -3,6 +3,10 @@ import tempfile
 import os.path
 import os
 from flathunter.config import Config
+from flathunter.crawler.immobilienscout import Immobilienscout
+from flathunter.crawler.kleinanzeigen import Kleinanzeigen
+from flathunter.crawler.wggesucht import WgGesucht
+from test.dummy_crawler import DummyCrawler
 from test.utils.config import StringConfig
 
 class ConfigTest(unittest.TestCase):
@@ -87,3 +91,24 @@ filters:
        config = StringConfig(string=self.FILTERS_CONFIG)
        self.assertIsNotNone(config)
        self.assertEqual(config.database_location(), os.path.abspath(os.path.dirname(os.path.abspath(__file__)) + "/.."))
+
+    def test_searcher_for_url(self):
+       config = StringConfig(string=self.DUMMY_CONFIG)
+       config.init_searchers()
+       self.assertIsInstance(config.searcher_for_url(
+           "https://www.immobilienscout24.de/Suche/de/berlin/berlin/wohnung-mieten"), Immobilienscout)
+       self.assertIsInstance(config.searcher_for_url(
+           "https://www.immobilienscout24.de/expose/123456"), Immobilienscout)
+       self.assertIsInstance(config.searcher_for_url(
+           "https://www.kleinanzeigen.de/s-wohnung-mieten/berlin/c203l3331"), Kleinanzeigen)
+       self.assertIsInstance(config.searcher_for_url(
+           "https://www.wg-gesucht.de/wohnungen-in-Berlin.8.2.1.0.html"), WgGesucht)
+       self.assertIsNone(config.searcher_for_url("https://www.example.com/search"))
+
+    def test_searcher_index_is_reset_with_searchers(self):
+       config = StringConfig(string=self.DUMMY_CONFIG)
+       config.init_searchers()
+       self.assertIsNone(config.searcher_for_url("https://www.example.com/search"))
+       crawler = DummyCrawler()
+       config.set_searchers([crawler])
+       self.assertIs(config.searcher_for_url("https://www.example.com/search"), crawler)
@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import defaultdict
+
+import pytest
+
+from flathunter.crawl_executor import CrawlExecutor
+from flathunter.hunter import Hunter
+from flathunter.idmaintainer import IdMaintainer
+from test.dummy_crawler import DummyCrawler
+from test.utils.config import StringConfig
+
+CONCURRENT_CONFIG = """
+urls:
+  - https://www.example.com/search/flats-in-berlin
+  - https://www.example.com/search/flats-in-hamburg
+
+crawl:
+  max_workers: 4
+  max_workers_per_domain: 2
+"""
+
+class ConcurrencyTracker:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = defaultdict(int)
+        self.max_active = defaultdict(int)
+
+    def job(self, domain, result, delay):
+        def run():
+            with self.lock:
+                self.active[domain] += 1
+                self.max_active[domain] = max(self.max_active[domain], self.active[domain])
+                self.active['total'] += 1
+                self.max_active['total'] = max(self.max_active['total'], self.active['total'])
+            time.sleep(delay)
+            with self.lock:
+                self.active[domain] -= 1
+                self.active['total'] -= 1
+            return result
+        return (f"https://{domain}/search", run)
+
+def test_results_are_returned_in_job_order():
+    tracker = ConcurrencyTracker()
+    jobs = [tracker.job(f"site{i}.example.com", [{'id': i}], 0.05 * (5 - i)) for i in range(5)]
+    exposes = list(CrawlExecutor(max_workers=5).run(jobs))
+    assert [expose['id'] for expose in exposes] == [0, 1, 2, 3, 4]
+
+def test_concurrency_is_capped_per_domain():
+    tracker = ConcurrencyTracker()
+    jobs = [tracker.job("a.example.com", [{'id': i}], 0.02) for i in range(6)] + \
+           [tracker.job("b.example.com", [{'id': i}], 0.02) for i in range(6, 12)]
+    exposes = list(CrawlExecutor(max_workers=8, max_workers_per_domain=2).run(jobs))
+    assert len(exposes) == 12
+    assert tracker.max_active["a.example.com"] <= 2
+    assert tracker.max_active["b.example.com"] <= 2
+    assert tracker.max_active['total'] > 1
+
+def test_concurrency_is_capped_overall():
+    tracker = ConcurrencyTracker()
+    jobs = [tracker.job(f"site{i}.example.com", [{'id': i}], 0.02) for i in range(8)]
+    list(CrawlExecutor(max_workers=3, max_workers_per_domain=2).run(jobs))
+    assert tracker.max_active['total'] <= 3
+
+def test_errors_are_raised_to_the_consumer():
+    def failing():
+        raise ValueError("crawl failed")
+    jobs = [("https://a.example.com/", lambda: [{'id': 1}]), ("https://b.example.com/", failing)]
+    with pytest.raises(ValueError):
+        list(CrawlExecutor(max_workers=2).run(jobs))
+
+def test_hunter_crawls_concurrently():
+    config = StringConfig(string=CONCURRENT_CONFIG)
+    config.set_searchers([DummyCrawler()])
+    hunter = Hunter(config, IdMaintainer(":memory:"))
+    exposes = list(hunter.crawl_for_exposes())
+    assert len(exposes) > 4
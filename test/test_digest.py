@@ -0,0 +1,128 @@
+import math
+
+import pytest
+
+from flathunter.abstract_processor import Processor
+from flathunter.digest import DigestProcessor, digest_messages
+from flathunter.exceptions import ConfigException
+from flathunter.hunter import Hunter
+from flathunter.idmaintainer import IdMaintainer
+from flathunter.notifiers import SenderTelegram
+from flathunter.notifiers.telegram_dispatcher import TelegramDispatcher
+from flathunter.processor import ProcessorChain
+from flathunter.web_hunter import WebHunter
+from test.dummy_crawler import DummyCrawler
+from test.utils.config import StringConfig
+
+DIGEST_CONFIG = """
+urls:
+  - https://www.example.com/search/flats-in-berlin
+notifiers:
+  - telegram
+telegram:
+  bot_token: dummy_token
+  receiver_ids:
+    - 1
+message: "{title} {url}"
+digest:
+  enabled: true
+  min_exposes: 3
+  max_exposes_per_message: 4
+"""
+
+
+class RecordingSender(Processor):
+    def __init__(self):
+        self.exposes = []
+        self.messages = []
+        self.finished = False
+
+    def process_expose(self, expose):
+        self.exposes.append(expose)
+        return expose
+
+    def notify(self, message):
+        self.messages.append(message)
+
+    def finish(self):
+        self.finished = True
+
+
+def make_exposes(count):
+    return [{'id': expose_id, 'title': f"Flat {expose_id}",
+             'url': f"https://www.example.com/{expose_id}"} for expose_id in range(count)]
+
+
+def test_digest_messages_respect_expose_limit():
+    config = StringConfig(string=DIGEST_CONFIG)
+    messages = digest_messages(config, make_exposes(10), max_exposes=4, max_length=4000)
+    assert len(messages) == 3
+    assert messages[0].startswith("New offers 1-4 of 10:")
+    assert messages[2].startswith("New offers 9-10 of 10:")
+    assert "Flat 9 https://www.example.com/9" in messages[2]
+
+def test_digest_messages_respect_length_limit():
+    config = StringConfig(string=DIGEST_CONFIG)
+    messages = digest_messages(config, make_exposes(10), max_exposes=10, max_length=100)
+    assert len(messages) > 1
+    assert all(len(message) <= 100 + len("New offers 10-10 of 10:\n\n") for message in messages)
+    assert sum(message.count("https://") for message in messages) == 10
+
+def test_single_digest_has_simple_header():
+    config = StringConfig(string=DIGEST_CONFIG)
+    assert digest_messages(config, make_exposes(3), 10, 4000)[0].startswith("3 new offers:")
+
+def test_few_exposes_are_sent_one_by_one():
+    sender = RecordingSender()
+    processor = DigestProcessor(StringConfig(string=DIGEST_CONFIG), sender)
+    exposes = make_exposes(2)
+    assert list(processor.process_exposes(exposes)) == exposes
+    assert sender.exposes == []
+    processor.finish()
+    assert sender.exposes == exposes
+    assert sender.messages == []
+    assert sender.finished
+
+def test_many_exposes_are_sent_as_digest():
+    sender = RecordingSender()
+    processor = DigestProcessor(StringConfig(string=DIGEST_CONFIG), sender)
+    list(processor.process_exposes(make_exposes(9)))
+    processor.finish()
+    assert sender.exposes == []
+    assert len(sender.messages) == 3
+
+def test_hunter_sends_digest(mocker):
+    config = StringConfig(string=DIGEST_CONFIG)
+    config.set_searchers([DummyCrawler()])
+    notify = mocker.patch.object(SenderTelegram, 'notify')
+    process_expose = mocker.patch.object(SenderTelegram, 'process_expose')
+    exposes = Hunter(config, IdMaintainer(":memory:")).hunt_flats()
+    assert len(exposes) >= 3
+    assert notify.call_count == math.ceil(len(exposes) / 4)
+    process_expose.assert_not_called()
+
+def test_web_hunter_sends_each_user_a_digest(mocker):
+    send = mocker.patch.object(TelegramDispatcher, 'send', return_value={})
+    hunter = WebHunter(StringConfig(string=DIGEST_CONFIG), IdMaintainer(":memory:"))
+    hunter.notify_users([(1, make_exposes(9)), (2, make_exposes(2))])
+    messages = list(send.call_args.args[0])
+    assert [message.chat_id for message in messages] == [1, 1, 1, 2, 2]
+    assert messages[0].text.startswith("New offers 1-4 of 9:")
+    assert messages[3].text.startswith("Flat 0")
+
+def test_digest_is_rejected_with_outbox():
+    config = StringConfig(string=DIGEST_CONFIG + "outbox:\n  enabled: true\n")
+    with pytest.raises(ConfigException):
+        Hunter(config, IdMaintainer(":memory:"))
+
+def test_all_processors_are_finished_when_one_fails():
+    class FailingSender(RecordingSender):
+        def notify(self, message):
+            raise RuntimeError("send failed")
+    failing = DigestProcessor(StringConfig(string=DIGEST_CONFIG), FailingSender())
+    later = RecordingSender()
+    chain = ProcessorChain([failing, later])
+    with pytest.raises(RuntimeError):
+        list(chain.process(make_exposes(5)))
+    assert failing.sender.finished
+    assert later.finished
@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+
+import pytest
+from selenium.common.exceptions import WebDriverException
+
+from flathunter.driver_pool import DriverPool, process_tree_rss
+from flathunter.crawler.kleinanzeigen import Kleinanzeigen
+from test.utils.config import StringConfig
+
+
+class FakeDriver:
+    def __init__(self, browser_pid=None):
+        self.browser_pid = browser_pid
+        self.healthy = True
+        self.quit_called = False
+        self.blocked_urls = []
+        self.cdp_commands = []
+
+    def execute_cdp_cmd(self, command, params):
+        self.cdp_commands.append(command)
+        if command == 'Network.setBlockedURLs':
+            self.blocked_urls = params['urls']
+
+    def execute_script(self, script):
+        if not self.healthy:
+            raise WebDriverException("browser is gone")
+        return 1
+
+    def quit(self):
+        self.quit_called = True
+
+
+class FakeFactory:
+    def __init__(self, browser_pid=None):
+        self.browser_pid = browser_pid
+        self.drivers = []
+
+    def __call__(self):
+        driver = FakeDriver(self.browser_pid)
+        self.drivers.append(driver)
+        return driver
+
+
+def test_drivers_are_reused():
+    factory = FakeFactory()
+    pool = DriverPool(factory, size=1)
+    with pool.checkout() as first:
+        pass
+    with pool.checkout() as second:
+        pass
+    assert first is second
+    assert len(factory.drivers) == 1
+
+def test_drivers_are_recycled_after_page_loads():
+    factory = FakeFactory()
+    pool = DriverPool(factory, size=1, max_page_loads=2)
+    for _ in range(3):
+        with pool.checkout():
+            pass
+    assert len(factory.drivers) == 2
+    assert factory.drivers[0].quit_called
+    assert not factory.drivers[1].quit_called
+
+def test_unhealthy_drivers_are_replaced():
+    factory = FakeFactory()
+    pool = DriverPool(factory, size=1)
+    with pool.checkout() as driver:
+        pass
+    driver.healthy = False
+    with pool.checkout() as replacement:
+        assert replacement is not driver
+    assert driver.quit_called
+
+def test_drivers_raising_webdriver_errors_are_recycled():
+    factory = FakeFactory()
+    pool = DriverPool(factory, size=1)
+    with pytest.raises(WebDriverException):
+        with pool.checkout():
+            raise WebDriverException("tab crashed")
+    assert factory.drivers[0].quit_called
+    assert pool.idle == []
+
+def test_drivers_are_recycled_on_memory_growth(mocker):
+    factory = FakeFactory(browser_pid=os.getpid())
+    pool = DriverPool(factory, size=1, max_rss_growth_mb=10)
+    rss = mocker.patch('flathunter.driver_pool.process_tree_rss', return_value=100 * 1024 * 1024)
+    with pool.checkout():
+        pass
+    assert not factory.drivers[0].quit_called
+    rss.return_value = 200 * 1024 * 1024
+    with pool.checkout():
+        pass
+    assert factory.drivers[0].quit_called
+
+def test_pool_limits_concurrent_drivers():
+    factory = FakeFactory()
+    pool = DriverPool(factory, size=2)
+    in_use = []
+    most_in_use = []
+    lock = threading.Lock()
+
+    def crawl():
+        with pool.checkout() as driver:
+            with lock:
+                in_use.append(driver)
+                most_in_use.append(len(in_use))
+            time.sleep(0.02)
+            with lock:
+                in_use.remove(driver)
+
+    threads = [threading.Thread(target=crawl) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(most_in_use) == 2
+    assert len(factory.drivers) == 2
+
+def test_close_quits_idle_drivers():
+    factory = FakeFactory()
+    pool = DriverPool(factory, size=1)
+    with pool.checkout():
+        pass
+    pool.close()
+    assert factory.drivers[0].quit_called
+
+def test_process_tree_rss():
+    if not os.path.isdir('/proc'):
+        pytest.skip("Process memory is only measured on Linux")
+    assert process_tree_rss(os.getpid()) > 0
+
+def test_crawlers_check_out_drivers_from_shared_pool(mocker):
+    factory = FakeFactory()
+    pool = DriverPool(factory, size=1)
+    mocker.patch('flathunter.abstract_crawler.shared_driver_pool', return_value=pool)
+    get_soup = mocker.patch.object(Kleinanzeigen, 'get_soup_from_url')
+    crawler = Kleinanzeigen(StringConfig(string="urls: []"))
+    crawler.get_page("https://www.kleinanzeigen.de/s-wohnung-mieten/berlin/c203l3331")
+    crawler.get_page("https://www.kleinanzeigen.de/s-wohnung-mieten/berlin/c203l3331")
+    assert len(factory.drivers) == 1
+    assert get_soup.call_args.kwargs['driver'] is factory.drivers[0]
+
+def test_blocked_urls_are_set_when_changed():
+    factory = FakeFactory()
+    pool = DriverPool(factory, size=1)
+    with pool.checkout(['*.png*']) as driver:
+        assert driver.blocked_urls == ['*.png*']
+    with pool.checkout(['*.png*']):
+        pass
+    with pool.checkout(['*.css*']):
+        pass
+    assert driver.cdp_commands == ['Network.setBlockedURLs'] * 2
+    assert driver.blocked_urls == ['*.css*']
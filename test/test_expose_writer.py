@@ -0,0 +1,76 @@
+import datetime
+import threading
+import time
+
+from flathunter.expose_writer import ExposeWriter
+from flathunter.hunter import Hunter
+from flathunter.idmaintainer import IdMaintainer
+from test.dummy_crawler import DummyCrawler
+from test.test_util import count
+from test.utils.config import StringConfig
+
+WRITE_BEHIND_CONFIG = """
+urls:
+  - https://www.example.com/liste/berlin/wohnungen/mieten?roomi=2&prima=1500&wflmi=70&sort=createdate%2Bdesc
+
+write_behind:
+  enabled: true
+  batch_size: 10
+  max_delay: 5
+"""
+
+class RecordingIdMaintainer:
+
+    def __init__(self):
+        self.batches = []
+        self.saved = threading.Event()
+
+    def save_exposes(self, exposes):
+        self.batches.append([expose['id'] for expose in exposes])
+        self.saved.set()
+
+def test_exposes_are_saved_in_batches():
+    id_watch = RecordingIdMaintainer()
+    writer = ExposeWriter(id_watch, batch_size=3, max_delay=5)
+    for expose_id in range(7):
+        writer.save({'id': expose_id})
+    writer.close()
+    assert id_watch.batches == [[0, 1, 2], [3, 4, 5], [6]]
+
+def test_partial_batch_is_saved_after_max_delay():
+    id_watch = RecordingIdMaintainer()
+    writer = ExposeWriter(id_watch, batch_size=10, max_delay=0.05)
+    writer.save({'id': 1})
+    assert id_watch.saved.wait(timeout=2)
+    assert id_watch.batches == [[1]]
+    writer.close()
+
+def test_flush_does_not_wait_for_max_delay():
+    id_watch = RecordingIdMaintainer()
+    writer = ExposeWriter(id_watch, batch_size=10, max_delay=60)
+    writer.save({'id': 1})
+    writer.save({'id': 2})
+    start = time.monotonic()
+    writer.flush()
+    assert time.monotonic() - start < 5
+    assert id_watch.batches == [[1, 2]]
+    writer.close()
+
+def test_later_changes_to_exposes_are_not_saved(tmp_path):
+    id_watch = IdMaintainer(str(tmp_path / "processed_ids.db"))
+    writer = ExposeWriter(id_watch)
+    expose = {'id': 1, 'crawler': 'dummy', 'title': 'Flat'}
+    writer.save(expose)
+    expose['title'] = 'Changed'
+    writer.close()
+    saved = id_watch.get_exposes_since(datetime.datetime.now() - datetime.timedelta(seconds=10))
+    assert [expose['title'] for expose in saved] == ['Flat']
+
+def test_hunter_saves_all_exposes_with_write_behind(tmp_path):
+    config = StringConfig(string=WRITE_BEHIND_CONFIG)
+    config.set_searchers([DummyCrawler()])
+    id_watch = IdMaintainer(str(tmp_path / "processed_ids.db"))
+    exposes = Hunter(config, id_watch).hunt_flats()
+    assert count(exposes) > 4
+    saved = id_watch.get_exposes_since(datetime.datetime.now() - datetime.timedelta(seconds=10))
+    assert len(saved) >= count(exposes)
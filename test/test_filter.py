@@ -0,0 +1,58 @@
+from flathunter.filter import Filter, ExposeHelper, MaxPriceFilter, MinPriceFilter, \
+    PPSFilter, TitleFilter
+from flathunter.idmaintainer import IdMaintainer
+from test.utils.config import StringConfig
+
+FILTER_CONFIG = """
+filters:
+  excluded_titles:
+    - wg
+    - tausch
+  min_price: 500
+  max_price: 1000
+  max_price_per_square: 20
+  min_rooms: 2
+"""
+
+def expose(expose_id, price='800 €', size='60 m²', rooms='2', title='Schöne Wohnung'):
+    return {'id': expose_id, 'price': price, 'size': size, 'rooms': rooms, 'title': title}
+
+def build_filter():
+    return Filter.builder().read_config(StringConfig(string=FILTER_CONFIG)).build()
+
+def test_filters_are_applied():
+    exposes = [expose(1), expose(2, price='1.200 €'), expose(3, title='WG-Zimmer'),
+               expose(4, rooms='1'), expose(5, size='30 m²'), expose(6, price='')]
+    assert [e['id'] for e in build_filter().filter(exposes)] == [1, 6]
+
+def test_checks_are_ordered_by_cost():
+    checks = build_filter().checks
+    assert [type(check) for check in checks][-2:] == [PPSFilter, TitleFilter]
+
+def test_each_value_is_parsed_once(mocker):
+    spy = mocker.spy(ExposeHelper, "get_price")
+    filter_set = Filter.builder() \
+                       .read_config(StringConfig(string=FILTER_CONFIG)) \
+                       .build()
+    assert filter_set.is_interesting_expose(expose(1))
+    assert spy.call_count == 1
+
+def test_checks_stop_at_first_rejection(mocker):
+    title_check = mocker.spy(TitleFilter, "is_interesting")
+    assert not build_filter().is_interesting_expose(expose(1, price='2000'))
+    assert title_check.call_count == 0
+
+def test_single_filters_still_work_on_their_own():
+    assert MaxPriceFilter(1000).is_interesting(expose(1))
+    assert not MinPriceFilter(900).is_interesting(expose(1))
+    assert not TitleFilter(['schön']).is_interesting(expose(1))
+
+def test_rejected_exposes_are_marked_as_seen():
+    id_watch = IdMaintainer(":memory:")
+    filter_set = Filter.builder() \
+                       .read_config(StringConfig(string=FILTER_CONFIG)) \
+                       .filter_already_seen(id_watch) \
+                       .build()
+    assert not filter_set.is_interesting_expose(expose(1, price='2000'))
+    assert list(filter_set.filter([expose(2, price='2000'), expose(3)])) == [expose(3)]
+    assert id_watch.get_processed_ids([1, 2, 3]) == {1, 2, 3}
@@ -2,6 +2,7 @@ import unittest
 import yaml
 import re
 import requests_mock
+from flathunter.gmaps_duration_processor import GMapsDurationProcessor
 from flathunter.hunter import Hunter
 from flathunter.idmaintainer import IdMaintainer
 from test.dummy_crawler import DummyCrawler
@@ -47,4 +48,22 @@ durations:
         if len(without_durations) > 0:
             for expose in without_durations:
                 print("Got expose: ", expose)
-        self.assertTrue(len(without_durations) == 0, "Expected durations to be calculated")
\ No newline at end of file
+        self.assertTrue(len(without_durations) == 0, "Expected durations to be calculated")
+
+    @requests_mock.Mocker()
+    def test_durations_are_requested_in_batches(self, m):
+        config = StringConfig(string=self.DUMMY_CONFIG)
+        def rows(request, context):
+            origins = request.qs['origins'][0].split('|')
+            return {"status": "OK", "rows": [
+                {"elements": [{"distance": {"text": f"{index} km", "value": index},
+                               "duration": {"text": f"{index} mins", "value": index}}]}
+                for index in range(len(origins))]}
+        m.get(re.compile('maps.googleapis.com/maps/api/distancematrix/json'), json=rows)
+        exposes = [{'address': f"Street {i}, Berlin"} for i in range(30)]
+        GMapsDurationProcessor(config).process_batch(exposes)
+        # three destination/mode combinations, 25 origins per request
+        self.assertEqual(m.call_count, 6)
+        # rows are matched to exposes by position within each request
+        self.assertIn("> The Queen (By Bus): 1 mins (1 km)", exposes[26]['durations'])
+        self.assertIn("> Москва (Car): 3 mins (3 km)", exposes[3]['durations'])
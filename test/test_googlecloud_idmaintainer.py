@@ -12,10 +12,29 @@ from test.dummy_crawler import DummyCrawler
 from test.test_util import count
 from test.utils.config import StringConfig
 
+class MockWriteBatch:
+
+    def __init__(self):
+        self.writes = []
+
+    def set(self, reference, document_data, merge=False):
+        self.writes.append((reference, document_data, merge))
+
+    def commit(self):
+        for reference, document_data, merge in self.writes:
+            if merge and reference.get().exists:
+                reference.update(document_data)
+            else:
+                # MockFirestore only applies increments to existing fields
+                reference.set({key: getattr(value, 'value', value)
+                               for key, value in document_data.items()})
+
 class MockGoogleCloudIdMaintainer(GoogleCloudIdMaintainer):
 
     def __init__(self):
         self.database = MockFirestore()
+        # MockFirestore has no write batches
+        self.database.batch = MockWriteBatch
 
 CONFIG_WITH_FILTERS = """
 urls:
@@ -33,6 +52,17 @@ def test_read_after_write(id_watch):
     id_watch.mark_processed(12345)
     assert id_watch.is_processed(12345)
 
+def test_processed_ids_are_marked_in_batch(id_watch):
+    id_watch.mark_processed(1)
+    id_watch.mark_processed_many([2, 3])
+    assert id_watch.get_processed_ids([1, 2, 3, 4]) == {1, 2, 3}
+    assert id_watch.get_processed_ids([]) == set()
+
+def test_exposes_are_saved_in_batch(id_watch):
+    id_watch.save_exposes([{'id': 1, 'title': 'One'}, {'id': 2, 'title': 'Two'}])
+    saved = id_watch.get_exposes_since(datetime.datetime.now() - datetime.timedelta(seconds=10))
+    assert sorted(expose['title'] for expose in saved) == ['One', 'Two']
+
 def test_get_last_run_time_none_by_default(id_watch):
     assert id_watch.get_last_run_time() == None
 
@@ -41,6 +71,13 @@ def test_get_list_run_time_is_updated(id_watch):
     assert time != None
     assert time == id_watch.get_last_run_time()
 
+def test_user_settings_version_counts_changes(id_watch):
+    assert id_watch.get_user_settings_version() == 0
+    id_watch.save_settings_for_user(1, {'filters': {'max_price': 1000}})
+    id_watch.save_settings_for_user(1, {'mute_notifications': True})
+    assert id_watch.get_user_settings_version() == 2
+    assert id_watch.get_settings_for_user(1) == {'mute_notifications': True}
+
 def test_is_processed_works(id_watch):
     config = StringConfig(string=CONFIG_WITH_FILTERS)
     config.set_searchers([DummyCrawler()])
@@ -0,0 +1,90 @@
+import os
+import re
+
+import pytest
+import requests_mock
+from bs4 import BeautifulSoup
+
+from flathunter.abstract_crawler import Crawler
+from flathunter.crawler.wggesucht import WgGesucht
+from flathunter.exceptions import ConfigException
+from flathunter.html_parser import HtmlParser, LxmlParser, Subtree, get_parser
+from test.utils.config import StringConfig
+
+PAGE = """<html><head><title>Results</title></head><body>
+<nav><a href="/home">Home</a></nav>
+<ul id="results" class="list wide">
+  <li class="item">Wohnung in Köln</li>
+  <li class="item">Zimmer in Berlin</li>
+</ul>
+<footer><a href="/imprint">Imprint</a></footer>
+</body></html>"""
+
+FIXTURE = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                       "crawler", "fixtures", "wg-gesucht-spotahome.html")
+
+
+class ListCrawler(Crawler):
+    URL_PATTERN = re.compile(r'https://www\.example\.com')
+    RESULTS_SUBTREE = '#results'
+
+    def extract_data(self, soup):
+        return [{'id': idx, 'title': item.text, 'links': len(soup.find_all('a'))}
+                for idx, item in enumerate(soup.find_all('li'))]
+
+
+@pytest.mark.parametrize('selector,subtree', [
+    ('#results', Subtree(element_id='results')),
+    ('.item', Subtree(css_class='item')),
+    ('main', Subtree(tag='main')),
+    ('script#__NEXT_DATA__', Subtree(tag='script', element_id='__NEXT_DATA__')),
+])
+def test_selectors_are_parsed(selector, subtree):
+    assert Subtree.parse(selector) == subtree
+
+@pytest.mark.parametrize('selector', ['', 'div > p', '#a.b', '[data-id=1]'])
+def test_unsupported_selectors_are_rejected(selector):
+    with pytest.raises(ValueError):
+        Subtree.parse(selector)
+
+@pytest.mark.parametrize('parser', [HtmlParser(), LxmlParser()])
+@pytest.mark.parametrize('selector', ['#results', 'ul.list', '.wide'])
+def test_parsers_keep_only_the_subtree(parser, selector):
+    soup = parser.parse(PAGE.encode('utf-8'), Subtree.parse(selector))
+    assert [item.text for item in soup.find_all('li')] == ["Wohnung in Köln", "Zimmer in Berlin"]
+    assert soup.find('nav') is None
+    assert soup.find('a') is None
+
+@pytest.mark.parametrize('parser', [HtmlParser(), LxmlParser()])
+def test_parsers_parse_whole_page_without_subtree(parser):
+    soup = parser.parse(PAGE)
+    assert len(soup.find_all('a')) == 2
+
+def test_lxml_parser_returns_empty_soup_without_match():
+    assert LxmlParser().parse(PAGE, Subtree.parse('#missing')).find_all('li') == []
+
+@pytest.mark.parametrize('parser', ['bs4', 'lxml'])
+def test_wggesucht_subtree_contains_all_listings(parser):
+    with open(FIXTURE, encoding='utf-8') as fixture:
+        markup = fixture.read()
+    crawler = WgGesucht(StringConfig(string=f"urls: []\ncrawl:\n  html_parser: {parser}"))
+    full = crawler.extract_data(BeautifulSoup(markup, 'lxml'))
+    partial = crawler.extract_data(
+        crawler.html_parser.parse(markup, Subtree.parse(crawler.RESULTS_SUBTREE)))
+    assert len(full) > 0
+    assert partial == full
+
+def test_unknown_parser_is_rejected():
+    with pytest.raises(ConfigException):
+        get_parser('html5')
+
+@pytest.mark.parametrize('parser', ['bs4', 'lxml'])
+def test_only_search_results_are_parsed_partially(parser):
+    crawler = ListCrawler(StringConfig(string=f"urls: []\ncrawl:\n  html_parser: {parser}"))
+    with requests_mock.Mocker() as mock:
+        mock.get('https://www.example.com/search', text=PAGE)
+        entries = crawler.crawl('https://www.example.com/search')
+        soup = crawler.get_soup_from_url('https://www.example.com/search')
+    assert [entry['title'] for entry in entries] == ["Wohnung in Köln", "Zimmer in Berlin"]
+    assert entries[0]['links'] == 0
+    assert len(soup.find_all('a')) == 2
@@ -0,0 +1,73 @@
+import threading
+
+from http.client import HTTPMessage
+
+import requests
+from requests.cookies import MockRequest, MockResponse
+
+from flathunter.http_pool import ConnectionPoolManager
+from test.utils.config import StringConfig
+
+POOL_CONFIG = """
+http:
+  pool_connections: 4
+  pool_maxsize: 20
+  pool_block: true
+  host_limits:
+    api.telegram.org: 2
+"""
+
+def test_session_is_reused_within_a_thread():
+    manager = ConnectionPoolManager()
+    assert manager.session() is manager.session()
+
+def test_each_thread_gets_its_own_session():
+    manager = ConnectionPoolManager()
+    sessions = []
+    thread = threading.Thread(target=lambda: sessions.append(manager.session()))
+    thread.start()
+    thread.join()
+    assert sessions[0] is not manager.session()
+    assert sessions[0].get_adapter('https://example.com/') \
+        is manager.session().get_adapter('https://example.com/')
+
+def receive_cookie(session):
+    # Store a cookie the way the transport adapter does for a real response
+    headers = HTTPMessage()
+    headers['Set-Cookie'] = 'session=secret'
+    request = requests.Request('GET', 'https://example.com/').prepare()
+    session.cookies.extract_cookies(MockResponse(headers), MockRequest(request))
+
+def test_shared_session_does_not_keep_cookies():
+    manager = ConnectionPoolManager()
+    receive_cookie(manager.session())
+    assert len(manager.session().cookies) == 0
+
+def test_new_session_keeps_cookies_and_shares_pools():
+    manager = ConnectionPoolManager()
+    session = manager.new_session()
+    receive_cookie(session)
+    assert session.cookies.get('session') == 'secret'
+    assert session is not manager.new_session()
+    assert session.get_adapter('https://example.com/') is manager.default_adapter
+
+def test_host_limits_get_their_own_adapter():
+    manager = ConnectionPoolManager(host_limits={'api.telegram.org': 2})
+    adapter = manager.session().get_adapter('https://api.telegram.org/bot123/sendMessage')
+    assert adapter is manager.host_adapters['api.telegram.org']
+    assert adapter is not manager.default_adapter
+    assert manager.session().get_adapter('https://example.com/') is manager.default_adapter
+
+def test_pool_sizes_are_read_from_config():
+    manager = ConnectionPoolManager.from_config(StringConfig(string=POOL_CONFIG))
+    assert manager.default_adapter._pool_connections == 4
+    assert manager.default_adapter._pool_maxsize == 20
+    assert manager.default_adapter._pool_block is True
+    assert manager.host_adapters['api.telegram.org']._pool_maxsize == 2
+
+def test_pool_defaults_without_config():
+    config = StringConfig(string="")
+    assert config.http_pool_connections() == 10
+    assert config.http_pool_maxsize() == 10
+    assert config.http_pool_block() is False
+    assert config.http_host_limits() == {}
@@ -116,6 +116,14 @@ excluded_titles:
         exposes = hunter.hunt_flats()
         self.assertTrue(count(exposes) > 0, "Expected to find exposes")
 
+    def test_incremental_crawl_sets_seen_oracle(self):
+        config = StringConfig(string=self.FILTER_MIN_PRICE_CONFIG + "\ncrawl:\n  incremental: true\n")
+        crawler = DummyCrawler()
+        config.set_searchers([crawler])
+        id_watch = IdMaintainer(":memory:")
+        Hunter(config, id_watch).crawl_for_exposes()
+        self.assertEqual(crawler.seen_oracle, id_watch.get_processed_ids)
+
     def test_invalid_config(self):
         with self.assertRaises(Exception) as context:
             Hunter(dict(), IdMaintainer(":memory:"))  # type: ignore
@@ -1,9 +1,10 @@
 import unittest
 import datetime
+import sqlite3
 import re
 from typing import Dict
 
-from flathunter.idmaintainer import IdMaintainer
+from flathunter.idmaintainer import IdMaintainer, MIGRATIONS
 from flathunter.hunter import Hunter
 from flathunter.web_hunter import WebHunter
 from flathunter.filter import Filter
@@ -57,11 +58,42 @@ def test_ids_are_added_to_maintainer(mocker):
     config = StringConfig(string=IdMaintainerTest.DUMMY_CONFIG)
     config.set_searchers([DummyCrawler()])
     id_watch = IdMaintainer(":memory:")
-    spy = mocker.spy(id_watch, "mark_processed")
+    spy = mocker.spy(id_watch, "mark_processed_many")
     hunter = Hunter(config, id_watch)
     exposes = hunter.hunt_flats()
     assert count(exposes) > 4
-    assert spy.call_count == 24
+    assert sum(len(call.args[0]) for call in spy.call_args_list) == 24
+
+def test_seen_ids_are_checked_in_batches(mocker):
+    config = StringConfig(string=IdMaintainerTest.DUMMY_CONFIG)
+    config.set_searchers([DummyCrawler()])
+    id_watch = IdMaintainer(":memory:")
+    single = mocker.spy(id_watch, "is_processed")
+    batch = mocker.spy(id_watch, "get_processed_ids")
+    Hunter(config, id_watch).hunt_flats()
+    assert single.call_count == 0
+    assert batch.call_count == 1
+
+def test_processed_ids_are_marked_in_batch():
+    id_watch = IdMaintainer(":memory:")
+    id_watch.mark_processed(1)
+    id_watch.mark_processed_many([2, 3])
+    assert id_watch.get_processed_ids([1, 2, 3, 4]) == {1, 2, 3}
+    assert id_watch.get_processed_ids(['3', '4']) == {'3'}
+    assert id_watch.get_processed_ids([]) == set()
+
+def test_processed_ids_are_looked_up_in_chunks():
+    id_watch = IdMaintainer(":memory:")
+    id_watch.mark_processed_many(range(0, 2000, 2))
+    assert id_watch.get_processed_ids(range(1200)) == set(range(0, 1200, 2))
+
+def test_duplicates_in_a_batch_are_only_new_once():
+    id_watch = IdMaintainer(":memory:")
+    id_watch.mark_processed(1)
+    exposes = [{'id': 1}, {'id': 2}, {'id': 2}, {'id': 3}]
+    filter_set = Filter.builder().filter_already_seen(id_watch).build()
+    assert [expose['id'] for expose in filter_set.filter(exposes)] == [2, 3]
+    assert id_watch.get_processed_ids([1, 2, 3]) == {1, 2, 3}
 
 def test_exposes_are_saved_to_maintainer():
     config = StringConfig(string=IdMaintainerTest.CONFIG_WITH_FILTERS)
@@ -133,3 +165,52 @@ def test_all_filters_can_be_loaded():
     hunter.set_filters_for_user(123, filter)
     hunter.set_filters_for_user(124, filter)
     assert id_watch.get_user_settings() == [ (123, { 'filters': filter }), (124, { 'filters': filter }) ]
+
+def test_user_settings_version_counts_changes():
+    id_watch = IdMaintainer(":memory:")
+    assert id_watch.get_user_settings_version() == 0
+    id_watch.save_settings_for_user(1, {'filters': {'max_price': 1000}})
+    id_watch.save_settings_for_user(1, {'mute_notifications': True})
+    assert id_watch.get_user_settings_version() == 2
+
+def test_new_database_has_current_schema():
+    connection = IdMaintainer(":memory:").get_connection()
+    assert connection.execute('PRAGMA user_version').fetchone()[0] == len(MIGRATIONS)
+    indexes = [row[1] for row in connection.execute("PRAGMA index_list('exposes')")]
+    assert 'exposes_created' in indexes
+
+def test_marking_an_id_twice_keeps_one_row():
+    id_watch = IdMaintainer(":memory:")
+    id_watch.mark_processed(1)
+    id_watch.mark_processed(1)
+    id_watch.mark_processed_many([1, 2])
+    rows = id_watch.get_connection().execute('SELECT id FROM processed').fetchall()
+    assert sorted(rows) == [(1,), (2,)]
+
+def test_legacy_database_is_migrated(tmp_path):
+    db_name = str(tmp_path / "processed_ids.db")
+    legacy = sqlite3.connect(db_name)
+    legacy.execute('CREATE TABLE processed (ID INTEGER)')
+    legacy.execute('CREATE TABLE exposes (id INTEGER, created TIMESTAMP, \
+                    crawler STRING, details BLOB, PRIMARY KEY (id, crawler))')
+    legacy.executemany('INSERT INTO processed VALUES(?)', [(1,), (2,), (1,), (None,), (3,)])
+    legacy.commit()
+    legacy.close()
+
+    id_watch = IdMaintainer(db_name)
+    assert id_watch.get_processed_ids([1, 2, 3, 4]) == {1, 2, 3}
+    connection = id_watch.get_connection()
+    assert sorted(connection.execute('SELECT id FROM processed').fetchall()) == [(1,), (2,), (3,)]
+    assert connection.execute('PRAGMA user_version').fetchone()[0] == len(MIGRATIONS)
+    assert id_watch.get_last_run_time() is None
+    assert id_watch.get_user_settings_version() == 0
+
+    # opening the migrated database again leaves it untouched
+    assert IdMaintainer(db_name).get_processed_ids([1, 2, 3, 4]) == {1, 2, 3}
+
+def test_exposes_are_saved_in_batch():
+    id_watch = IdMaintainer(":memory:")
+    id_watch.save_exposes([{'id': 1, 'crawler': 'dummy', 'title': 'One'},
+                           {'id': 2, 'crawler': 'dummy', 'title': 'Two'}])
+    saved = id_watch.get_exposes_since(datetime.datetime.now() - datetime.timedelta(seconds=10))
+    assert sorted(expose['title'] for expose in saved) == ['One', 'Two']
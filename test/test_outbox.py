@@ -0,0 +1,139 @@
+import time
+
+import pytest
+
+from flathunter.exceptions import BotBlockedException
+from flathunter.hunter import Hunter
+from flathunter.idmaintainer import IdMaintainer
+from flathunter.outbox import OutboxEntry, OutboxProcessor, OutboxWorker, RetryPolicy
+from test.dummy_crawler import DummyCrawler
+from test.utils.config import StringConfig
+
+OUTBOX_CONFIG = """
+urls:
+  - https://www.example.com/search/flats-in-berlin
+notifiers:
+  - telegram
+  - slack
+telegram:
+  bot_token: dummy_token
+  receiver_ids:
+    - 1
+    - 2
+slack:
+  webhook_url: https://hooks.example.com/slack
+outbox:
+  enabled: true
+"""
+
+EXPOSE = {'id': 42, 'crawler': 'Dummy', 'title': 'Flat', 'url': 'https://www.example.com/42'}
+
+
+class FakeSender:
+    def __init__(self, results):
+        self.results = list(results)
+        self.delivered = []
+
+    def deliver(self, expose):
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        if result:
+            self.delivered.append(expose)
+        return result
+
+
+def worker_with_sender(id_watch, sender, **policy):
+    worker = OutboxWorker(StringConfig(string=OUTBOX_CONFIG), id_watch, RetryPolicy(**policy))
+    worker.senders[('slack', None)] = sender
+    return worker
+
+
+def outbox_rows(id_watch):
+    return id_watch.get_connection().execute(
+        'SELECT state, attempts, next_attempt FROM outbox').fetchall()
+
+
+def test_notifications_are_only_queued_once():
+    id_watch = IdMaintainer(":memory:")
+    id_watch.enqueue_notifications([OutboxEntry('slack', None, EXPOSE)])
+    id_watch.enqueue_notifications([OutboxEntry('slack', None, dict(EXPOSE))])
+    assert id_watch.count_pending_notifications() == 1
+
+def test_claimed_notifications_are_leased():
+    id_watch = IdMaintainer(":memory:")
+    id_watch.enqueue_notifications([OutboxEntry('slack', None, EXPOSE)])
+    entries = id_watch.claim_notifications(10, lease=60)
+    assert [entry.expose for entry in entries] == [EXPOSE]
+    assert id_watch.claim_notifications(10, lease=60) == []
+
+def test_delivered_notifications_are_completed():
+    id_watch = IdMaintainer(":memory:")
+    id_watch.enqueue_notifications([OutboxEntry('slack', None, EXPOSE)])
+    sender = FakeSender([True])
+    assert worker_with_sender(id_watch, sender).run_once() == 1
+    assert sender.delivered == [EXPOSE]
+    assert outbox_rows(id_watch)[0][:2] == ('delivered', 1)
+
+@pytest.mark.parametrize('failure', [False, ConnectionError("unreachable")])
+def test_failed_deliveries_are_retried_with_backoff(failure):
+    id_watch = IdMaintainer(":memory:")
+    id_watch.enqueue_notifications([OutboxEntry('slack', None, EXPOSE)])
+    worker = worker_with_sender(id_watch, FakeSender([failure]), base_delay=100)
+    assert worker.run_once() == 0
+    state, attempts, next_attempt = outbox_rows(id_watch)[0]
+    assert (state, attempts) == ('pending', 1)
+    assert next_attempt == pytest.approx(time.time() + 100, abs=5)
+    assert worker.run_once() == 0
+
+def test_backoff_doubles_up_to_limit():
+    policy = RetryPolicy(base_delay=30, max_delay=100)
+    assert [policy.delay(attempts) for attempts in range(1, 5)] == [30, 60, 100, 100]
+
+def test_notifications_are_given_up_after_max_attempts():
+    id_watch = IdMaintainer(":memory:")
+    id_watch.enqueue_notifications([OutboxEntry('slack', None, EXPOSE)])
+    worker_with_sender(id_watch, FakeSender([False]), max_attempts=1).run_once()
+    assert outbox_rows(id_watch)[0][0] == 'failed'
+    assert id_watch.count_pending_notifications() == 0
+
+def test_blocked_receivers_are_not_retried():
+    id_watch = IdMaintainer(":memory:")
+    id_watch.enqueue_notifications([OutboxEntry('slack', None, EXPOSE)])
+    worker_with_sender(id_watch, FakeSender([BotBlockedException("blocked")])).run_once()
+    assert outbox_rows(id_watch)[0][0] == 'failed'
+
+def test_notifications_survive_a_crash(tmp_path):
+    db_name = str(tmp_path / 'processed_ids.db')
+    id_watch = IdMaintainer(db_name)
+    id_watch.enqueue_notifications([OutboxEntry('slack', None, EXPOSE)])
+    # claimed by a sender that died before completing it, with its lease expired
+    id_watch.claim_notifications(10, lease=0)
+
+    sender = FakeSender([True])
+    assert worker_with_sender(IdMaintainer(db_name), sender).run_once() == 1
+    assert sender.delivered == [EXPOSE]
+
+def test_worker_delivers_in_background():
+    id_watch = IdMaintainer(":memory:")
+    sender = FakeSender([True])
+    worker = worker_with_sender(id_watch, sender)
+    processor = OutboxProcessor(StringConfig(string=OUTBOX_CONFIG), id_watch, worker,
+                                notifiers=['slack'])
+    processor.process_batch([EXPOSE])
+    processor.finish()
+    worker.close()
+    assert sender.delivered == [EXPOSE]
+    assert id_watch.count_pending_notifications() == 0
+
+def test_hunter_queues_notifications_per_receiver(mocker):
+    config = StringConfig(string=OUTBOX_CONFIG)
+    config.set_searchers([DummyCrawler()])
+    id_watch = IdMaintainer(":memory:")
+    hunter = Hunter(config, id_watch)
+    wake = mocker.patch.object(OutboxWorker, 'wake')
+    exposes = hunter.hunt_flats()
+    assert len(exposes) > 0
+    wake.assert_called_once()
+    # one notification per telegram receiver, and one for slack
+    assert id_watch.count_pending_notifications() == 3 * len(exposes)
@@ -1,7 +1,14 @@
+import threading
+import time
 import unittest
+
+import pytest
+
 from flathunter.hunter import Hunter
 from flathunter.idmaintainer import IdMaintainer
-from flathunter.processor import ProcessorChain
+from flathunter.abstract_processor import Processor
+from flathunter.gmaps_duration_processor import GMapsDurationProcessor
+from flathunter.processor import ParallelProcessor, ProcessorChain, batches
 from test.dummy_crawler import DummyCrawler
 from test.test_util import count
 from test.utils.config import StringConfig
@@ -40,3 +47,134 @@ google_maps_api:
         exposes = chain.process(exposes)
         for expose in exposes:
             self.assertFalse(expose['address'].startswith('http'), "Expected addresses to be processed")
+
+class SlowProcessor(Processor):
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+
+    def process_expose(self, expose):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delays[expose['id']])
+        with self.lock:
+            self.active -= 1
+        return expose
+
+def test_parallel_stage_keeps_input_order():
+    processor = SlowProcessor([0.08, 0.01, 0.05, 0.0, 0.02, 0.03])
+    exposes = [{'id': i} for i in range(6)]
+    result = list(ParallelProcessor(processor, workers=3).process_exposes(exposes))
+    assert result == exposes
+    assert 1 < processor.max_active <= 3
+
+def test_parallel_stage_can_emit_as_completed():
+    processor = SlowProcessor([0.2, 0.0, 0.0])
+    exposes = [{'id': i} for i in range(3)]
+    result = list(ParallelProcessor(processor, workers=3, ordered=False).process_exposes(exposes))
+    assert sorted(expose['id'] for expose in result) == [0, 1, 2]
+    assert result[-1]['id'] == 0
+
+def test_parallel_stage_applies_backpressure():
+    taken = []
+    def source():
+        for i in range(100):
+            taken.append(i)
+            yield {'id': i}
+    processor = SlowProcessor([0.0] * 100)
+    results = ParallelProcessor(processor, workers=2).process_exposes(source())
+    next(results)
+    assert len(taken) <= 5
+    results.close()
+
+def test_builder_runs_network_stages_in_parallel():
+    config = StringConfig(string=ProcessorTest.DUMMY_CONFIG + "\nprocessing:\n  workers: 4\n")
+    chain = ProcessorChain.builder(config) \
+        .resolve_addresses() \
+        .calculate_durations(workers=1) \
+        .build()
+    assert isinstance(chain.processors[0], ParallelProcessor)
+    assert chain.processors[0].workers == 4
+    assert not isinstance(chain.processors[1], ParallelProcessor)
+
+class BatchRecorder(Processor):
+
+    def __init__(self):
+        self.batches = []
+        self.finished = False
+
+    def process_batch(self, exposes):
+        self.batches.append([expose['id'] for expose in exposes])
+        return exposes
+
+    def finish(self):
+        self.finished = True
+
+def test_chain_hands_batches_to_batch_processors():
+    recorder = BatchRecorder()
+    single = SlowProcessor([0.0] * 7)
+    chain = ProcessorChain([single, recorder], batch_size=3, batch_delay=60)
+    result = list(chain.process({'id': i} for i in range(7)))
+    assert [expose['id'] for expose in result] == list(range(7))
+    assert recorder.batches == [[0, 1, 2], [3, 4, 5], [6]]
+    assert recorder.finished
+
+def test_batches_are_closed_after_delay():
+    def slow_source():
+        for i in range(3):
+            time.sleep(0.03)
+            yield {'id': i}
+    assert [len(batch) for batch in batches(slow_source(), 10, 0.01)] == [1, 1, 1]
+
+def test_partial_batches_do_not_wait_for_the_stream():
+    produced = []
+    def stalled_source():
+        for i in range(2):
+            produced.append(i)
+            yield {'id': i}
+            time.sleep(0.5)
+    groups = batches(stalled_source(), 10, 0.05)
+    assert [expose['id'] for expose in next(groups)] == [0]
+    assert produced == [0]
+    assert [expose['id'] for expose in next(groups)] == [1]
+
+def test_single_exposes_are_passed_on_without_batcher_thread(mocker):
+    thread = mocker.patch('flathunter.processor.threading.Thread')
+    assert list(batches(({'id': i} for i in range(2)), 1, 60)) == [[{'id': 0}], [{'id': 1}]]
+    thread.assert_not_called()
+
+def test_batching_is_off_by_default():
+    config = StringConfig(string=ProcessorTest.DUMMY_CONFIG)
+    assert ProcessorChain.builder(config).build().batch_size == 1
+
+def test_stream_errors_are_raised_by_batches():
+    def failing_source():
+        yield {'id': 0}
+        raise ValueError("crawl failed")
+    with pytest.raises(ValueError):
+        list(batches(failing_source(), 10, 60))
+
+def test_parallel_stage_passes_batches_on():
+    recorder = BatchRecorder()
+    chain = ProcessorChain([ParallelProcessor(recorder, workers=2)], batch_size=3, batch_delay=60)
+    result = list(chain.process({'id': i} for i in range(7)))
+    assert [expose['id'] for expose in result] == list(range(7))
+    assert sorted(recorder.batches) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert recorder.finished
+
+def test_exposes_are_saved_in_batches(mocker):
+    config = StringConfig(string=ProcessorTest.DUMMY_CONFIG + "\nprocessing:\n  batch_size: 10\n")
+    config.set_searchers([DummyCrawler()])
+    id_watch = IdMaintainer(":memory:")
+    single = mocker.spy(id_watch, "save_expose")
+    batch = mocker.spy(id_watch, "save_exposes")
+    mocker.patch.object(GMapsDurationProcessor, "get_gmaps_distances",
+                        lambda self, addresses, dest, mode: [None] * len(addresses))
+    Hunter(config, id_watch).hunt_flats()
+    assert single.call_count == 0
+    assert batch.call_count > 1
+    assert all(len(call.args[0]) <= 10 for call in batch.call_args_list)
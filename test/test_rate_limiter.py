@@ -0,0 +1,100 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from flathunter.http_pool import ConnectionPoolManager
+from flathunter.rate_limiter import DEFAULT_RATE_LIMITS, RateLimiter, TokenBucket
+from test.utils.config import StringConfig
+
+RATE_LIMIT_CONFIG = """
+http:
+  rate_limits:
+    immobilienscout24.de:
+      rate: 5
+      burst: 2
+    kleinanzeigen.de:
+      rate: 0
+"""
+
+
+class RecordingRateLimiter(RateLimiter):
+    def __init__(self):
+        super().__init__()
+        self.urls = []
+
+    def wait(self, url):
+        self.urls.append(url)
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+
+def test_bucket_allows_burst_then_paces():
+    bucket = TokenBucket(rate=10, burst=3)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+    assert bucket.reserve() == pytest.approx(0.2, abs=0.01)
+
+def test_bucket_try_acquire_does_not_reserve():
+    bucket = TokenBucket(rate=1, burst=1)
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    assert bucket.reserve() == pytest.approx(1.0, abs=0.01)
+
+def test_bucket_acquire_waits():
+    bucket = TokenBucket(rate=20, burst=1)
+    start = time.monotonic()
+    for _ in range(3):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.09
+
+def test_bucket_acquire_async_waits():
+    bucket = TokenBucket(rate=20, burst=1)
+
+    async def acquire_all():
+        await asyncio.gather(*(bucket.acquire_async() for _ in range(3)))
+
+    start = time.monotonic()
+    asyncio.run(acquire_all())
+    assert time.monotonic() - start >= 0.09
+
+def test_limits_apply_to_subdomains():
+    limiter = RateLimiter(DEFAULT_RATE_LIMITS)
+    bucket = limiter.bucket_for('https://www.immobilienscout24.de/Suche/de/berlin')
+    assert bucket is limiter.buckets['immobilienscout24.de']
+    assert limiter.bucket_for('https://api.telegram.org/bot123/sendMessage') \
+        is limiter.buckets['api.telegram.org']
+    assert limiter.bucket_for('https://www.example.com/') is None
+
+def test_config_overrides_default_limits():
+    limiter = RateLimiter.from_config(StringConfig(string=RATE_LIMIT_CONFIG))
+    bucket = limiter.buckets['immobilienscout24.de']
+    assert (bucket.rate, bucket.burst) == (5.0, 2)
+    assert limiter.bucket_for('https://www.kleinanzeigen.de/s-wohnung-mieten/') is None
+    assert 'api.telegram.org' in limiter.buckets
+
+def test_pooled_sessions_wait_for_rate_limiter(server_url):
+    limiter = RecordingRateLimiter()
+    manager = ConnectionPoolManager(rate_limiter=limiter)
+    manager.session().get(server_url + '/one', timeout=5)
+    manager.new_session().get(server_url + '/two', timeout=5)
+    assert limiter.urls == [server_url + '/one', server_url + '/two']
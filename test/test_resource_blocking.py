@@ -0,0 +1,66 @@
+import pytest
+
+from flathunter.crawler.immobilienscout import Immobilienscout
+from flathunter.crawler.kleinanzeigen import Kleinanzeigen
+from flathunter.exceptions import ConfigException
+from flathunter.resource_blocking import ALWAYS_BLOCKED, BlockingProfile
+from test.utils.config import StringConfig
+
+BLOCKING_CONFIG = """
+urls: []
+resource_blocking:
+  types:
+    - image
+    - analytics
+  urls:
+    - "*ads.example.com*"
+  allow:
+    - "*hotjar.com*"
+"""
+
+
+def test_default_profile_blocks_images_fonts_media_and_analytics():
+    blocked = BlockingProfile.from_config(StringConfig(string="urls: []")).blocked_urls()
+    for pattern in ['*.jpg*', '*.woff*', '*.mp4*', '*google-analytics.com*', *ALWAYS_BLOCKED]:
+        assert pattern in blocked
+    assert '*.css*' not in blocked
+
+def test_configured_profile():
+    blocked = BlockingProfile.from_config(StringConfig(string=BLOCKING_CONFIG)).blocked_urls()
+    assert '*.png*' in blocked
+    assert '*ads.example.com*' in blocked
+    assert '*.woff*' not in blocked
+    assert '*hotjar.com*' not in blocked
+    assert '*doubleclick.net*' in blocked
+
+def test_extended_profile_blocks_and_allows():
+    profile = BlockingProfile().extended(block=['stylesheet', '*tracker.example.com*'],
+                                         allow=['image'])
+    blocked = profile.blocked_urls()
+    assert '*.css*' in blocked
+    assert '*tracker.example.com*' in blocked
+    assert '*.jpg*' not in blocked
+
+def test_unknown_resource_types_are_rejected():
+    with pytest.raises(ValueError):
+        BlockingProfile(resource_types=frozenset(['holograms'])).blocked_urls()
+
+def test_unknown_configured_resource_types_are_rejected():
+    config = StringConfig(string="urls: []\nresource_blocking:\n  types:\n    - images\n")
+    with pytest.raises(ConfigException):
+        config.resource_blocking_types()
+    with pytest.raises(ConfigException):
+        Kleinanzeigen(config)
+
+def test_crawlers_declare_what_they_need(mocker):
+    config = StringConfig(string="urls: []")
+    pool = mocker.patch('flathunter.abstract_crawler.shared_driver_pool').return_value
+    for crawler in [Immobilienscout(config), Kleinanzeigen(config)]:
+        mocker.patch.object(crawler, 'uses_driver', return_value=True)
+        with crawler.checkout_driver():
+            pass
+    is24_blocked, kleinanzeigen_blocked = \
+        [call.args[0] for call in pool.checkout.call_args_list]
+    assert '*.css*' in is24_blocked
+    assert '*.css*' not in kleinanzeigen_blocked
+    assert '*.jpg*' in kleinanzeigen_blocked
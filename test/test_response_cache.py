@@ -0,0 +1,90 @@
+import re
+
+import pytest
+import requests_mock
+
+from flathunter.abstract_crawler import Crawler
+from test.utils.config import StringConfig
+
+CACHE_CONFIG = """
+crawl:
+  response_cache: true
+"""
+
+URL = "https://www.example.com/search"
+PAGE = b"<html><body><a class='expose' href='/expose/1'>Flat</a></body></html>"
+
+class CountingCrawler(Crawler):
+
+    URL_PATTERN = re.compile(r'https://www\.example\.com')
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.extractions = 0
+
+    def extract_data(self, soup):
+        self.extractions += 1
+        return [{'id': int(link['href'].split('/')[-1]), 'title': link.text}
+                for link in soup.find_all('a', {'class': 'expose'})]
+
+@pytest.fixture
+def crawler():
+    return CountingCrawler(StringConfig(string=CACHE_CONFIG))
+
+def test_cache_is_disabled_by_default():
+    assert CountingCrawler(StringConfig(string="")).response_cache is None
+
+def test_not_modified_page_is_not_parsed_again(crawler):
+    with requests_mock.Mocker() as mock:
+        mock.get(URL, [{'content': PAGE, 'headers': {'ETag': '"v1"'}},
+                       {'status_code': 304}])
+        first = crawler.crawl(URL)
+        second = crawler.crawl(URL)
+        assert mock.request_history[1].headers['If-None-Match'] == '"v1"'
+    assert first == second == [{'id': 1, 'title': 'Flat'}]
+    assert crawler.extractions == 1
+
+def test_unchanged_content_is_not_parsed_again(crawler):
+    with requests_mock.Mocker() as mock:
+        mock.get(URL, content=PAGE, headers={'Last-Modified': 'Sat, 17 Oct 2026 10:00:00 GMT'})
+        with crawler._results_pages():
+            soup = crawler.get_soup_from_url(URL)
+            assert crawler.get_soup_from_url(URL) is soup
+        assert mock.request_history[1].headers['If-Modified-Since'] == \
+            'Sat, 17 Oct 2026 10:00:00 GMT'
+        crawler.crawl(URL)
+        crawler.crawl(URL)
+    assert crawler.extractions == 1
+
+def test_changed_content_is_parsed(crawler):
+    changed = PAGE.replace(b"/expose/1'>Flat", b"/expose/2'>Other flat")
+    with requests_mock.Mocker() as mock:
+        mock.get(URL, [{'content': PAGE}, {'content': changed}])
+        crawler.crawl(URL)
+        entries = crawler.crawl(URL)
+    assert entries == [{'id': 2, 'title': 'Other flat'}]
+    assert crawler.extractions == 2
+
+def test_cached_entries_are_copies(crawler):
+    with requests_mock.Mocker() as mock:
+        mock.get(URL, content=PAGE)
+        crawler.crawl(URL)[0]['title'] = 'Changed by a processor'
+        assert crawler.crawl(URL)[0]['title'] == 'Flat'
+
+def test_cache_is_bounded(crawler):
+    crawler.response_cache.max_entries = 2
+    with requests_mock.Mocker() as mock:
+        mock.get(re.compile(URL), content=PAGE)
+        with crawler._results_pages():
+            for page in range(3):
+                crawler.get_soup_from_url(f"{URL}?page={page}")
+    assert list(crawler.response_cache.responses) == [f"{URL}?page=1", f"{URL}?page=2"]
+    assert len(crawler.response_cache.by_soup) == 2
+
+def test_detail_pages_skip_the_cache(crawler):
+    with requests_mock.Mocker() as mock:
+        mock.get(URL, content=PAGE, headers={'ETag': '"v1"'})
+        crawler.get_soup_from_url(URL)
+        crawler.get_soup_from_url(URL)
+        assert 'If-None-Match' not in mock.request_history[1].headers
+    assert len(crawler.response_cache.responses) == 0
@@ -0,0 +1,106 @@
+from flathunter.abstract_crawler import CAPTCHA_DETECTION_SCRIPT, GEETEST_SCRIPT, Crawler
+from flathunter.captcha.captcha_solver import GeetestResponse
+from flathunter.crawler.immobilienscout import Immobilienscout
+from flathunter.utils.timing import Timings
+from test.utils.config import StringConfig
+
+PAGE = "<html><body><h1>Flats</h1></body></html>"
+
+GEETEST_INIT = """initGeetest({
+    gt: "gt-key",
+    challenge: "the-challenge",
+}, function (obj) { solvedCaptcha({
+    geetest_validate: obj.geetest_validate,
+    data: "some-data"
+}); });"""
+
+
+class FakeBrowser:
+    def __init__(self, captcha=None, result_list=None):
+        self.captcha = captcha
+        self.result_list = result_list
+        self.page_source_reads = 0
+        self.scripts = []
+        self.current_url = None
+
+    def get(self, url):
+        self.current_url = url
+
+    def execute_script(self, script):
+        self.scripts.append(script)
+        if script == CAPTCHA_DETECTION_SCRIPT:
+            return self.captcha
+        if script == GEETEST_SCRIPT:
+            return GEETEST_INIT
+        if script == 'return window.IS24.resultList;':
+            return self.result_list
+        return None
+
+    @property
+    def page_source(self):
+        self.page_source_reads += 1
+        return PAGE
+
+
+class FakeSolver:
+    def solve_geetest(self, geetest, challenge, page_url):
+        assert (geetest, challenge) == ("gt-key", "the-challenge")
+        return GeetestResponse("the-challenge", "validated", "sec-code")
+
+
+def crawler_with(cls=Crawler):
+    crawler = cls(StringConfig(string="urls: []"))
+    crawler.captcha_solver = FakeSolver()
+    return crawler
+
+
+def test_page_source_is_read_once_per_fetch():
+    browser = FakeBrowser()
+    soup = crawler_with().get_soup_from_url("https://www.example.com/", driver=browser)
+    assert soup.h1.text == "Flats"
+    assert browser.page_source_reads == 1
+    assert browser.scripts == [CAPTCHA_DETECTION_SCRIPT]
+
+def test_page_loads_wait_for_rate_limit(mocker):
+    rate_limiter = mocker.patch('flathunter.abstract_crawler.get_rate_limiter').return_value
+    browser = FakeBrowser()
+    crawler_with().get_soup_from_url("https://www.kleinanzeigen.de/s-wohnung-mieten/c203",
+                                     driver=browser)
+    rate_limiter.wait.assert_called_once_with("https://www.kleinanzeigen.de/s-wohnung-mieten/c203")
+
+def test_geetest_is_solved_without_reading_page_source(mocker):
+    mocker.patch('flathunter.abstract_crawler.sleep')
+    browser = FakeBrowser(captcha='geetest')
+    crawler_with().get_soup_from_url("https://www.example.com/", driver=browser)
+    assert browser.page_source_reads == 1
+    solved = browser.scripts[-1]
+    assert 'geetest_validate: "validated"' in solved
+    assert 'data: "some-data"' in solved
+
+def test_recaptcha_is_detected(mocker):
+    resolve = mocker.patch.object(Crawler, 'resolve_recaptcha')
+    browser = FakeBrowser(captcha='recaptcha')
+    crawler_with().get_soup_from_url("https://www.example.com/", driver=browser,
+                                     checkbox=True)
+    resolve.assert_called_once_with(browser, True, "")
+
+def test_immobilienscout_reads_results_without_page_source(mocker):
+    crawler = crawler_with(Immobilienscout)
+    browser = FakeBrowser(result_list={})
+    checkout = mocker.patch.object(crawler, 'checkout_driver')
+    checkout.return_value.__enter__.return_value = browser
+    assert crawler.get_results("https://www.immobilienscout24.de/Suche/?a=b") == []
+    assert browser.page_source_reads == 0
+    assert browser.current_url.endswith('&pagenumber=1')
+
+def test_timings_are_recorded():
+    timings = Timings()
+    with timings.measure('stage'):
+        pass
+    with timings.measure('stage'):
+        pass
+    calls, total = timings.snapshot()['stage']
+    assert calls == 2
+    assert total >= 0
+    timings.log_and_reset()
+    assert timings.snapshot() == {}
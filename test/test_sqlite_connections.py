@@ -0,0 +1,62 @@
+import threading
+
+from flathunter.expose_writer import ExposeWriter
+from flathunter.idmaintainer import IdMaintainer
+from flathunter.sqlite_connections import SqliteConnectionManager
+
+def in_thread(func):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(func()))
+    thread.start()
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+    return result[0]
+
+def test_file_database_uses_wal(tmp_path):
+    connections = SqliteConnectionManager(str(tmp_path / "test.db"))
+    with connections.reader() as connection:
+        assert connection.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert connection.execute('PRAGMA synchronous').fetchone()[0] == 1
+
+def test_readers_are_per_thread_and_writer_is_shared(tmp_path):
+    connections = SqliteConnectionManager(str(tmp_path / "test.db"))
+    assert connections.get_reader() is connections.get_reader()
+    assert in_thread(connections.get_reader) is not connections.get_reader()
+    assert in_thread(connections.get_writer) is connections.get_writer()
+    assert connections.get_writer() is not connections.get_reader()
+
+def test_database_is_initialized_once(tmp_path):
+    calls = []
+    connections = SqliteConnectionManager(str(tmp_path / "test.db"), initialize=calls.append)
+    connections.get_reader()
+    in_thread(connections.get_reader)
+    with connections.writer():
+        pass
+    assert len(calls) == 1
+
+def test_reads_do_not_wait_for_a_write_transaction(tmp_path):
+    id_watch = IdMaintainer(str(tmp_path / "processed_ids.db"))
+    id_watch.mark_processed(1)
+    with id_watch.connections.writer() as connection:
+        connection.execute('INSERT INTO processed VALUES(?)', (2,))
+        assert in_thread(lambda: id_watch.get_processed_ids([1, 2])) == {1}
+    assert id_watch.get_processed_ids([1, 2]) == {1, 2}
+
+def test_failed_write_is_rolled_back(tmp_path):
+    id_watch = IdMaintainer(str(tmp_path / "processed_ids.db"))
+    try:
+        with id_watch.connections.writer() as connection:
+            connection.execute('INSERT INTO processed VALUES(?)', (1,))
+            raise RuntimeError()
+    except RuntimeError:
+        pass
+    assert not id_watch.is_processed(1)
+
+def test_memory_database_is_shared_between_threads():
+    id_watch = IdMaintainer(":memory:")
+    in_thread(lambda: id_watch.mark_processed(1))
+    assert id_watch.is_processed(1)
+    writer = ExposeWriter(id_watch)
+    writer.save({'id': 1, 'crawler': 'dummy', 'title': 'Flat'})
+    writer.close()
+    assert len(id_watch.get_recent_exposes(10)) == 1
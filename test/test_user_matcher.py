@@ -0,0 +1,164 @@
+import random
+
+import pytest
+
+from flathunter import user_matcher
+from flathunter.config import YamlConfig
+from flathunter.filter import Filter
+from flathunter.idmaintainer import IdMaintainer
+from flathunter.notifiers import SenderTelegram
+from flathunter.user_matcher import UserMatcher, UserFilterIndex, expose_row
+from flathunter.web_hunter import WebHunter
+from test.dummy_crawler import DummyCrawler
+from test.utils.config import StringConfig
+
+TELEGRAM_CONFIG = """
+urls:
+  - https://www.example.com/liste/berlin/wohnungen/mieten?roomi=2&prima=1500&wflmi=70&sort=createdate%2Bdesc
+
+notifiers:
+  - telegram
+
+telegram:
+  bot_token: 123:abc
+"""
+
+@pytest.fixture(params=['numpy', 'python'])
+def backend(request, monkeypatch):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(user_matcher, 'np', None)
+    return request.param
+
+def random_settings(rng):
+    filters = {}
+    if rng.random() < 0.7:
+        filters['max_price'] = rng.randint(600, 2000)
+    if rng.random() < 0.3:
+        filters['min_price'] = rng.randint(300, 900)
+    if rng.random() < 0.5:
+        filters['min_size'] = rng.randint(20, 80)
+    if rng.random() < 0.3:
+        filters['max_rooms'] = rng.choice([2, 3, 4])
+    if rng.random() < 0.3:
+        filters['min_rooms'] = rng.choice([1, 2, 3])
+    if rng.random() < 0.2:
+        filters['max_price_per_square'] = rng.randint(10, 25)
+    if rng.random() < 0.2:
+        filters['excluded_titles'] = ['wg', 'tausch']
+    return {'filters': filters}
+
+def random_expose(expose_id, rng):
+    return {
+        'id': expose_id,
+        'title': rng.choice(['Schöne Wohnung', 'WG-Zimmer', 'Wohnungstausch', 'Altbau']),
+        'price': rng.choice(['', f"{rng.randint(300, 2500)},00 €"]),
+        'size': rng.choice(['', f"{rng.randint(20, 150)} m²"]),
+        'rooms': rng.choice(['', str(rng.choice([1, 2, 2.5, 3, 4, 5]))]),
+    }
+
+def test_matches_agree_with_filters(backend):
+    rng = random.Random(1)
+    users = [(user_id, random_settings(rng)) for user_id in range(200)]
+    exposes = [random_expose(expose_id, rng) for expose_id in range(100)]
+    matches = dict(UserMatcher(users).match(exposes))
+    for user_id, settings in users:
+        filter_set = Filter.builder().read_config(YamlConfig(settings)).build()
+        assert matches[user_id] == list(filter_set.filter(exposes))
+
+def test_users_without_filters_get_everything(backend):
+    exposes = [{'id': 1, 'title': 'Flat', 'price': '900', 'size': '', 'rooms': '2'}]
+    assert list(UserMatcher([(1, {})]).match(exposes)) == [(1, exposes)]
+
+def test_no_users_match_nothing(backend):
+    assert list(UserMatcher([]).match([{'id': 1}])) == []
+
+def test_web_hunter_sends_matches_to_users(mocker):
+    config = StringConfig(string=TELEGRAM_CONFIG)
+    config.set_searchers([DummyCrawler()])
+    id_watch = IdMaintainer(":memory:")
+    hunter = WebHunter(config, id_watch)
+    hunter.set_filters_for_user(1, {'max_price': 1000})
+    hunter.set_filters_for_user(2, {'max_price': 100})
+    hunter.set_filters_for_user(3, {})
+    hunter.set_notification_status(3, False)
+    sent = []
+    mocker.patch.object(SenderTelegram, 'send_exposes',
+                        lambda self, matches: sent.extend(matches) or {})
+    exposes = hunter.hunt_flats()
+    user_messages = [expose for user_id, matches in sent if user_id == 1 for expose in matches]
+    assert len(user_messages) > 0
+    assert all(float(expose['price'].split(' ')[0]) <= 1000 for expose in user_messages)
+    assert len(user_messages) < len(exposes)
+    assert not any(user_id in (2, 3) for user_id, _ in sent)
+
+def test_index_agrees_with_filters(backend):
+    rng = random.Random(2)
+    users = [(user_id, random_settings(rng)) for user_id in range(300)]
+    exposes = [random_expose(expose_id, rng) for expose_id in range(100)]
+    matches = dict(UserFilterIndex(users).match(exposes))
+    for user_id, settings in users:
+        filter_set = Filter.builder().read_config(YamlConfig(settings)).build()
+        assert matches.get(user_id, []) == list(filter_set.filter(exposes))
+
+def test_index_narrows_candidates():
+    users = [(user_id, {'filters': {'max_price': 500 + user_id}}) for user_id in range(1000)]
+    index = UserFilterIndex(users)
+    row = expose_row({'price': '1450 €', 'size': '', 'rooms': ''})
+    assert sorted(index.candidates(row)) == list(range(950, 1000))
+
+def test_index_is_updated_incrementally(backend):
+    expose = {'id': 1, 'title': 'Flat', 'price': '900', 'size': '60', 'rooms': '2'}
+    index = UserFilterIndex([(1, {'filters': {'max_price': 1000}})])
+    assert dict(index.match([expose])) == {1: [expose]}
+    index.set_user(1, {'filters': {'max_price': 800}})
+    index.set_user(2, {'filters': {'min_size': 50}})
+    assert dict(index.match([expose])) == {2: [expose]}
+    index.remove_user(2)
+    assert dict(index.match([expose])) == {}
+    assert index.columns[1] == [(800.0, 1)]
+    assert index.columns[2] == []
+
+def test_web_hunter_updates_index_in_place(mocker):
+    config = StringConfig(string=TELEGRAM_CONFIG)
+    hunter = WebHunter(config, IdMaintainer(":memory:"))
+    hunter.set_filters_for_user(1, {'max_price': 1000})
+    index = hunter.get_user_index()
+    load = mocker.spy(hunter.id_watch, 'get_user_settings')
+    hunter.set_filters_for_user(2, {'max_price': 500})
+    hunter.toggle_notification_status(1)
+    assert hunter.get_user_index() is index
+    assert list(index.bounds) == [2]
+    hunter.toggle_notification_status(1)
+    assert sorted(hunter.get_user_index().bounds) == [1, 2]
+    assert load.call_count == 0
+
+def test_web_hunter_reloads_settings_saved_elsewhere():
+    config = StringConfig(string=TELEGRAM_CONFIG)
+    id_watch = IdMaintainer(":memory:")
+    hunter = WebHunter(config, id_watch)
+    website = WebHunter(config, id_watch)
+    website.set_filters_for_user(1, {'max_price': 1000})
+    assert list(hunter.get_user_index().bounds) == [1]
+    website.set_filters_for_user(2, {'max_price': 500})
+    website.toggle_notification_status(1)
+    assert list(hunter.get_user_index().bounds) == [2]
+    hunter.set_filters_for_user(3, {'max_price': 700})
+    assert sorted(hunter.get_user_index().bounds) == [2, 3]
+    website.toggle_notification_status(1)
+    assert sorted(hunter.get_user_index().bounds) == [1, 2, 3]
+
+def test_index_is_built_with_sorted_columns():
+    users = [(user_id, {'filters': {'max_price': 2000 - user_id}}) for user_id in range(5)]
+    index = UserFilterIndex(users)
+    assert index.columns[1] == [(1996.0, 4), (1997.0, 3), (1998.0, 2), (1999.0, 1), (2000.0, 0)]
+    assert index.unbounded[0] == set(range(5))
+
+def test_index_changes_do_not_affect_candidates():
+    index = UserFilterIndex([(user_id, {'filters': {'max_price': 1000}}) for user_id in range(3)])
+    row = expose_row({'price': '900', 'size': '', 'rooms': ''})
+    candidates = index.candidates(row)
+    index.remove_user(0)
+    index.set_user(5, {})
+    assert sorted(candidates) == [0, 1, 2]